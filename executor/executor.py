@@ -8,34 +8,52 @@ import platform
 import psutil
 import pyttsx3
 import threading
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import json
 
+from utils.estadisticas import EstadisticasSeguras
+from utils.almacen_estado import nivel_siguiente, obtener_almacen
+from utils.historial import obtener_historial
+
 logger = logging.getLogger(__name__)
 
+Comando = Tuple[str, str, Optional[str], Optional[int]]
+
+# Recurso físico que controla cada dispositivo (la luz se simula con el brillo)
+_RECURSO_POR_DISPOSITIVO = {
+    "luz": "brillo",
+    "brillo": "brillo",
+}
+
+def recurso_de(dispositivo: str) -> str:
+    """Recurso físico que toca un dispositivo; por defecto, el propio dispositivo"""
+    dispositivo = dispositivo.lower()
+    return _RECURSO_POR_DISPOSITIVO.get(dispositivo, dispositivo)
+
+def agrupar_por_recurso(comandos: List[Comando]) -> List[List[Comando]]:
+    """Secuencias de comandos que comparten recurso, en el orden del enunciado"""
+    grupos: Dict[str, List[Comando]] = {}
+    for comando in comandos:
+        grupos.setdefault(recurso_de(comando[1]), []).append(comando)
+    return list(grupos.values())
+
 class EjecutorAccionesIoT:
     def __init__(self):
         self.platform = platform.system()
         self.tts_engine = pyttsx3.init()
         self.setup_tts()
         
-        # Estado simulado de dispositivos
-        self.estado_dispositivos = {
-            "luz": {"encendido": False, "ubicaciones": set()},
-            "ventilador": {"encendido": False, "ubicaciones": set()},
-            "televisor": {"encendido": False, "ubicaciones": set()},
-            "calefactor": {"encendido": False, "ubicaciones": set()},
-            "volumen": {"nivel": 50, "silenciado": False},
-            "brillo": {"nivel": 70}
-        }
+        # Estado de dispositivos: almacén compartido con validador y gestor de estado
+        self.estado = obtener_almacen()
         
-        self.stats = {
+        self.stats = EstadisticasSeguras({
             'acciones_ejecutadas': 0,
             'errores_ejecucion': 0,
             'comandos_simulados': 0,
             'comandos_reales': 0
-        }
+        })
         
         # Inicializar controladores específicos del sistema
         self._init_system_controllers()
@@ -97,44 +115,41 @@ class EjecutorAccionesIoT:
                 if accion_lower == "ajustar" and valor is not None:
                     cmd = f"pactl set-sink-volume @DEFAULT_SINK@ {valor}%"
                     subprocess.run(cmd, shell=True, check=True)
-                    self.estado_dispositivos["volumen"]["nivel"] = valor
-                    self.estado_dispositivos["volumen"]["silenciado"] = False
+                    self.estado.modificar("volumen", nivel=valor, silenciado=False)
                     
                 elif accion_lower == "subir":
                     subprocess.run("pactl set-sink-volume @DEFAULT_SINK@ +10%", 
                                  shell=True, check=True)
-                    self.estado_dispositivos["volumen"]["nivel"] = min(100, 
-                        self.estado_dispositivos["volumen"]["nivel"] + 10)
+                    self.estado.ajustar_nivel("volumen", accion_lower)
                     
                 elif accion_lower == "bajar":
                     subprocess.run("pactl set-sink-volume @DEFAULT_SINK@ -10%", 
                                  shell=True, check=True)
-                    self.estado_dispositivos["volumen"]["nivel"] = max(0, 
-                        self.estado_dispositivos["volumen"]["nivel"] - 10)
+                    self.estado.ajustar_nivel("volumen", accion_lower)
                     
                 elif accion_lower == "silenciar":
                     subprocess.run("pactl set-sink-mute @DEFAULT_SINK@ 1", 
                                  shell=True, check=True)
-                    self.estado_dispositivos["volumen"]["silenciado"] = True
+                    self.estado.modificar("volumen", silenciado=True)
                     
                 elif accion_lower == "activar":
                     subprocess.run("pactl set-sink-mute @DEFAULT_SINK@ 0", 
                                  shell=True, check=True)
-                    self.estado_dispositivos["volumen"]["silenciado"] = False
+                    self.estado.modificar("volumen", silenciado=False)
                 
-                self.stats['comandos_reales'] += 1
+                self.stats.incrementar('comandos_reales')
                 return True
             else:
                 # Simulación para otros sistemas
                 logger.info(f"Simulando control de volumen: {accion} {valor}")
-                if accion == "ajustar" and valor is not None:
-                    self.estado_dispositivos["volumen"]["nivel"] = valor
-                elif accion == "silenciar":
-                    self.estado_dispositivos["volumen"]["silenciado"] = True
-                elif accion == "activar":
-                    self.estado_dispositivos["volumen"]["silenciado"] = False
+                if accion_lower in ("ajustar", "subir", "bajar"):
+                    self.estado.ajustar_nivel("volumen", accion_lower, valor)
+                elif accion_lower == "silenciar":
+                    self.estado.modificar("volumen", silenciado=True)
+                elif accion_lower == "activar":
+                    self.estado.modificar("volumen", silenciado=False)
                 
-                self.stats['comandos_simulados'] += 1
+                self.stats.incrementar('comandos_simulados')
                 return True
                 
         except subprocess.CalledProcessError as e:
@@ -156,7 +171,7 @@ class EjecutorAccionesIoT:
                 if result_real.returncode == 0:
                     volumen_real = int(result_real.stdout.strip())
                     print(f"🔍 DEBUG: Volumen REAL del sistema: {volumen_real}%")
-                    self.estado_dispositivos["volumen"]["nivel"] = volumen_real
+                    self.estado.modificar("volumen", nivel=volumen_real)
             except Exception as e:
                 print(f"⚠️ Error sincronizando volumen: {e}")
             
@@ -167,21 +182,20 @@ class EjecutorAccionesIoT:
                 
                 if result.returncode == 0:
                     print(f"✅ Volumen ajustado a {valor}%")
-                    self.estado_dispositivos["volumen"]["nivel"] = valor
-                    self.estado_dispositivos["volumen"]["silenciado"] = False
+                    self.estado.modificar("volumen", nivel=valor, silenciado=False)
                 else:
                     print(f"❌ Error ajustando volumen: {result.stderr}")
                     return False
                 
             elif accion == "subir":
-                nivel_actual = self.estado_dispositivos["volumen"]["nivel"]
-                nuevo_nivel = min(100, nivel_actual + 10)
+                nivel_actual = self.estado.leer("volumen", "nivel")
+                nuevo_nivel = nivel_siguiente("volumen", nivel_actual, accion)
                 print(f"🔍 DEBUG: Subiendo volumen de {nivel_actual}% a {nuevo_nivel}%")
                 return self._controlar_volumen_macos("ajustar", nuevo_nivel)
                 
             elif accion == "bajar":
-                nivel_actual = self.estado_dispositivos["volumen"]["nivel"]
-                nuevo_nivel = max(0, nivel_actual - 10)
+                nivel_actual = self.estado.leer("volumen", "nivel")
+                nuevo_nivel = nivel_siguiente("volumen", nivel_actual, accion)
                 print(f"🔍 DEBUG: Bajando volumen de {nivel_actual}% a {nuevo_nivel}%")
                 return self._controlar_volumen_macos("ajustar", nuevo_nivel)
                 
@@ -192,7 +206,7 @@ class EjecutorAccionesIoT:
                 
                 if result.returncode == 0:
                     print("✅ Volumen silenciado")
-                    self.estado_dispositivos["volumen"]["silenciado"] = True
+                    self.estado.modificar("volumen", silenciado=True)
                 else:
                     print(f"❌ Error silenciando volumen: {result.stderr}")
                     return False
@@ -204,12 +218,12 @@ class EjecutorAccionesIoT:
                 
                 if result.returncode == 0:
                     print("✅ Volumen activado")
-                    self.estado_dispositivos["volumen"]["silenciado"] = False
+                    self.estado.modificar("volumen", silenciado=False)
                 else:
                     print(f"❌ Error activando volumen: {result.stderr}")
                     return False
             
-            self.stats['comandos_reales'] += 1
+            self.stats.incrementar('comandos_reales')
             logger.info(f"Control de volumen macOS ejecutado: {accion} {valor}")
             return True
             
@@ -236,37 +250,31 @@ class EjecutorAccionesIoT:
                     factor = max(0.1, min(1.0, valor / 100.0))
                     cmd = f"xrandr --output $(xrandr | grep ' connected' | head -1 | cut -d' ' -f1) --brightness {factor}"
                     subprocess.run(cmd, shell=True, check=True)
-                    self.estado_dispositivos["brillo"]["nivel"] = valor
+                    self.estado.modificar("brillo", nivel=valor)
                     
                 elif accion_lower == "subir":
-                    nuevo_nivel = min(100, self.estado_dispositivos["brillo"]["nivel"] + 10)
+                    nuevo_nivel = nivel_siguiente("brillo", self.estado.leer("brillo", "nivel"), accion_lower)
                     factor = max(0.1, min(1.0, nuevo_nivel / 100.0))
                     cmd = f"xrandr --output $(xrandr | grep ' connected' | head -1 | cut -d' ' -f1) --brightness {factor}"
                     subprocess.run(cmd, shell=True, check=True)
-                    self.estado_dispositivos["brillo"]["nivel"] = nuevo_nivel
+                    self.estado.modificar("brillo", nivel=nuevo_nivel)
                     
                 elif accion_lower == "bajar":
-                    nuevo_nivel = max(10, self.estado_dispositivos["brillo"]["nivel"] - 10)
+                    nuevo_nivel = nivel_siguiente("brillo", self.estado.leer("brillo", "nivel"), accion_lower)
                     factor = max(0.1, min(1.0, nuevo_nivel / 100.0))
                     cmd = f"xrandr --output $(xrandr | grep ' connected' | head -1 | cut -d' ' -f1) --brightness {factor}"
                     subprocess.run(cmd, shell=True, check=True)
-                    self.estado_dispositivos["brillo"]["nivel"] = nuevo_nivel
+                    self.estado.modificar("brillo", nivel=nuevo_nivel)
                 
-                self.stats['comandos_reales'] += 1
+                self.stats.incrementar('comandos_reales')
                 return True
             else:
                 # Simulación para otros sistemas
                 logger.info(f"Simulando control de brillo: {accion} {valor}")
-                if accion == "ajustar" and valor is not None:
-                    self.estado_dispositivos["brillo"]["nivel"] = valor
-                elif accion == "subir":
-                    self.estado_dispositivos["brillo"]["nivel"] = min(100, 
-                        self.estado_dispositivos["brillo"]["nivel"] + 10)
-                elif accion == "bajar":
-                    self.estado_dispositivos["brillo"]["nivel"] = max(10, 
-                        self.estado_dispositivos["brillo"]["nivel"] - 10)
+                if accion_lower in ("ajustar", "subir", "bajar"):
+                    self.estado.ajustar_nivel("brillo", accion_lower, valor)
                 
-                self.stats['comandos_simulados'] += 1
+                self.stats.incrementar('comandos_simulados')
                 return True
                 
         except subprocess.CalledProcessError as e:
@@ -297,7 +305,7 @@ class EjecutorAccionesIoT:
                     
                     if result.returncode == 0 and "failed" not in result.stderr.lower():
                         print("✅ Brillo ajustado con brightness CLI")
-                        self.estado_dispositivos["brillo"]["nivel"] = valor
+                        self.estado.modificar("brillo", nivel=valor)
                         return True
                     else:
                         print("❌ brightness CLI falló o no tiene permisos")
@@ -308,7 +316,7 @@ class EjecutorAccionesIoT:
                 print("🔍 DEBUG: Intentando AppleScript con teclas de función...")
                 try:
                     # Obtener brillo actual aproximado
-                    current_level = self.estado_dispositivos["brillo"]["nivel"]
+                    current_level = self.estado.leer("brillo", "nivel")
                     target_level = valor
                     
                     if target_level > current_level:
@@ -326,7 +334,7 @@ class EjecutorAccionesIoT:
                             subprocess.run(cmd, shell=True, capture_output=True)
                         print(f"✅ Brillo reducido usando teclas F2 ({steps} pasos)")
                     
-                    self.estado_dispositivos["brillo"]["nivel"] = valor
+                    self.estado.modificar("brillo", nivel=valor)
                     return True
                     
                 except Exception as e:
@@ -340,20 +348,20 @@ class EjecutorAccionesIoT:
                 print("   3. Reiniciar la aplicación")
                 print(f"🎭 Simulando cambio de brillo a {valor}%")
                 
-                self.estado_dispositivos["brillo"]["nivel"] = valor
+                self.estado.modificar("brillo", nivel=valor)
                 return True
-                self.estado_dispositivos["brillo"]["nivel"] = valor
+                self.estado.modificar("brillo", nivel=valor)
                 return True
                 
             elif accion == "subir":
-                nivel_actual = self.estado_dispositivos["brillo"]["nivel"]
-                nuevo_nivel = min(100, nivel_actual + 10)
+                nivel_actual = self.estado.leer("brillo", "nivel")
+                nuevo_nivel = nivel_siguiente("brillo", nivel_actual, accion)
                 print(f"🔍 DEBUG: Subiendo brillo de {nivel_actual}% a {nuevo_nivel}%")
                 return self._controlar_brillo_macos("ajustar", nuevo_nivel)
                 
             elif accion == "bajar":
-                nivel_actual = self.estado_dispositivos["brillo"]["nivel"]
-                nuevo_nivel = max(10, nivel_actual - 10)
+                nivel_actual = self.estado.leer("brillo", "nivel")
+                nuevo_nivel = nivel_siguiente("brillo", nivel_actual, accion)
                 print(f"🔍 DEBUG: Bajando brillo de {nivel_actual}% a {nuevo_nivel}%")
                 return self._controlar_brillo_macos("ajustar", nuevo_nivel)
             
@@ -393,10 +401,10 @@ class EjecutorAccionesIoT:
                 
                 if result.returncode == 0:
                     print("✅ QuickTime Player abierto correctamente")
-                    self.estado_dispositivos["televisor"]["encendido"] = True
+                    self.estado.modificar("televisor", encendido=True)
                     if ubicacion:
-                        self.estado_dispositivos["televisor"]["ubicaciones"].add(ubicacion)
-                    self.stats['comandos_reales'] += 1
+                        self.estado.modificar_ubicacion("televisor", ubicacion, True)
+                    self.stats.incrementar('comandos_reales')
                     return True
                 else:
                     print(f"❌ Error abriendo QuickTime Player: {result.stderr}")
@@ -418,17 +426,17 @@ class EjecutorAccionesIoT:
                     except Exception as e:
                         print(f"⚠️ No se pudo cerrar {app}: {e}")
                 
-                self.estado_dispositivos["televisor"]["encendido"] = False
+                self.estado.modificar("televisor", encendido=False)
                 if ubicacion:
-                    self.estado_dispositivos["televisor"]["ubicaciones"].discard(ubicacion)
+                    self.estado.modificar_ubicacion("televisor", ubicacion, False)
                 
                 if success:
-                    self.stats['comandos_reales'] += 1
+                    self.stats.incrementar('comandos_reales')
                     return True
                 else:
                     print("⚠️ No se encontraron aplicaciones de video para cerrar")
                     # Aún consideramos esto como éxito
-                    self.stats['comandos_reales'] += 1
+                    self.stats.incrementar('comandos_reales')
                     return True
             
             else:
@@ -452,9 +460,12 @@ class EjecutorAccionesIoT:
     def execute(self, accion: str, dispositivo: str, 
                 ubicacion: Optional[str] = None, valor: Optional[int] = None):
         """Ejecutar acción en dispositivo IoT"""
-        self.stats['acciones_ejecutadas'] += 1
+        self.stats.incrementar('acciones_ejecutadas')
         
         try:
+            # El compilador entrega nombres de token ("ENCENDER", "LUZ")
+            accion = accion.lower()
+            dispositivo = dispositivo.lower()
             logger.info(f"Ejecutando: {accion} {dispositivo} en {ubicacion or 'global'} valor={valor}")
             
             if accion == "ver":
@@ -491,7 +502,7 @@ class EjecutorAccionesIoT:
                     if accion != "silenciar":  # No hablar si estamos silenciando
                         self.speak(mensaje)
                 else:
-                    self.stats['errores_ejecucion'] += 1
+                    self.stats.incrementar('errores_ejecucion')
             
             elif dispositivo.lower() == "brillo":
                 exito = self.controlar_brillo_sistema(accion, valor)
@@ -504,7 +515,7 @@ class EjecutorAccionesIoT:
                     print(f"💡 {mensaje}")
                     self.speak(mensaje)
                 else:
-                    self.stats['errores_ejecucion'] += 1
+                    self.stats.incrementar('errores_ejecucion')
                     
             elif dispositivo.lower() == "luz":
                 # Mapeo inteligente: luz -> control real de brillo
@@ -527,14 +538,14 @@ class EjecutorAccionesIoT:
                     
                     # Actualizar estado simulado de luz también
                     if accion.lower() in ["encender", "apagar"]:
-                        self.estado_dispositivos["luz"]["encendido"] = (accion.lower() == "encender")
+                        self.estado.modificar("luz", encendido=(accion.lower() == "encender"))
                         if ubicacion:
                             if accion.lower() == "encender":
-                                self.estado_dispositivos["luz"]["ubicaciones"].add(ubicacion)
+                                self.estado.modificar_ubicacion("luz", ubicacion, True)
                             else:
-                                self.estado_dispositivos["luz"]["ubicaciones"].discard(ubicacion)
+                                self.estado.modificar_ubicacion("luz", ubicacion, False)
                 else:
-                    self.stats['errores_ejecucion'] += 1
+                    self.stats.incrementar('errores_ejecucion')
                     
             elif dispositivo.lower() == "televisor":
                 # Control real del televisor vía aplicaciones macOS
@@ -553,14 +564,14 @@ class EjecutorAccionesIoT:
                     
                     # Actualizar estado del televisor
                     if accion.lower() in ["encender", "apagar"]:
-                        self.estado_dispositivos["televisor"]["encendido"] = (accion.lower() == "encender")
+                        self.estado.modificar("televisor", encendido=(accion.lower() == "encender"))
                         if ubicacion:
                             if accion.lower() == "encender":
-                                self.estado_dispositivos["televisor"]["ubicaciones"].add(ubicacion)
+                                self.estado.modificar_ubicacion("televisor", ubicacion, True)
                             else:
-                                self.estado_dispositivos["televisor"]["ubicaciones"].discard(ubicacion)
+                                self.estado.modificar_ubicacion("televisor", ubicacion, False)
                 else:
-                    self.stats['errores_ejecucion'] += 1
+                    self.stats.incrementar('errores_ejecucion')
             
             else:
                 # Simulación para otros dispositivos
@@ -570,28 +581,48 @@ class EjecutorAccionesIoT:
             self.actualizar_historial(accion, dispositivo, ubicacion, valor)
             
         except Exception as e:
-            self.stats['errores_ejecucion'] += 1
+            self.stats.incrementar('errores_ejecucion')
             logger.error(f"Error ejecutando acción: {e}")
             self.speak("Error ejecutando la acción")
     
+    def execute_batch(self, comandos: List[Comando]):
+        """Ejecutar un lote de comandos; recursos físicos distintos se controlan en paralelo"""
+        # Las acciones sobre un mismo recurso (p. ej. LUZ y BRILLO) conservan su orden
+        secuencias = agrupar_por_recurso(comandos)
+        
+        if len(secuencias) <= 1:
+            for comando in comandos:
+                self.execute(*comando)
+            return
+        
+        def ejecutar_secuencia(secuencia):
+            for comando in secuencia:
+                self.execute(*comando)
+        
+        logger.info(f"Ejecutando lote de {len(comandos)} comandos en {len(secuencias)} recursos")
+        with ThreadPoolExecutor(max_workers=len(secuencias)) as pool:
+            for futuro in [pool.submit(ejecutar_secuencia, secuencia)
+                           for secuencia in secuencias]:
+                futuro.result()
+    
     def simular_accion_dispositivo(self, accion: str, dispositivo: str, ubicacion: Optional[str]):
         """Simular acción en dispositivos que no tienen control real"""
         ubicacion_str = f" en {ubicacion}" if ubicacion else ""
         mensaje = f"{accion.capitalize()} {dispositivo}{ubicacion_str}"
         
         # Actualizar estado simulado
-        if dispositivo in self.estado_dispositivos:
+        if dispositivo in self.estado:
             if accion in ["encender", "apagar"]:
-                self.estado_dispositivos[dispositivo]["encendido"] = (accion == "encender")
+                self.estado.modificar(dispositivo, encendido=(accion == "encender"))
                 if ubicacion:
                     if accion == "encender":
-                        self.estado_dispositivos[dispositivo]["ubicaciones"].add(ubicacion)
+                        self.estado.modificar_ubicacion(dispositivo, ubicacion, True)
                     else:
-                        self.estado_dispositivos[dispositivo]["ubicaciones"].discard(ubicacion)
+                        self.estado.modificar_ubicacion(dispositivo, ubicacion, False)
         
         print(f"🎭 Simulando: {mensaje}")
         self.speak(f"Simulando {mensaje}")
-        self.stats['comandos_simulados'] += 1
+        self.stats.incrementar('comandos_simulados')
     
     def ejecutar_accion_inteligente_luz(self, accion: str, ubicacion: Optional[str]) -> bool:
         """Ejecutar control inteligente de luz mapeado a brillo real"""
@@ -623,17 +654,9 @@ class EjecutorAccionesIoT:
                            ubicacion: Optional[str], valor: Optional[int]):
         """Actualizar historial de comandos ejecutados"""
         try:
-            comando_historial = {
-                'timestamp': datetime.now().isoformat(),
-                'accion': accion,
-                'dispositivo': dispositivo,
-                'ubicacion': ubicacion,
-                'valor': valor,
-                'exito': True
-            }
-            
-            # En una implementación real, esto se guardaría en base de datos
-            logger.info(f"Historial actualizado: {comando_historial}")
+            # Historial compartido en SQLite (se escribe por lotes en segundo plano)
+            obtener_historial().registrar(accion.upper(), dispositivo.upper(), ubicacion, valor, exito=True)
+            logger.debug(f"Historial actualizado: {accion} {dispositivo} {ubicacion} {valor}")
             
         except Exception as e:
             logger.error(f"Error actualizando historial: {e}")
@@ -644,8 +667,8 @@ class EjecutorAccionesIoT:
     
     def get_device_status(self, dispositivo: str, ubicacion: Optional[str] = None) -> Dict[str, Any]:
         """Obtener estado actual de un dispositivo"""
-        if dispositivo in self.estado_dispositivos:
-            estado = self.estado_dispositivos[dispositivo].copy()
+        _, estado = self.estado.instantanea(dispositivo)
+        if estado is not None:
             estado['dispositivo'] = dispositivo
             estado['ubicacion'] = ubicacion
             return estado
@@ -653,11 +676,21 @@ class EjecutorAccionesIoT:
 
 # Instancia global del ejecutor
 _executor_instance = None
+_executor_lock = threading.Lock()
 
-def execute(accion: str, dispositivo: str, ubicacion: Optional[str] = None, valor: Optional[int] = None):
-    """Función principal de ejecución de acciones"""
+def _obtener_ejecutor() -> EjecutorAccionesIoT:
+    """Obtener (creando si hace falta) la instancia global del ejecutor"""
     global _executor_instance
     if _executor_instance is None:
-        _executor_instance = EjecutorAccionesIoT()
-    
-    _executor_instance.execute(accion, dispositivo, ubicacion, valor)
\ No newline at end of file
+        with _executor_lock:
+            if _executor_instance is None:
+                _executor_instance = EjecutorAccionesIoT()
+    return _executor_instance
+
+def execute(accion: str, dispositivo: str, ubicacion: Optional[str] = None, valor: Optional[int] = None):
+    """Función principal de ejecución de acciones"""
+    _obtener_ejecutor().execute(accion, dispositivo, ubicacion, valor)
+
+def execute_batch(comandos: List[Tuple[str, str, Optional[str], Optional[int]]]):
+    """Ejecutar un lote de comandos (acciones independientes en paralelo)"""
+    _obtener_ejecutor().execute_batch(comandos)
\ No newline at end of file
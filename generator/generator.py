@@ -3,20 +3,24 @@
 # ============================================================================
 
 import logging
-from typing import List, Tuple, Any, Dict, Optional
+import threading
+from typing import List, Tuple, Any, Dict, Optional, Union
 import json
 from datetime import datetime
 import uuid
 
+from parser.parser import NodoComando
+from utils.estadisticas import EstadisticasSeguras
+
 logger = logging.getLogger(__name__)
 
 class GeneradorCodigoDSL:
     def __init__(self):
-        self.stats = {
+        self.stats = EstadisticasSeguras({
             'codigos_generados': 0,
             'comandos_procesados': 0,
             'errores_generacion': 0
-        }
+        })
         
         # Plantillas para diferentes tipos de comandos
         self.plantillas = {
@@ -24,7 +28,8 @@ class GeneradorCodigoDSL:
             'accion_con_ubicacion': "{accion}_{dispositivo}_en_{habitacion}",
             'accion_con_valor': "{accion}_{dispositivo}_{valor}",
             'accion_completa': "{accion}_{dispositivo}_{valor}_en_{habitacion}",
-            'consulta': "ver_{dispositivo}"
+            'consulta': "ver_{dispositivo}",
+            'lote': "lote({comandos})"
         }
     
     def normalizar_ubicacion(self, habitacion: str) -> str:
@@ -58,11 +63,13 @@ class GeneradorCodigoDSL:
         else:
             return self.plantillas['accion_simple']
     
-    def generate_code(self, elementos_validados: Tuple[str, str, Optional[str], Optional[int]]) -> Dict[str, Any]:
-        """Generar código DSL a partir de elementos validados"""
-        self.stats['comandos_procesados'] += 1
+    def generate_code(self, elementos_validados: Union[NodoComando, Tuple[str, str, Optional[str], Optional[int]]]) -> Dict[str, Any]:
+        """Generar código DSL a partir del árbol validado o de sus elementos"""
+        self.stats.incrementar('comandos_procesados')
         
         try:
+            if isinstance(elementos_validados, NodoComando):
+                elementos_validados = elementos_validados.como_tupla()
             accion, dispositivo, habitacion, valor = elementos_validados
             
             logger.info(f"Generando código DSL para: {accion} {dispositivo}")
@@ -100,28 +107,53 @@ class GeneradorCodigoDSL:
                 }
             }
             
-            self.stats['codigos_generados'] += 1
+            self.stats.incrementar('codigos_generados')
             logger.info(f"Código DSL generado: {codigo_dsl}")
             
             return comando_completo
             
         except Exception as e:
-            self.stats['errores_generacion'] += 1
+            self.stats.incrementar('errores_generacion')
             logger.error(f"Error generando código DSL: {e}")
             raise
     
+    def generate_batch(self, comandos: List[Union[NodoComando, Tuple[str, str, Optional[str], Optional[int]]]]) -> Dict[str, Any]:
+        """Generar un único lote DSL para un enunciado con varios comandos"""
+        generados = [self.generate_code(comando) for comando in comandos]
+        if len(generados) == 1:
+            return generados[0]
+        
+        codigo_dsl = self.plantillas['lote'].format(
+            comandos=", ".join(comando['dsl'] for comando in generados)
+        )
+        logger.info(f"Lote DSL generado: {codigo_dsl}")
+        return {
+            'dsl': codigo_dsl,
+            'comandos': generados
+        }
+    
     def get_stats(self) -> Dict[str, int]:
         """Obtener estadísticas del generador"""
         return self.stats.copy()
 
 # Instancia global del generador
 _generator_instance = None
+_generator_lock = threading.Lock()
 
-def generate_code(elementos_validados: Tuple[str, str, Optional[str], Optional[int]]) -> str:
-    """Función principal de generación de código DSL"""
+def _obtener_generador() -> GeneradorCodigoDSL:
+    """Obtener (creando si hace falta) la instancia global del generador"""
     global _generator_instance
     if _generator_instance is None:
-        _generator_instance = GeneradorCodigoDSL()
-    
-    comando_completo = _generator_instance.generate_code(elementos_validados)
-    return comando_completo['dsl']
\ No newline at end of file
+        with _generator_lock:
+            if _generator_instance is None:
+                _generator_instance = GeneradorCodigoDSL()
+    return _generator_instance
+
+def generate_code(elementos_validados: Union[NodoComando, Tuple[str, str, Optional[str], Optional[int]]]) -> str:
+    """Función principal de generación de código DSL"""
+    comando_completo = _obtener_generador().generate_code(elementos_validados)
+    return comando_completo['dsl']
+
+def generate_batch(comandos: List[Union[NodoComando, Tuple[str, str, Optional[str], Optional[int]]]]) -> str:
+    """Generar el código DSL de un lote de comandos"""
+    return _obtener_generador().generate_batch(comandos)['dsl']
\ No newline at end of file
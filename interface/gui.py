@@ -405,6 +405,8 @@ class InterfazPictogramasAccesible:
             self.root.bind('<Return>', lambda e: self.start_listening())
             self.root.bind('<Escape>', lambda e: self.on_closing())
             self.root.bind('<F1>', lambda e: self.show_help())
+            self.root.bind('<F2>', lambda e: self.alternar_escucha_continua())
+            self.root.bind('<F3>', lambda e: self.alternar_modo_reconocimiento())
             
             # Asegurar que la ventana pueda recibir eventos de teclado
             self.root.focus_set()
@@ -459,6 +461,43 @@ class InterfazPictogramasAccesible:
             logger.error(f"Error iniciando escucha: {e}", exc_info=True)
             self.restore_voice_button()
     
+    def alternar_escucha_continua(self):
+        """Activar o desactivar el modo manos libres (escucha continua)"""
+        try:
+            from speech.recognizer import iniciar_escucha_continua, detener_escucha_continua
+            if getattr(self, 'escucha_continua', None):
+                detener_escucha_continua()
+                self.escucha_continua = None
+                self.update_status("🔇 Modo manos libres desactivado")
+                self.speak("Modo manos libres desactivado")
+                return
+            
+            def al_reconocer(comando):
+                self.stats['comandos_procesados'] += 1
+                self.root.after(0, lambda: self.safe_callback(comando))
+                self.root.after(0, lambda: self.update_status(f"✅ Comando procesado: {comando}"))
+            
+            self.escucha_continua = iniciar_escucha_continua(al_reconocer)
+            self.update_status("🎧 Modo manos libres: escuchando continuamente")
+            self.speak("Modo manos libres activado")
+            
+        except Exception as e:
+            logger.error(f"Error alternando escucha continua: {e}", exc_info=True)
+            self.escucha_continua = None
+            self.update_status("❌ No se pudo activar el modo manos libres")
+    
+    def alternar_modo_reconocimiento(self):
+        """Cambiar entre reconocimiento online (Google) y offline (Sphinx)"""
+        try:
+            from speech.recognizer import establecer_modo, obtener_modo
+            modo = "online" if obtener_modo() == "offline" else "offline"
+            establecer_modo(modo)
+            self.update_status(f"🌐 Reconocimiento {modo}")
+            self.speak(f"Reconocimiento {modo}")
+        except Exception as e:
+            logger.error(f"Error cambiando el modo de reconocimiento: {e}", exc_info=True)
+            self.update_status("❌ No se pudo cambiar el modo de reconocimiento")
+    
     def safe_callback(self, comando):
         """Callback seguro que no puede cerrar la ventana"""
         try:
@@ -511,6 +550,53 @@ class InterfazPictogramasAccesible:
             except:
                 pass
     
+    def ofrecer_sugerencia(self, sugerencia: str, errores: str = ""):
+        """Preguntar «¿quisiste decir …?» y procesar la reparación si se confirma"""
+        try:
+            # Asegurar que se ejecute en el hilo principal
+            if threading.current_thread() != threading.main_thread():
+                self.root.after(0, lambda: self.ofrecer_sugerencia(sugerencia, errores))
+                return
+            
+            self.speak(f"¿Quisiste decir {sugerencia}?")
+            detalle = f"{errores}\n\n" if errores else ""
+            if messagebox.askyesno("Comando no reconocido", f"{detalle}¿Quisiste decir «{sugerencia}»?"):
+                self.update_status(f"🔁 Procesando: {sugerencia}")
+                self.safe_callback(sugerencia)
+            else:
+                self.update_status("⚠️ Comando descartado")
+                
+        except Exception as e:
+            logger.error(f"Error ofreciendo sugerencia: {e}", exc_info=True)
+    
+    def escuchar_cambios(self, cola: queue.Queue, intervalo_ms: int = 100):
+        """Mostrar los cambios de estado publicados en una cola (hilo principal)"""
+        self._cola_cambios = cola
+        self._intervalo_cambios = intervalo_ms
+        self.root.after(intervalo_ms, self._vaciar_cambios)
+    
+    def _vaciar_cambios(self):
+        """Vaciar la cola de cambios y mostrar el último de cada dispositivo"""
+        try:
+            ultimos = {}
+            while True:
+                try:
+                    cambio = self._cola_cambios.get_nowait()
+                except queue.Empty:
+                    break
+                ultimos.pop(cambio.dispositivo, None)
+                ultimos[cambio.dispositivo] = cambio
+            
+            for dispositivo, cambio in ultimos.items():
+                accion = (cambio.nuevo.get('ultima_accion') or '').upper()
+                self.mostrar_pictograma(dispositivo)
+                self.update_status(f"✅ {accion} {dispositivo} completado")
+                
+        except Exception as e:
+            logger.error(f"Error mostrando cambios de estado: {e}", exc_info=True)
+        finally:
+            self.root.after(self._intervalo_cambios, self._vaciar_cambios)
+    
     def update_status(self, message: str):
         """Actualizar mensaje de estado de forma segura"""
         try:
@@ -580,6 +666,8 @@ class InterfazPictogramasAccesible:
 
                 ATAJOS DE TECLADO:
                 • Espacio/Enter: Activar micrófono
+                • F2: Activar/desactivar modo manos libres
+                • F3: Alternar reconocimiento online/offline
                 • Escape: Salir de la aplicación
                 • F1: Mostrar esta ayuda
 
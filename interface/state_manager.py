@@ -2,233 +2,387 @@
 # interface/state_manager.py - Versión corregida y completa
 # ============================================================================
 
+import atexit
 import json
 import logging
-from typing import Dict, Any, Optional
+import os
+import queue
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Mapping, NamedTuple, Optional, Tuple, Union
 from datetime import datetime
 from pathlib import Path
 
+from utils.registro import obtener_registro
+from utils.almacen_estado import (
+    AlmacenEstado, aplicar_diferencias, diferencias, estados_por_defecto, nivel_siguiente, obtener_almacen
+)
+from utils.historial import EntradaHistorial, HistorialReciente
+
 logger = logging.getLogger(__name__)
 
+# Descripción del estado tras cada acción (campo "accion", por compatibilidad)
+_ETIQUETAS_ACCION = {
+    "subir": "subido",
+    "bajar": "bajado",
+    "silenciar": "silenciado",
+    "activar": "activado",
+}
+
+# Estado devuelto para dispositivos sin estado registrado
+_ESTADO_NO_CONFIGURADO: Mapping[str, Any] = MappingProxyType({
+    'accion': 'no_configurado',
+    'estado': 'no_configurado'
+})
+
+class CambioEstado(NamedTuple):
+    """Cambio publicado a los suscriptores tras cada acción sobre un dispositivo"""
+    dispositivo: str
+    ubicacion: Optional[str]
+    anterior: Mapping[str, Any]     # Vista anterior (solo lectura)
+    nuevo: Mapping[str, Any]        # Vista nueva (solo lectura)
+    version: int
+    
+    @property
+    def cambios(self) -> Dict[str, Tuple[Any, Any]]:
+        """Solo los campos modificados: campo → (antes, después)"""
+        return {
+            campo: (self.anterior.get(campo), valor)
+            for campo, valor in self.nuevo.items()
+            if self.anterior.get(campo) != valor
+        }
+
+Suscriptor = Union[Callable[[CambioEstado], None], "queue.Queue[CambioEstado]"]
+
 class GestorEstadoIoT:
-    def __init__(self, archivo_estado: str = "estado_dispositivos.json"):
+    def __init__(self, archivo_estado: str = "estado_dispositivos.json",
+                 almacen: Optional[AlmacenEstado] = None,
+                 intervalo_compactacion: float = 60.0, max_registros_journal: int = 500,
+                 capacidad_historial: int = 100):
         self.archivo_estado = Path(archivo_estado)
-        self.estado_dispositivos = {}
-        self.historial_comandos = []
+        self.archivo_journal = self.archivo_estado.with_name(self.archivo_estado.stem + ".journal")
+        self.almacen = almacen or obtener_almacen()
+        self.historial_comandos = HistorialReciente(capacidad_historial)
+        self._lock_journal = threading.Lock()
+        self._secuencia = 0             # Último registro escrito en el journal
+        self._registros_journal = 0     # Registros aún no compactados
+        self._version_guardada = None
         self.cargar_estado()
+        
+        # Suscriptores a los cambios y última vista publicada de cada dispositivo
+        self._suscriptores: Tuple[Suscriptor, ...] = ()
+        self._lock_suscriptores = threading.Lock()
+        self._lock_publicacion = threading.Lock()
+        self._publicadas: Dict[str, Mapping[str, Any]] = dict(self.almacen.vistas()[1])
+        self._journal = open(self.archivo_journal, 'a', encoding='utf-8')
+        # Toda escritura en el almacén se anota, también las del ejecutor
+        self.almacen.observar(self._registrar_escritura)
+        
+        # Compactación en segundo plano: cada intervalo o al crecer el journal
+        self.intervalo_compactacion = intervalo_compactacion
+        self.max_registros_journal = max_registros_journal
+        self._compactar_ahora = threading.Event()
+        self._detener = threading.Event()
+        self._hilo_compactacion = threading.Thread(
+            target=self._bucle_compactacion, name="compactacion-estado", daemon=True
+        )
+        self._hilo_compactacion.start()
+        atexit.register(self.cerrar)
+    
+    @property
+    def estado_dispositivos(self) -> Dict[str, Dict[str, Any]]:
+        """Copia del estado de todos los dispositivos"""
+        return self.almacen.instantanea_global()[1]
     
     def cargar_estado(self):
-        """Cargar estado de dispositivos desde archivo"""
+        """Cargar el último snapshot y reproducir el journal posterior"""
+        secuencia_snapshot = 0
         try:
             if self.archivo_estado.exists():
                 with open(self.archivo_estado, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.estado_dispositivos = data.get('dispositivos', {})
-                    self.historial_comandos = data.get('historial', [])
+                    self.almacen.cargar(data.get('dispositivos', {}))
+                    for comando in data.get('historial', []):
+                        self.historial_comandos.agregar(EntradaHistorial.desde_dict(comando))
+                    secuencia_snapshot = data.get('secuencia', 0)
                 logger.info("Estado de dispositivos cargado exitosamente")
             else:
                 self.inicializar_estado_por_defecto()
         except Exception as e:
             logger.error(f"Error cargando estado: {e}")
             self.inicializar_estado_por_defecto()
+        
+        self._secuencia = secuencia_snapshot
+        try:
+            self._reproducir_journal(secuencia_snapshot)
+        except Exception as e:
+            logger.error(f"Error reproduciendo journal: {e}")
+        self._version_guardada = self.almacen.version
+    
+    def _reproducir_journal(self, desde: int):
+        """Aplicar los registros del journal posteriores al snapshot"""
+        if not self.archivo_journal.exists():
+            return
+        
+        reproducidos = 0
+        with open(self.archivo_journal, 'r+b') as f:
+            valido_hasta = 0
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Escritura interrumpida: se descarta la cola incompleta
+                    logger.warning("Journal con registro incompleto; se trunca")
+                    f.truncate(valido_hasta)
+                    break
+                valido_hasta += len(linea)
+                self._registros_journal += 1
+                if registro['secuencia'] <= desde:
+                    continue
+                
+                if 'cambios' in registro:
+                    with self.almacen.editar(registro['dispositivo']) as actual:
+                        aplicar_diferencias(actual, registro['cambios'])
+                if 'comando' in registro:
+                    self.historial_comandos.agregar(EntradaHistorial.desde_dict(registro['comando']))
+                self._secuencia = max(self._secuencia, registro['secuencia'])
+                reproducidos += 1
+        
+        if reproducidos:
+            logger.info(f"Journal reproducido: {reproducidos} cambios posteriores al snapshot")
     
     def inicializar_estado_por_defecto(self):
-        """Inicializar estado por defecto de dispositivos"""
-        self.estado_dispositivos = {
-            "luz": {
-                "encendido": False,
-                "ubicaciones": {},
-                "ultima_accion": None,
-                "accion": "apagado",  # Para compatibilidad
-                "timestamp": datetime.now().isoformat()
-            },
-            "ventilador": {
-                "encendido": False,
-                "ubicaciones": {},
-                "velocidad": 1,
-                "ultima_accion": None,
-                "accion": "apagado",
-                "timestamp": datetime.now().isoformat()
-            },
-            "televisor": {
-                "encendido": False,
-                "ubicaciones": {},
-                "canal": 1,
-                "volumen": 50,
-                "ultima_accion": None,
-                "accion": "apagado",
-                "timestamp": datetime.now().isoformat()
-            },
-            "calefactor": {
-                "encendido": False,
-                "ubicaciones": {},
-                "temperatura": 20,
-                "ultima_accion": None,
-                "accion": "apagado",
-                "timestamp": datetime.now().isoformat()
-            },
-            "volumen": {
-                "nivel": 50,
-                "silenciado": False,
-                "ultima_accion": None,
-                "accion": "normal",
-                "timestamp": datetime.now().isoformat()
-            },
-            "brillo": {
-                "nivel": 70,
-                "ultima_accion": None,
-                "accion": "normal",
-                "timestamp": datetime.now().isoformat()
-            }
-        }
+        """Inicializar estado por defecto de dispositivos a partir de la topología"""
+        self.almacen.cargar(estados_por_defecto(obtener_registro()))
         logger.info("Estado por defecto inicializado")
     
-    def guardar_estado(self):
-        """Guardar estado actual en archivo"""
-        try:
-            data = {
-                'dispositivos': self.estado_dispositivos,
-                'historial': self.historial_comandos[-100:],  # Mantener últimos 100
-                'ultima_actualizacion': datetime.now().isoformat()
-            }
-            
-            with open(self.archivo_estado, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info("Estado guardado exitosamente")
-        except Exception as e:
-            logger.error(f"Error guardando estado: {e}")
+    def _registrar_escritura(self, dispositivo: str, anterior: Mapping[str, Any],
+                             nuevo: Mapping[str, Any], version: int):
+        """Anotar en el journal solo los campos que cambió una escritura del almacén
+        
+        Se llama dentro del lock del dispositivo, así que sus registros quedan en
+        orden. Los valores son absolutos: reproducir dos veces un registro que ya
+        recoge el snapshot no altera el resultado.
+        """
+        cambios = diferencias(anterior, nuevo)
+        if cambios:
+            self._escribir_journal({'dispositivo': dispositivo, 'cambios': cambios})
+    
+    def _escribir_journal(self, registro: Dict[str, Any]):
+        """Añadir un registro al journal: coste proporcional al cambio, no al estado"""
+        with self._lock_journal:
+            if self._journal.closed:
+                return
+            self._secuencia += 1
+            registro['secuencia'] = self._secuencia
+            self._journal.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + "\n")
+            self._journal.flush()
+            self._registros_journal += 1
+            pendientes = self._registros_journal
+        if pendientes >= self.max_registros_journal:
+            self._compactar_ahora.set()
+    
+    def _bucle_compactacion(self):
+        """Hilo de compactación periódica del journal"""
+        while not self._detener.is_set():
+            self._compactar_ahora.wait(self.intervalo_compactacion)
+            self._compactar_ahora.clear()
+            if not self._detener.is_set():
+                self.compactar()
+    
+    def cerrar(self):
+        """Detener la compactación periódica y compactar por última vez"""
+        if self._journal.closed:
+            return
+        self.almacen.dejar_de_observar(self._registrar_escritura)
+        self._detener.set()
+        self._compactar_ahora.set()
+        self._hilo_compactacion.join(timeout=5)
+        self.compactar()
+        with self._lock_journal:
+            self._journal.close()
+    
+    def compactar(self):
+        """Reemplazar el journal por un snapshot del estado
+        
+        El historial completo de acciones está en SQLite (utils.historial); el
+        journal solo sirve para recuperar el estado tras un cierre inesperado.
+        """
+        with self._lock_journal:
+            try:
+                version, dispositivos = self.almacen.instantanea_global()
+                if self._registros_journal == 0 and version == self._version_guardada:
+                    return
+                
+                # 1. Snapshot atómico con la secuencia que ya incluye
+                historial = [entrada._asdict() for entrada in self.historial_comandos.ultimos()]
+                self.guardar_estado({
+                    'dispositivos': dispositivos,
+                    'historial': historial,
+                    'secuencia': self._secuencia,
+                    'ultima_actualizacion': datetime.now().isoformat()
+                })
+                
+                # 2. El journal vuelve a empezar vacío
+                self._journal.seek(0)
+                self._journal.truncate()
+                self._registros_journal = 0
+                self._version_guardada = version
+                logger.info("Estado compactado")
+            except Exception as e:
+                logger.error(f"Error compactando estado: {e}")
+    
+    def guardar_estado(self, data: Dict[str, Any]):
+        """Escribir un snapshot de forma atómica: archivo temporal + os.replace"""
+        temporal = self.archivo_estado.with_name(self.archivo_estado.name + ".tmp")
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.archivo_estado)
     
     def actualizar_dispositivo(self, dispositivo: str, ubicacion: Optional[str], 
-                              accion: str, valor: Optional[Any] = None):
-        """Actualizar estado de dispositivo"""
+                              accion: str, valor: Optional[Any] = None) -> Optional[CambioEstado]:
+        """Registrar la acción aplicada a un dispositivo
+        
+        Los valores (encendido, nivel, silenciado...) los escribe el ejecutor en
+        el almacén compartido; aquí se anota la acción y el historial y se publica
+        el cambio a los suscriptores. Un "ajustar" con valor también fija el nivel:
+        repetirlo no cambia nada. Las consultas (hora, batería) no tienen estado
+        y solo se anotan en el historial.
+        """
         try:
-            if dispositivo not in self.estado_dispositivos:
-                self.estado_dispositivos[dispositivo] = {}
-            
-            estado = self.estado_dispositivos[dispositivo]
-            estado['ultima_accion'] = accion
-            estado['accion'] = accion  # Para compatibilidad con main.py original
-            estado['timestamp'] = datetime.now().isoformat()
-            
-            # Actualizar estado específico según dispositivo y acción
-            if dispositivo in ["luz", "ventilador", "televisor", "calefactor"]:
-                if accion == "encender":
-                    estado['encendido'] = True
-                    estado['accion'] = "encendido"
-                    if ubicacion:
-                        if 'ubicaciones' not in estado:
-                            estado['ubicaciones'] = {}
-                        estado['ubicaciones'][ubicacion] = True
-                elif accion == "apagar":
-                    estado['encendido'] = False
-                    estado['accion'] = "apagado"
-                    if ubicacion and 'ubicaciones' in estado:
-                        estado['ubicaciones'][ubicacion] = False
-            
-            elif dispositivo == "volumen":
-                if accion == "ajustar" and valor is not None:
-                    estado['nivel'] = valor
-                    estado['silenciado'] = False
-                    estado['accion'] = f"ajustado_a_{valor}"
-                elif accion == "subir":
-                    estado['nivel'] = min(100, estado.get('nivel', 50) + 10)
-                    estado['accion'] = "subido"
-                elif accion == "bajar":
-                    estado['nivel'] = max(0, estado.get('nivel', 50) - 10)
-                    estado['accion'] = "bajado"
-                elif accion == "silenciar":
-                    estado['silenciado'] = True
-                    estado['accion'] = "silenciado"
-                elif accion == "activar":
-                    estado['silenciado'] = False
-                    estado['accion'] = "activado"
+            accion = accion.lower()
+            if dispositivo not in self.almacen:
+                self.agregar_al_historial(dispositivo, ubicacion, accion, valor)
+                return None
             
-            elif dispositivo == "brillo":
-                if accion == "ajustar" and valor is not None:
-                    estado['nivel'] = valor
+            with self.almacen.editar(dispositivo) as estado:
+                estado['ultima_accion'] = accion
+                estado['timestamp'] = datetime.now().isoformat()
+                if accion == "ajustar" and valor is not None and "nivel" in estado:
+                    estado['nivel'] = nivel_siguiente(dispositivo, estado['nivel'], accion, valor)
+                if accion in ("encender", "apagar") and "encendido" in estado:
+                    estado['accion'] = "encendido" if accion == "encender" else "apagado"
+                elif accion == "ajustar" and valor is not None:
                     estado['accion'] = f"ajustado_a_{valor}"
-                elif accion == "subir":
-                    estado['nivel'] = min(100, estado.get('nivel', 70) + 10)
-                    estado['accion'] = "subido"
-                elif accion == "bajar":
-                    estado['nivel'] = max(10, estado.get('nivel', 70) - 10)
-                    estado['accion'] = "bajado"
-            
-            # Agregar al historial
-            self.agregar_al_historial(dispositivo, ubicacion, accion, valor)
+                else:
+                    estado['accion'] = _ETIQUETAS_ACCION.get(accion, accion)
             
-            # Guardar estado
-            self.guardar_estado()
+            # El cambio de estado ya se anotó al escribirlo; falta el comando
+            comando = self.agregar_al_historial(dispositivo, ubicacion, accion, valor)
+            self._escribir_journal({'comando': comando})
             
             logger.info(f"Estado actualizado: {dispositivo} - {accion}")
+            return self._publicar(dispositivo, ubicacion)
             
         except Exception as e:
             logger.error(f"Error actualizando dispositivo: {e}")
     
-    def agregar_al_historial(self, dispositivo: str, ubicacion: Optional[str], 
-                            accion: str, valor: Optional[Any]):
-        """Agregar comando al historial"""
-        comando = {
-            'timestamp': datetime.now().isoformat(),
-            'dispositivo': dispositivo,
-            'ubicacion': ubicacion,
-            'accion': accion,
-            'valor': valor
-        }
+    def suscribir(self, suscriptor: Suscriptor) -> Suscriptor:
+        """Recibir un CambioEstado por cada acción aplicada
         
-        self.historial_comandos.append(comando)
+        Un callable se invoca en el hilo que aplica la acción (debe ser breve y
+        seguro entre hilos); a una cola se le añade el evento sin bloquear, para
+        vaciarla desde otro hilo (p. ej. el bucle principal de Tk).
+        """
+        with self._lock_suscriptores:
+            self._suscriptores += (suscriptor,)
+        return suscriptor
+    
+    def suscribir_cola(self, maxsize: int = 0) -> "queue.Queue[CambioEstado]":
+        """Crear y suscribir una cola de cambios"""
+        return self.suscribir(queue.Queue(maxsize))
+    
+    def cancelar_suscripcion(self, suscriptor: Suscriptor) -> None:
+        """Dejar de enviar cambios a un suscriptor"""
+        with self._lock_suscriptores:
+            self._suscriptores = tuple(s for s in self._suscriptores if s is not suscriptor)
+    
+    def _publicar(self, dispositivo: str, ubicacion: Optional[str]) -> Optional[CambioEstado]:
+        """Enviar a los suscriptores el cambio desde la última vista publicada
         
-        # Mantener solo los últimos 100 comandos
-        if len(self.historial_comandos) > 100:
-            self.historial_comandos = self.historial_comandos[-100:]
+        Incluye también lo que el ejecutor escribió en el almacén antes de
+        registrar la acción. Los cambios de un mismo dispositivo se publican en
+        orden de versión; entre dispositivos distintos el orden no está garantizado.
+        """
+        clave = self.almacen.clave(dispositivo)
+        with self._lock_publicacion:
+            version, nuevo = self.almacen.vista(clave)
+            if nuevo is None:
+                return None
+            anterior = self._publicadas.get(clave, _ESTADO_NO_CONFIGURADO)
+            self._publicadas[clave] = nuevo
+            cambio = CambioEstado(clave, ubicacion, anterior, nuevo, version)
+            
+            for suscriptor in self._suscriptores:
+                try:
+                    if isinstance(suscriptor, queue.Queue):
+                        suscriptor.put_nowait(cambio)
+                    else:
+                        suscriptor(cambio)
+                except queue.Full:
+                    logger.warning(f"Cola de cambios llena, descartado: {clave} v{version}")
+                except Exception as e:
+                    logger.error(f"Error notificando cambio de {clave}: {e}")
+        return cambio
     
-    def obtener_estado(self, dispositivo: str, ubicacion: Optional[str] = None) -> Dict[str, Any]:
-        """Obtener estado actual de un dispositivo"""
-        try:
-            if dispositivo in self.estado_dispositivos:
-                estado = self.estado_dispositivos[dispositivo].copy()
-                estado['dispositivo'] = dispositivo
-                estado['ubicacion'] = ubicacion
-                
-                # Información específica por ubicación si aplica
-                if ubicacion and 'ubicaciones' in estado:
-                    estado['estado_ubicacion'] = estado['ubicaciones'].get(ubicacion, False)
-                
-                return estado
-            else:
-                return {
-                    'dispositivo': dispositivo,
-                    'ubicacion': ubicacion,
-                    'accion': 'no_configurado',
-                    'estado': 'no_configurado',
-                    'timestamp': datetime.now().isoformat()
-                }
-        except Exception as e:
-            logger.error(f"Error obteniendo estado: {e}")
-            return {
-                'dispositivo': dispositivo,
-                'ubicacion': ubicacion,
-                'accion': 'error',
-                'error': str(e)
-            }
+    def agregar_al_historial(self, dispositivo: str, ubicacion: Optional[str], 
+                            accion: str, valor: Optional[Any]) -> Dict[str, Any]:
+        """Agregar comando al historial reciente (acotado: expulsa el más antiguo)"""
+        entrada = EntradaHistorial(datetime.now().isoformat(), dispositivo, ubicacion, accion, valor)
+        self.historial_comandos.agregar(entrada)
+        return entrada._asdict()
+    
+    def obtener_estado(self, dispositivo: str, ubicacion: Optional[str] = None) -> Mapping[str, Any]:
+        """Vista de solo lectura del estado actual de un dispositivo (sin copiar)
+        
+        La vista no cambia: una escritura posterior publica otra nueva. El estado
+        por habitación está en vista['ubicaciones'].
+        """
+        _, vista = self.almacen.vista(dispositivo)
+        return _ESTADO_NO_CONFIGURADO if vista is None else vista
+    
+    def obtener_estado_versionado(self, dispositivo: str) -> Tuple[int, Mapping[str, Any]]:
+        """(versión, vista); si la versión no cambió desde la última lectura, nada cambió"""
+        version, vista = self.almacen.vista(dispositivo)
+        return version, _ESTADO_NO_CONFIGURADO if vista is None else vista
+    
+    @property
+    def version(self) -> int:
+        """Versión global del estado: permite saltarse el trabajo si no cambió nada"""
+        return self.almacen.version
 
 # Instancia global del gestor de estado
 _state_manager_instance = None
+_state_manager_lock = threading.Lock()
 
-def obtener_estado(dispositivo: str, ubicacion: Optional[str] = None) -> Dict[str, Any]:
-    """Función principal para obtener estado de dispositivo"""
+def _obtener_gestor() -> GestorEstadoIoT:
+    """Obtener (creando si hace falta) la instancia global del gestor de estado"""
     global _state_manager_instance
     if _state_manager_instance is None:
-        _state_manager_instance = GestorEstadoIoT()
-    
-    return _state_manager_instance.obtener_estado(dispositivo, ubicacion)
+        with _state_manager_lock:
+            if _state_manager_instance is None:
+                _state_manager_instance = GestorEstadoIoT()
+    return _state_manager_instance
+
+def obtener_estado(dispositivo: str, ubicacion: Optional[str] = None) -> Mapping[str, Any]:
+    """Función principal para obtener estado de dispositivo (vista de solo lectura)"""
+    return _obtener_gestor().obtener_estado(dispositivo, ubicacion)
+
+def obtener_estado_versionado(dispositivo: str) -> Tuple[int, Mapping[str, Any]]:
+    """Estado de un dispositivo junto a su versión"""
+    return _obtener_gestor().obtener_estado_versionado(dispositivo)
 
 def actualizar_estado(dispositivo: str, ubicacion: Optional[str], 
-                     accion: str, valor: Optional[Any] = None):
+                     accion: str, valor: Optional[Any] = None) -> Optional[CambioEstado]:
     """Función principal para actualizar estado de dispositivo"""
-    global _state_manager_instance
-    if _state_manager_instance is None:
-        _state_manager_instance = GestorEstadoIoT()
-    
-    _state_manager_instance.actualizar_dispositivo(dispositivo, ubicacion, accion, valor)
\ No newline at end of file
+    return _obtener_gestor().actualizar_dispositivo(dispositivo, ubicacion, accion, valor)
+
+def suscribir_cambios(suscriptor: Suscriptor) -> Suscriptor:
+    """Suscribir un callable o una cola a los cambios de estado"""
+    return _obtener_gestor().suscribir(suscriptor)
+
+def suscribir_cola_cambios(maxsize: int = 0) -> "queue.Queue[CambioEstado]":
+    """Cola de cambios de estado, p. ej. para vaciarla desde el bucle de Tk"""
+    return _obtener_gestor().suscribir_cola(maxsize)
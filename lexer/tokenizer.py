@@ -5,12 +5,285 @@
 import re
 import json
 import logging
-from typing import List, Tuple, Dict, Any
+import threading
+from enum import IntEnum
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Tuple, Dict, Any, Iterable, Optional, Set
+
+from utils.estadisticas import EstadisticasSeguras
 
 logger = logging.getLogger(__name__)
 
+# Tabla única de normalización (minúsculas ya aplicadas antes de traducir)
+_TABLA_ACENTOS = str.maketrans("áéíóúÁÉÍÓÚñÑ", "aeiouAEIOUnN")
+# Comas y punto y coma separan comandos: se aíslan como palabra propia
+_TABLA_ACENTOS.update({ord(","): " , ", ord(";"): " , "})
+
+class TipoToken(IntEnum):
+    """Tipos de token codificados como enteros (cada valor es un bit en las máscaras)"""
+    EOF = 0
+    DESCONOCIDO = 1
+    NUMERO = 2
+    # Acciones
+    ENCENDER = 3
+    APAGAR = 4
+    SUBIR = 5
+    BAJAR = 6
+    AJUSTAR = 7
+    SILENCIAR = 8
+    ACTIVAR = 9
+    VER = 10
+    # Dispositivos
+    LUZ = 11
+    VENTILADOR = 12
+    TELEVISOR = 13
+    CALEFACTOR = 14
+    VOLUMEN = 15
+    BRILLO = 16
+    # Consultas
+    BATERIA = 17
+    HORA = 18
+    # Habitaciones
+    COCINA = 19
+    DORMITORIO = 20
+    SALA = 21
+    BAÑO = 22
+    OFICINA = 23
+    # Preposiciones y artículos
+    EN = 24
+    A = 25
+    DE = 26
+    DEL = 27
+    LA = 28
+    EL = 29
+    # Separador de comandos compuestos ("y", "luego", ",")
+    SEPARADOR = 30
+
+def mascara(*tipos: TipoToken) -> int:
+    """Construir una máscara de bits a partir de tipos de token"""
+    resultado = 0
+    for tipo in tipos:
+        resultado |= 1 << tipo
+    return resultado
+
+MASCARA_ACCIONES = mascara(
+    TipoToken.ENCENDER, TipoToken.APAGAR, TipoToken.SUBIR, TipoToken.BAJAR,
+    TipoToken.AJUSTAR, TipoToken.SILENCIAR, TipoToken.ACTIVAR, TipoToken.VER
+)
+MASCARA_DISPOSITIVOS = mascara(
+    TipoToken.LUZ, TipoToken.VENTILADOR, TipoToken.TELEVISOR,
+    TipoToken.CALEFACTOR, TipoToken.VOLUMEN, TipoToken.BRILLO
+)
+MASCARA_CONSULTAS = mascara(TipoToken.BATERIA, TipoToken.HORA)
+MASCARA_HABITACIONES = mascara(
+    TipoToken.COCINA, TipoToken.DORMITORIO, TipoToken.SALA,
+    TipoToken.BAÑO, TipoToken.OFICINA
+)
+
+# Únicos tipos a los que se corrige una palabra desconocida: sustantivos largos
+# que el ASR suele deformar ("bentilador"). Acciones, habitaciones, preposiciones
+# y separadores se parecen demasiado a palabras corrientes ("despacio" no es
+# "despacho", "fuego" no es "luego") y corregirlas cambiaría el comando en silencio
+MASCARA_CORREGIBLES = MASCARA_DISPOSITIVOS | MASCARA_CONSULTAS
+
+# Tipos de token que no aportan al análisis sintáctico
+_MASCARA_IGNORADOS = mascara(TipoToken.DESCONOCIDO, TipoToken.LA, TipoToken.EL)
+
+class Token:
+    """Token compacto; las instancias del léxico se comparten y no deben modificarse"""
+    __slots__ = ('tipo', 'valor')
+    
+    def __init__(self, tipo: TipoToken, valor: Any):
+        self.tipo = tipo
+        self.valor = valor
+    
+    def como_tupla(self) -> Tuple[str, Any]:
+        """Forma heredada (tipo, valor) con el tipo como cadena"""
+        return (self.tipo.name, self.valor)
+    
+    def __eq__(self, otro: object) -> bool:
+        if isinstance(otro, Token):
+            return self.tipo == otro.tipo and self.valor == otro.valor
+        return NotImplemented
+    
+    def __hash__(self) -> int:
+        return hash((self.tipo, self.valor))
+    
+    def __repr__(self) -> str:
+        return f"Token({self.tipo.name}, {self.valor!r})"
+
+def a_tuplas(tokens: Iterable[Token]) -> List[Tuple[str, Any]]:
+    """Adaptador: convertir tokens a la forma heredada de tuplas (str, valor)"""
+    return [token.como_tupla() for token in tokens]
+
+def desde_tuplas(tokens: Iterable[Any]) -> List[Token]:
+    """Adaptador: aceptar tuplas heredadas (str, valor) o Token y devolver Token"""
+    if isinstance(tokens, list) and all(isinstance(token, Token) for token in tokens):
+        return tokens
+    return [
+        token if isinstance(token, Token) else Token(TipoToken[token[0]], token[1])
+        for token in tokens
+    ]
+
+# Palabras corrientes a un error de distancia de un dispositivo o consulta: son
+# palabras válidas por sí mismas y no deben corregirse ("brilla" no es "brillo")
+PALABRAS_COMUNES = frozenset({
+    "brilla", "brillan", "brille", "brillar",
+})
+
+class IndiceDifuso:
+    """Índice de borrados (estilo SymSpell) para corregir palabras mal reconocidas por el ASR"""
+    
+    def __init__(self, lexico: Dict[str, str], longitud_minima: int = 5,
+                 tamano_cache: int = 1024, excluidas: Iterable[str] = ()):
+        self.lexico = lexico
+        self.longitud_minima = longitud_minima
+        self.excluidas = frozenset(excluidas)
+        # Borrado -> palabras del léxico que lo generan
+        self.borrados: Dict[str, Set[str]] = {}
+        for palabra in lexico:
+            if len(palabra) >= longitud_minima:
+                for variante in self._variantes(palabra, self.distancia_maxima(palabra)):
+                    self.borrados.setdefault(variante, set()).add(palabra)
+        # Caché LRU acotada de correcciones ya resueltas (incluye fallos)
+        self.buscar = lru_cache(maxsize=tamano_cache)(self._buscar)
+    
+    def distancia_maxima(self, palabra: str) -> int:
+        """Distancia de edición tolerada según la longitud de la palabra"""
+        if len(palabra) < self.longitud_minima:
+            return 0
+        return 1 if len(palabra) <= 8 else 2
+    
+    @staticmethod
+    def _variantes(palabra: str, distancia: int) -> Set[str]:
+        """Generar la palabra y todos sus borrados hasta la distancia indicada"""
+        variantes = {palabra}
+        frontera = {palabra}
+        for _ in range(distancia):
+            siguiente = set()
+            for actual in frontera:
+                for i in range(len(actual)):
+                    siguiente.add(actual[:i] + actual[i + 1:])
+            variantes |= siguiente
+            frontera = siguiente
+        return variantes
+    
+    @staticmethod
+    def distancia(a: str, b: str) -> int:
+        """Distancia Damerau-Levenshtein (transposiciones adyacentes)"""
+        anterior2 = None
+        anterior = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            actual = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                coste = 0 if a[i - 1] == b[j - 1] else 1
+                actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + coste)
+                if (anterior2 is not None and i > 1 and j > 1
+                        and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                    actual[j] = min(actual[j], anterior2[j - 2] + 1)
+            anterior2, anterior = anterior, actual
+        return anterior[len(b)]
+    
+    def _buscar(self, palabra: str) -> Optional[str]:
+        """Devolver la palabra del léxico más cercana, o None si no hay una única candidata"""
+        maxima = self.distancia_maxima(palabra)
+        if maxima == 0 or palabra in self.excluidas:
+            return None
+        
+        candidatas = set()
+        for variante in self._variantes(palabra, maxima):
+            candidatas |= self.borrados.get(variante, set())
+        
+        mejor_distancia = maxima + 1
+        mejores = []
+        for candidata in candidatas:
+            d = self.distancia(palabra, candidata)
+            if d > min(maxima, self.distancia_maxima(candidata)):
+                continue
+            if d < mejor_distancia:
+                mejor_distancia, mejores = d, [candidata]
+            elif d == mejor_distancia:
+                mejores.append(candidata)
+        
+        # Empates entre categorías distintas son ambiguos: no adivinar
+        if not mejores or len({self.lexico[c] for c in mejores}) > 1:
+            return None
+        return min(mejores)
+
+class AutomataFrases:
+    """Autómata Aho-Corasick sobre palabras para reconocer frases de varias palabras"""
+    
+    def __init__(self, frases: Dict[str, str]):
+        # Tabla de transiciones por nodo, enlace de fallo y salidas (longitud, tipo)
+        self.transiciones: List[Dict[str, int]] = [{}]
+        self.fallo: List[int] = [0]
+        self.salidas: List[List[Tuple[int, str]]] = [[]]
+        
+        for frase, tipo in frases.items():
+            palabras = frase.split()
+            nodo = 0
+            for palabra in palabras:
+                siguiente = self.transiciones[nodo].get(palabra)
+                if siguiente is None:
+                    siguiente = len(self.transiciones)
+                    self.transiciones[nodo][palabra] = siguiente
+                    self.transiciones.append({})
+                    self.fallo.append(0)
+                    self.salidas.append([])
+                nodo = siguiente
+            self.salidas[nodo].append((len(palabras), tipo))
+        
+        self._construir_fallos()
+    
+    def _construir_fallos(self) -> None:
+        """Calcular enlaces de fallo en anchura y heredar las salidas de los sufijos"""
+        pendientes = list(self.transiciones[0].values())
+        while pendientes:
+            siguientes = []
+            for nodo in pendientes:
+                for palabra, hijo in self.transiciones[nodo].items():
+                    destino = self.fallo[nodo]
+                    while destino and palabra not in self.transiciones[destino]:
+                        destino = self.fallo[destino]
+                    enlace = self.transiciones[destino].get(palabra, 0)
+                    self.fallo[hijo] = enlace if enlace != hijo else 0
+                    self.salidas[hijo] = self.salidas[hijo] + self.salidas[self.fallo[hijo]]
+                    siguientes.append(hijo)
+            pendientes = siguientes
+    
+    def prefijo_abierto(self, palabras: List[str]) -> bool:
+        """Indicar si las palabras son el comienzo de alguna frase todavía sin terminar"""
+        nodo = 0
+        for palabra in palabras:
+            nodo = self.transiciones[nodo].get(palabra)
+            if nodo is None:
+                return False
+        return bool(self.transiciones[nodo])
+    
+    def buscar(self, palabras: List[str]) -> Dict[int, Tuple[int, str]]:
+        """Devolver {inicio: (longitud, tipo)} con las coincidencias más largas sin solapamiento"""
+        coincidencias = []
+        nodo = 0
+        for fin, palabra in enumerate(palabras):
+            while nodo and palabra not in self.transiciones[nodo]:
+                nodo = self.fallo[nodo]
+            nodo = self.transiciones[nodo].get(palabra, 0)
+            for longitud, tipo in self.salidas[nodo]:
+                coincidencias.append((fin - longitud + 1, longitud, tipo))
+        
+        # Preferir la coincidencia más a la izquierda y, a igual inicio, la más larga
+        coincidencias.sort(key=lambda c: (c[0], -c[1]))
+        seleccion = {}
+        libre_desde = 0
+        for inicio, longitud, tipo in coincidencias:
+            if inicio >= libre_desde:
+                seleccion[inicio] = (longitud, tipo)
+                libre_desde = inicio + longitud
+        return seleccion
+
 class TokenizerIoT:
-    def __init__(self):
+    def __init__(self, corregir_errores: bool = True):
         # Definir categorías de tokens
         self.ACCIONES = {
             "encender": "ENCENDER",
@@ -96,6 +369,14 @@ class TokenizerIoT:
             "reloj": "HORA"
         }
         
+        self.CONJUNCIONES = {
+            "y": "SEPARADOR",
+            "luego": "SEPARADOR",
+            "despues": "SEPARADOR",
+            "después": "SEPARADOR",
+            ",": "SEPARADOR"
+        }
+        
         self.PREPOSICIONES = {
             "en": "EN",
             "a": "A",
@@ -105,30 +386,70 @@ class TokenizerIoT:
             "el": "EL"
         }
         
+        # Frases de varias palabras que forman un único token
+        self.FRASES = {
+            "cuarto de baño": "BAÑO",
+            "cuarto de bano": "BAÑO",
+            "sala de estar": "SALA",
+            "cuarto de estudio": "OFICINA",
+            "habitacion principal": "DORMITORIO",
+            "cuarto de dormir": "DORMITORIO",
+            "equipo de sonido": "VOLUMEN",
+            "nivel de brillo": "BRILLO",
+            "nivel de volumen": "VOLUMEN",
+            "aparato de television": "TELEVISOR"
+        }
+        
         # Compilar expresión regular para números
         self.numero_pattern = re.compile(r'\b\d+\b')
         
+        # Léxico compilado: una sola tabla congelada palabra -> tipo
+        self.lexico = self.compilar_lexico()
+        
+        # Autómata de frases compilado una sola vez
+        self.automata_frases = AutomataFrases({
+            self.normalizar_texto(frase): TipoToken[tipo] for frase, tipo in self.FRASES.items()
+        })
+        
+        # Corrección de errores de reconocimiento (p. ej. "bentilador")
+        self.indice_difuso = (IndiceDifuso(
+            {palabra: tipo for palabra, tipo in self.lexico.items() if (1 << tipo) & MASCARA_CORREGIBLES},
+            excluidas=PALABRAS_COMUNES
+        ) if corregir_errores else None)
+        
         # Estadísticas
-        self.stats = {
+        self.stats = EstadisticasSeguras({
             'tokens_procesados': 0,
             'tokens_desconocidos': 0,
+            'tokens_corregidos': 0,
             'comandos_tokenizados': 0
+        })
+    
+    def compilar_lexico(self) -> MappingProxyType:
+        """Fusionar las categorías en una tabla de búsqueda única y de solo lectura"""
+        lexico = {}
+        # Orden de prioridad: la primera categoría que define una palabra gana
+        for categoria in (self.ACCIONES, self.DISPOSITIVOS, self.HABITACIONES,
+                          self.CONSULTAS, self.PREPOSICIONES, self.CONJUNCIONES):
+            for palabra, tipo in categoria.items():
+                lexico.setdefault(self.normalizar_texto(palabra).strip(), TipoToken[tipo])
+        
+        # Un único Token compartido por palabra conocida
+        self._tokens_internados = {
+            palabra: Token(tipo, palabra) for palabra, tipo in lexico.items()
         }
+        return MappingProxyType(lexico)
+    
+    def palabra_canonica(self, tipo: TipoToken) -> str:
+        """Primera palabra del léxico para un tipo (para proponer correcciones)"""
+        for palabra, tipo_lexico in self.lexico.items():
+            if tipo_lexico == tipo:
+                return palabra
+        return tipo.name.lower()
     
     def normalizar_texto(self, texto: str) -> str:
         """Normalizar texto eliminando acentos y caracteres especiales"""
-        # Mapeo de caracteres con acento a sin acento
-        acentos = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
-            'ñ': 'n', 'Ñ': 'N'
-        }
-        
-        texto_normalizado = texto.lower().strip()
-        for con_acento, sin_acento in acentos.items():
-            texto_normalizado = texto_normalizado.replace(con_acento, sin_acento)
-        
-        return texto_normalizado
+        return texto.lower().strip().translate(_TABLA_ACENTOS)
     
     def extraer_numeros(self, texto: str) -> List[Tuple[int, str]]:
         """Extraer números del texto con sus posiciones"""
@@ -137,68 +458,198 @@ class TokenizerIoT:
             numeros.append((match.start(), match.group()))
         return numeros
     
-    def tokenizar_palabra(self, palabra: str) -> Tuple[str, str]:
+    def _clasificar(self, palabra_norm: str) -> Token:
+        """Clasificar una palabra ya normalizada contra el léxico compilado"""
+        token = self._tokens_internados.get(palabra_norm)
+        if token is not None:
+            return token
+        if palabra_norm.isdigit():
+            return Token(TipoToken.NUMERO, int(palabra_norm))
+        if self.indice_difuso is not None:
+            corregida = self.indice_difuso.buscar(palabra_norm)
+            if corregida is not None:
+                self.stats.incrementar('tokens_corregidos')
+                logger.debug(f"Corrección difusa: '{palabra_norm}' -> '{corregida}'")
+                return self._tokens_internados[corregida]
+        self.stats.incrementar('tokens_desconocidos')
+        return Token(TipoToken.DESCONOCIDO, palabra_norm)
+    
+    def tokenizar_palabra(self, palabra: str) -> Token:
         """Tokenizar una palabra individual"""
-        palabra_norm = self.normalizar_texto(palabra)
-        
-        # Verificar en orden de prioridad
-        if palabra_norm in self.ACCIONES:
-            return (self.ACCIONES[palabra_norm], palabra_norm)
-        elif palabra_norm in self.DISPOSITIVOS:
-            return (self.DISPOSITIVOS[palabra_norm], palabra_norm)
-        elif palabra_norm in self.HABITACIONES:
-            return (self.HABITACIONES[palabra_norm], palabra_norm)
-        elif palabra_norm in self.CONSULTAS:
-            return (self.CONSULTAS[palabra_norm], palabra_norm)
-        elif palabra_norm in self.PREPOSICIONES:
-            return (self.PREPOSICIONES[palabra_norm], palabra_norm)
-        elif palabra_norm.isdigit():
-            return ("NUMERO", int(palabra_norm))
-        else:
-            self.stats['tokens_desconocidos'] += 1
-            return ("DESCONOCIDO", palabra_norm)
-    
-    def tokenizar(self, comando: str) -> List[Tuple[str, Any]]:
+        return self._clasificar(self.normalizar_texto(palabra))
+    
+    def _segmentar(self, palabras: List[str]) -> List[Tuple[int, int, Optional[Token]]]:
+        """Dividir palabras normalizadas en segmentos (inicio, fin, token o None si se ignora)"""
+        frases = self.automata_frases.buscar(palabras)
+        clasificar = self._clasificar
+        segmentos = []
+        i = 0
+        while i < len(palabras):
+            if i in frases:
+                longitud, tipo = frases[i]
+                segmentos.append((i, i + longitud, Token(tipo, " ".join(palabras[i:i + longitud]))))
+                i += longitud
+                continue
+            token = clasificar(palabras[i])
+            if (1 << token.tipo) & _MASCARA_IGNORADOS:
+                token = None
+            segmentos.append((i, i + 1, token))
+            i += 1
+        self.stats.incrementar('tokens_procesados', len(segmentos))
+        return segmentos
+    
+    def _tokenizar_normalizado(self, comando_normalizado: str) -> List[Token]:
+        """Tokenizar un comando ya normalizado, descartando tokens irrelevantes"""
+        return [
+            token for _, _, token in self._segmentar(comando_normalizado.split())
+            if token is not None
+        ]
+    
+    def tokenizar(self, comando: str) -> List[Token]:
         """Tokenizar comando completo"""
         if not comando or not comando.strip():
             return []
         
-        self.stats['comandos_tokenizados'] += 1
-        tokens = []
+        self.stats.incrementar('comandos_tokenizados')
         
-        # Normalizar y dividir en palabras
+        # Normalizar una sola vez; las palabras ya no se renormalizan
         comando_normalizado = self.normalizar_texto(comando)
-        palabras = comando_normalizado.split()
         
         logger.info(f"Tokenizando: '{comando}' -> '{comando_normalizado}'")
         
-        for palabra in palabras:
-            if palabra:  # Evitar palabras vacías
-                tipo_token, valor_token = self.tokenizar_palabra(palabra)
-                tokens.append((tipo_token, valor_token))
-                self.stats['tokens_procesados'] += 1
-                logger.debug(f"Token: {tipo_token} = {valor_token}")
-        
-        # Filtrar tokens irrelevantes para el análisis
-        tokens_filtrados = [
-            (tipo, valor) for tipo, valor in tokens 
-            if tipo not in ["DESCONOCIDO", "LA", "EL"]
-        ]
+        tokens_filtrados = self._tokenizar_normalizado(comando_normalizado)
+        if logger.isEnabledFor(logging.DEBUG):
+            for token in tokens_filtrados:
+                logger.debug(f"Token: {token.tipo.name} = {token.valor}")
         
         logger.info(f"Tokens generados: {len(tokens_filtrados)}")
         return tokens_filtrados
     
+    def tokenizar_lote(self, comandos: Iterable[str]) -> List[List[Token]]:
+        """Tokenizar muchos comandos en una sola llamada, sin registro por comando"""
+        normalizar = self.normalizar_texto
+        tokenizar_normalizado = self._tokenizar_normalizado
+        resultado = []
+        procesados = 0
+        for comando in comandos:
+            comando_normalizado = normalizar(comando) if comando else ""
+            if not comando_normalizado:
+                resultado.append([])
+                continue
+            procesados += 1
+            resultado.append(tokenizar_normalizado(comando_normalizado))
+        
+        self.stats.incrementar('comandos_tokenizados', procesados)
+        logger.info(f"Lote tokenizado: {procesados} comandos")
+        return resultado
+    
     def get_stats(self) -> Dict[str, int]:
         """Obtener estadísticas del tokenizador"""
         return self.stats.copy()
 
+class TokenizadorIncremental:
+    """Tokenización incremental de hipótesis parciales del reconocedor de voz
+    
+    Los tokens ya emitidos como estables no cambian; en cada actualización solo
+    se vuelve a tokenizar la cola de texto que todavía puede variar (la última
+    palabra incompleta y las que aún podrían formar parte de una frase).
+    """
+    
+    def __init__(self, tokenizer: Optional[TokenizerIoT] = None):
+        self.tokenizer = tokenizer or _obtener_tokenizer()
+        self.reiniciar()
+    
+    def reiniciar(self) -> None:
+        """Descartar todo el texto y los tokens acumulados"""
+        self.texto = ""            # Texto normalizado acumulado
+        self._inicio_cola = 0      # Desplazamiento del texto aún no estable
+        self.estables: List[Token] = []
+        self.provisionales: List[Token] = []
+        self.finalizado = False
+        self.reinicios = 0
+    
+    @property
+    def tokens(self) -> List[Token]:
+        """Tokens estables seguidos de los provisionales"""
+        return self.estables + self.provisionales
+    
+    def agregar(self, fragmento: str) -> List[Token]:
+        """Añadir un fragmento de texto al final de la hipótesis"""
+        self.texto += fragmento.lower().translate(_TABLA_ACENTOS)
+        return self._retokenizar_cola()
+    
+    def actualizar(self, hipotesis: str) -> List[Token]:
+        """Reemplazar la hipótesis completa (los reconocedores revisan la cola)"""
+        nuevo = hipotesis.lower().translate(_TABLA_ACENTOS)
+        if not nuevo.startswith(self.texto[:self._inicio_cola]):
+            # La revisión afecta a tokens ya estables: empezar de nuevo
+            reinicios = self.reinicios + 1
+            logger.warning("Hipótesis revisada antes de la zona estable; reiniciando")
+            self.reiniciar()
+            self.reinicios = reinicios
+        self.texto = nuevo
+        return self._retokenizar_cola()
+    
+    def finalizar(self) -> List[Token]:
+        """Marcar la hipótesis como definitiva y estabilizar todos los tokens"""
+        self.finalizado = True
+        self._retokenizar_cola()
+        return self.estables
+    
+    def _retokenizar_cola(self) -> List[Token]:
+        """Volver a tokenizar solo la cola y promover los tokens ya decididos"""
+        cola = self.texto[self._inicio_cola:]
+        coincidencias = list(re.finditer(r'\S+', cola))
+        palabras = [m.group() for m in coincidencias]
+        
+        # La última palabra puede estar a medias mientras no haya un espacio detrás
+        completas = len(palabras)
+        if palabras and not self.finalizado and not cola[-1].isspace():
+            completas -= 1
+        # Un segmento es definitivo cuando sus palabras están completas y no
+        # empiezan una frase que las palabras siguientes aún podrían completar
+        automata = self.tokenizer.automata_frases
+        
+        fin_estable = 0
+        self.provisionales = []
+        for inicio, fin, token in self.tokenizer._segmentar(palabras):
+            if (not self.provisionales and fin <= completas and
+                    (self.finalizado or not automata.prefijo_abierto(palabras[inicio:completas]))):
+                if token is not None:
+                    self.estables.append(token)
+                fin_estable = fin
+            elif token is not None:
+                self.provisionales.append(token)
+        
+        if fin_estable:
+            self._inicio_cola += coincidencias[fin_estable - 1].end()
+        return self.tokens
+
 # Instancia global del tokenizador
 _tokenizer_instance = None
+_tokenizer_lock = threading.Lock()
 
-def tokenizar(comando: str) -> List[Tuple[str, Any]]:
-    """Función principal de tokenización"""
+def _obtener_tokenizer() -> TokenizerIoT:
+    """Obtener (creando si hace falta) la instancia global del tokenizador"""
     global _tokenizer_instance
     if _tokenizer_instance is None:
-        _tokenizer_instance = TokenizerIoT()
-    
-    return _tokenizer_instance.tokenizar(comando)
\ No newline at end of file
+        with _tokenizer_lock:
+            if _tokenizer_instance is None:
+                _tokenizer_instance = TokenizerIoT()
+    return _tokenizer_instance
+
+def tokenizar(comando: str) -> List[Token]:
+    """Función principal de tokenización"""
+    return _obtener_tokenizer().tokenizar(comando)
+
+def palabra_canonica(tipo: TipoToken) -> str:
+    """Palabra representativa de un tipo de token"""
+    return _obtener_tokenizer().palabra_canonica(tipo)
+
+def normalizar(comando: str) -> str:
+    """Forma canónica de un comando (sin acentos, minúsculas, espacios simples)"""
+    return " ".join(_obtener_tokenizer().normalizar_texto(comando).split())
+
+def tokenizar_lote(comandos: Iterable[str]) -> List[List[Token]]:
+    """Tokenizar un lote de comandos (p. ej. al reprocesar registros)"""
+    return _obtener_tokenizer().tokenizar_lote(comandos)
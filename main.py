@@ -1,16 +1,18 @@
 # main.py - DEFINITIVA: Mantiene GUI abierta garantizado
 
-from speech.recognizer import reconocer_comando_voz
-from lexer.tokenizer import tokenizar
-from parser.parser import analizar
-from semantic.validator import validar
-from generator.generator import generate_code
-from executor.executor import execute
-from interface.state_manager import obtener_estado, actualizar_estado
+from speech.recognizer import reconocer_comando_voz, establecer_modo
+from lexer.tokenizer import tokenizar, normalizar
+from parser.parser import analizar_lote, analizar_con_recuperacion
+from semantic.validator import validar, validar_transicion_estado
+from generator.generator import generate_batch
+from executor.executor import execute, execute_batch
+from interface.state_manager import obtener_estado, actualizar_estado, suscribir_cola_cambios
 from interface.gui import InterfazPictogramas
+from utils.estadisticas import EstadisticasSeguras
 import threading
 import logging
 import sys
+from collections import OrderedDict
 
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO)
@@ -20,88 +22,164 @@ logger = logging.getLogger(__name__)
 gui = None
 processing_active = True
 
-def procesar_comando(comando):
-    """Procesar comando con manejo de errores mejorado"""
-    try:
-        print("\n═══════════════════════════════════════")
-        print("🎙️ Comando recibido:", comando)
-        print("═══════════════════════════════════════\n")
+class CacheCompilacion:
+    """Caché LRU acotada de comandos ya compilados, indexada por el texto normalizado"""
+    
+    def __init__(self, capacidad: int = 128):
+        self.capacidad = capacidad
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = EstadisticasSeguras({'aciertos': 0, 'fallos': 0})
+    
+    def obtener(self, clave):
+        """Devolver ([(accion, dispositivo, ubicacion, valor), ...], codigo) o None"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+        self.stats.incrementar('fallos' if entrada is None else 'aciertos')
+        return entrada
+    
+    def guardar(self, clave, elementos, codigo):
+        """Guardar los comandos validados y su DSL, expulsando el menos usado"""
+        with self._lock:
+            self._entradas[clave] = (elementos, codigo)
+            self._entradas.move_to_end(clave)
+            if len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+    
+    def get_stats(self):
+        """Obtener estadísticas de la caché"""
+        return dict(self.stats.copy(), entradas=len(self._entradas))
 
-        comando = comando.lower().strip()
-        print("📥 Entrada normalizada:")
-        print("  ", comando, "\n")
+cache_compilacion = CacheCompilacion()
 
-        print("═══════════════════════════════════════")
-        print("🔠 Análisis léxico (tokenización):")
-        tokens = tokenizar(comando)
-        if not tokens:
-            print("❌ Error léxico: No se pudieron generar tokens.\n")
-            return
-        for i, token in enumerate(tokens):
-            print(f"  Token {i+1}: {token}")
-        print("═══════════════════════════════════════\n")
+def compilar_comando(comando):
+    """Ejecutar el front-end del compilador; devuelve (lista de elementos, codigo) o None"""
+    print("═══════════════════════════════════════")
+    print("🔠 Análisis léxico (tokenización):")
+    tokens = tokenizar(comando)
+    if not tokens:
+        print("❌ Error léxico: No se pudieron generar tokens.\n")
+        return None
+    for i, token in enumerate(tokens):
+        print(f"  Token {i+1}: {token}")
+    print("═══════════════════════════════════════\n")
 
-        print("═══════════════════════════════════════")
-        print("🧠 Análisis sintáctico (estructura):")
-        try:
-            analizar(tokens)
-            print("✅ Sintaxis válida")
-        except Exception as e:
-            print(f"❌ Error de sintaxis: {str(e)}")
-            print("═══════════════════════════════════════\n")
-            return
+    print("═══════════════════════════════════════")
+    print("🧠 Análisis sintáctico (estructura):")
+    try:
+        nodos = analizar_lote(tokens)
+        print(f"✅ Sintaxis válida ({len(nodos)} comando{'s' if len(nodos) > 1 else ''})")
+    except Exception as e:
+        print(f"❌ Error de sintaxis: {str(e)}")
+        proponer_reparacion(tokens)
         print("═══════════════════════════════════════\n")
+        return None
+    print("═══════════════════════════════════════\n")
 
-        print("═══════════════════════════════════════")
-        print("🎯 Análisis semántico (verificando significado):")
-        try:
-            accion, dispositivo, ubicacion, valor = validar(tokens)
+    print("═══════════════════════════════════════")
+    print("🎯 Análisis semántico (verificando significado):")
+    elementos = []
+    try:
+        for nodo in nodos:
+            accion, dispositivo, ubicacion, valor = validar(nodo)
             print(f"✅ Acción: {accion}")
             print(f"✅ Dispositivo: {dispositivo}")
             print(f"✅ Ubicación: {ubicacion or 'No especificada'}")
             print(f"✅ Valor: {valor if valor is not None else 'No especificado'}")
-        except Exception as e:
-            print(f"❌ Error semántico: {str(e)}")
-            print("═══════════════════════════════════════\n")
-            return
+            elementos.append((accion, dispositivo, ubicacion, valor))
+    except Exception as e:
+        print(f"❌ Error semántico: {str(e)}")
         print("═══════════════════════════════════════\n")
+        return None
+    print("═══════════════════════════════════════\n")
 
-        print("═══════════════════════════════════════")
-        print("🧾 Generación de código:")
-        try:
-            codigo = generate_code((accion, dispositivo, ubicacion, valor))
-            print(f"  Código generado: {codigo}")
-        except Exception as e:
-            print(f"❌ Error generando código: {str(e)}")
-            return
+    print("═══════════════════════════════════════")
+    print("🧾 Generación de código:")
+    try:
+        codigo = generate_batch(nodos)
+        print(f"  Código generado: {codigo}")
+    except Exception as e:
+        print(f"❌ Error generando código: {str(e)}")
+        return None
+    print("═══════════════════════════════════════\n")
+
+    return elementos, codigo
+
+def proponer_reparacion(tokens):
+    """Informar de todos los errores sintácticos y ofrecer la reparación más probable"""
+    resultados = analizar_con_recuperacion(tokens)
+    errores = [e for resultado in resultados for e in resultado.errores]
+    for n, resultado in enumerate(resultados, start=1):
+        for error in resultado.errores:
+            print(f"  ⚠️ Comando {n}, token {error.posicion + 1}: {error.mensaje}")
+    if not errores or not all(resultado.ejecutable for resultado in resultados):
+        return
+    sugerencia = " y ".join(resultado.texto_reparado() for resultado in resultados)
+    print(f"💡 ¿Quisiste decir «{sugerencia}»?")
+    if gui:
+        detalle = "\n".join(error.mensaje for error in errores)
+        gui.root.after(0, lambda: gui.ofrecer_sugerencia(sugerencia, detalle))
+
+def procesar_comando(comando):
+    """Procesar comando con manejo de errores mejorado"""
+    try:
+        print("\n═══════════════════════════════════════")
+        print("🎙️ Comando recibido:", comando)
         print("═══════════════════════════════════════\n")
 
+        comando = comando.lower().strip()
+        print("📥 Entrada normalizada:")
+        print("  ", comando, "\n")
+
+        clave = normalizar(comando)
+        compilado = cache_compilacion.obtener(clave)
+        if compilado is not None:
+            elementos, codigo = compilado
+            print("═══════════════════════════════════════")
+            print("⚡ Comando compilado en caché:")
+            print(f"  Código: {codigo}")
+            try:
+                # Solo las comprobaciones dependientes del estado se repiten
+                for accion, dispositivo, _, _ in elementos:
+                    validar_transicion_estado(dispositivo, accion)
+            except Exception as e:
+                print(f"❌ Error semántico: {str(e)}")
+                print("═══════════════════════════════════════\n")
+                return
+            print("═══════════════════════════════════════\n")
+        else:
+            compilado = compilar_comando(comando)
+            if compilado is None:
+                return
+            elementos, codigo = compilado
+            cache_compilacion.guardar(clave, elementos, codigo)
+
         print("═══════════════════════════════════════")
         print("⚙️ Ejecución de acción:")
         try:
-            execute(accion, dispositivo, ubicacion, valor)
-            print(f"🔧 Acción ejecutada: {accion} {dispositivo} en {ubicacion or 'global'}")
+            if len(elementos) == 1:
+                execute(*elementos[0])
+            else:
+                execute_batch(elementos)
+            for accion, dispositivo, ubicacion, _ in elementos:
+                print(f"🔧 Acción ejecutada: {accion} {dispositivo} en {ubicacion or 'global'}")
         except Exception as e:
             print(f"❌ Error ejecutando acción: {str(e)}")
         print("═══════════════════════════════════════\n")
 
-        # Actualizar GUI de forma thread-safe
-        if gui:
+        for accion, dispositivo, ubicacion, valor in elementos:
+            # La GUI recibe el cambio por su cola de suscripción
+            print("═══════════════════════════════════════")
+            print("📊 Estado actualizado:")
             try:
-                # CRÍTICO: Usar after() para thread-safety
-                gui.root.after(0, lambda: safe_update_gui(dispositivo, accion))
+                actualizar_estado(dispositivo, ubicacion, accion, valor)
+                estado = obtener_estado(dispositivo, ubicacion)
+                print(f"🔹 {dispositivo}@{ubicacion or 'global'} → acción: {estado.get('accion', 'desconocida')}")
             except Exception as e:
-                print(f"❌ Error actualizando GUI: {str(e)}")
-
-        print("═══════════════════════════════════════")
-        print("📊 Estado actualizado:")
-        try:
-            actualizar_estado(dispositivo, ubicacion, accion, valor)
-            estado = obtener_estado(dispositivo, ubicacion)
-            print(f"🔹 {dispositivo}@{ubicacion or 'global'} → acción: {estado.get('accion', 'desconocida')}")
-        except Exception as e:
-            print(f"❌ Error actualizando estado: {str(e)}")
-        print("═══════════════════════════════════════\n")
+                print(f"❌ Error actualizando estado: {str(e)}")
+            print("═══════════════════════════════════════\n")
         
         # IMPORTANTE: Mensaje que confirma que la GUI sigue activa
         print("🎉 Comando procesado exitosamente.")
@@ -112,15 +190,6 @@ def procesar_comando(comando):
         print(f"❌ Error crítico procesando comando: {str(e)}")
         logger.error(f"Error crítico: {e}", exc_info=True)
 
-def safe_update_gui(dispositivo, accion):
-    """Actualizar GUI de forma segura desde cualquier hilo"""
-    try:
-        if gui:
-            gui.mostrar_pictograma(dispositivo)
-            gui.update_status(f"✅ {accion} {dispositivo} completado")
-    except Exception as e:
-        print(f"❌ Error en safe_update_gui: {e}")
-
 class VoiceCommandHandler:
     """Manejador de comandos de voz integrado con GUI"""
     
@@ -167,6 +236,10 @@ def main():
         print("🏠 Control de dispositivos IoT por comandos de voz")
         print("=" * 50)
         
+        # "--offline": reconocimiento local con Sphinx desde el inicio (F3 lo alterna)
+        if "--offline" in sys.argv[1:]:
+            establecer_modo("offline")
+        
         # Crear GUI PRIMERO
         print("🖥️ Creando interfaz gráfica...")
         gui = InterfazPictogramas()
@@ -191,6 +264,9 @@ def main():
         # Configurar callback
         gui.set_callback(gui_command_callback)
         
+        # Los cambios de estado llegan a la GUI por una cola vaciada en su bucle
+        gui.escuchar_cambios(suscribir_cola_cambios())
+        
         # CRÍTICO: Sobrescribir el método de cierre para preguntar
         original_on_closing = gui.on_closing
         def safe_on_closing():
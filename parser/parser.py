@@ -3,7 +3,14 @@
 # ============================================================================
 
 import logging
-from typing import List, Tuple, Any, Dict
+import threading
+from enum import Enum
+from typing import List, Tuple, Any, Dict, Optional, FrozenSet
+
+from lexer.tokenizer import (
+    Token, TipoToken, desde_tuplas, palabra_canonica, MASCARA_CONSULTAS, MASCARA_DISPOSITIVOS
+)
+from utils.estadisticas import EstadisticasSeguras
 
 logger = logging.getLogger(__name__)
 
@@ -14,174 +21,699 @@ class ExcepcionSintactica(Exception):
         self.posicion = posicion
         super().__init__(self.mensaje)
 
-class ParserIoT:
-    def __init__(self):
-        self.tokens = []
-        self.posicion = 0
-        self.stats = {
-            'comandos_analizados': 0,
-            'errores_sintacticos': 0,
-            'comandos_validos': 0
+# Token centinela de fin de entrada
+_EOF = Token(TipoToken.EOF, None)
+
+# ----------------------------------------------------------------------------
+# Gramática de comandos declarada como datos.
+# Los símbolos en mayúsculas que existen en TipoToken son terminales; el resto
+# son no terminales. Una producción vacía es ε. "EOF" como alternativa acepta
+# un comando cortado al final (p. ej. "apaga la luz en").
+# ----------------------------------------------------------------------------
+GRAMATICA_IOT: Dict[str, List[List[str]]] = {
+    "COMANDO": [["CONSULTA"], ["AJUSTE"], ["ACCION_SIMPLE"]],
+    "CONSULTA": [["VER", "OBJETO_CONSULTA"]],
+    "OBJETO_CONSULTA": [["BATERIA"], ["HORA"]],
+    "ACCION_SIMPLE": [["ACCION", "DISPOSITIVO", "VALOR_OPCIONAL", "UBICACION"]],
+    "ACCION": [["ENCENDER"], ["APAGAR"], ["SUBIR"], ["BAJAR"], ["SILENCIAR"], ["ACTIVAR"]],
+    "DISPOSITIVO": [["LUZ"], ["VENTILADOR"], ["TELEVISOR"], ["CALEFACTOR"], ["VOLUMEN"], ["BRILLO"]],
+    "AJUSTE": [["AJUSTAR", "AJUSTABLE", "VALOR_OPCIONAL", "UBICACION"]],
+    "AJUSTABLE": [["VOLUMEN"], ["BRILLO"]],
+    "VALOR_OPCIONAL": [["A", "VALOR"], ["VALOR"], []],
+    "VALOR": [["NUMERO"]],
+    "UBICACION": [["EN", "LUGAR"], ["DE", "LUGAR"], ["DEL", "LUGAR"], ["HABITACION"], []],
+    "LUGAR": [["HABITACION"], ["EOF"]],
+    "HABITACION": [["COCINA"], ["DORMITORIO"], ["SALA"], ["BAÑO"], ["OFICINA"]],
+}
+
+# Papel en el comando de los terminales producidos por cada no terminal
+ROLES_IOT: Dict[str, str] = {
+    "CONSULTA": "accion",
+    "ACCION": "accion",
+    "AJUSTE": "accion",
+    "OBJETO_CONSULTA": "dispositivo",
+    "DISPOSITIVO": "dispositivo",
+    "AJUSTABLE": "dispositivo",
+    "VALOR": "valor",
+    "HABITACION": "habitacion",
+}
+
+# Mensajes de error cuando un no terminal no admite el token encontrado
+MENSAJES_IOT: Dict[str, str] = {
+    "COMANDO": "Comando no reconocido: {encontrado}",
+    "OBJETO_CONSULTA": "Después de VER se esperaba BATERIA o HORA, se encontró {encontrado}",
+    "ACCION": "Acción no válida: {encontrado}",
+    "DISPOSITIVO": "Dispositivo no válido: {encontrado}",
+    "AJUSTABLE": "Dispositivo no compatible con AJUSTAR: {encontrado}",
+    "VALOR": "Se esperaba número, se encontró {encontrado}",
+    "LUGAR": "Habitación no válida: {encontrado}",
+}
+
+class NodoComando:
+    """Árbol sintáctico de un comando: acción, dispositivo, habitación y valor"""
+    __slots__ = ('accion', 'dispositivo', 'habitacion', 'valor')
+    
+    def __init__(self, accion: Optional[str] = None, dispositivo: Optional[str] = None,
+                 habitacion: Optional[str] = None, valor: Optional[int] = None):
+        self.accion = accion
+        self.dispositivo = dispositivo
+        self.habitacion = habitacion
+        self.valor = valor
+    
+    def asignar(self, rol: str, token: Token) -> None:
+        """Registrar un token en el papel que le asigna la gramática"""
+        if rol == "valor":
+            self.valor = token.valor
+        else:
+            setattr(self, rol, token.tipo.name)
+    
+    def como_tupla(self) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[int]]:
+        """Forma (accion, dispositivo, habitacion, valor) usada por el resto del pipeline"""
+        return (self.accion, self.dispositivo, self.habitacion, self.valor)
+    
+    def __eq__(self, otro: object) -> bool:
+        if isinstance(otro, NodoComando):
+            return self.como_tupla() == otro.como_tupla()
+        return NotImplemented
+    
+    def __hash__(self) -> int:
+        return hash(self.como_tupla())
+    
+    def __repr__(self) -> str:
+        return (f"NodoComando(accion={self.accion!r}, dispositivo={self.dispositivo!r}, "
+                f"habitacion={self.habitacion!r}, valor={self.valor!r})")
+
+class GramaticaLL1:
+    """Gramática compilada a conjuntos FIRST/FOLLOW y tabla de análisis LL(1)"""
+    
+    def __init__(self, producciones: Dict[str, List[List[str]]], inicial: str,
+                 mensajes: Optional[Dict[str, str]] = None,
+                 roles: Optional[Dict[str, str]] = None):
+        self.inicial = inicial
+        self.mensajes = mensajes or {}
+        self.roles = roles or {}
+        
+        # Traducir símbolos: terminales -> TipoToken, no terminales -> str
+        self.producciones: Dict[str, List[Tuple[Any, ...]]] = {
+            no_terminal: [tuple(self._simbolo(s, producciones) for s in alternativa)
+                          for alternativa in alternativas]
+            for no_terminal, alternativas in producciones.items()
+        }
+        
+        self.anulables = self._calcular_anulables()
+        self.primeros = self._calcular_primeros()
+        self.siguientes = self._calcular_siguientes()
+        self.tabla = self._construir_tabla()
+        self.tabla_pila = self._construir_tabla_pila()
+    
+    @staticmethod
+    def _simbolo(nombre: str, producciones: Dict[str, List[List[str]]]) -> Any:
+        """Resolver un nombre de la gramática a terminal o no terminal"""
+        if nombre in producciones:
+            return nombre
+        try:
+            return TipoToken[nombre]
+        except KeyError:
+            raise ValueError(f"Símbolo desconocido en la gramática: {nombre}") from None
+    
+    def _calcular_anulables(self) -> FrozenSet[str]:
+        """No terminales que pueden derivar ε"""
+        anulables = set()
+        cambiado = True
+        while cambiado:
+            cambiado = False
+            for no_terminal, alternativas in self.producciones.items():
+                if no_terminal in anulables:
+                    continue
+                if any(all(s in anulables for s in alt) for alt in alternativas):
+                    anulables.add(no_terminal)
+                    cambiado = True
+        return frozenset(anulables)
+    
+    def primeros_de(self, simbolos: Tuple[Any, ...], primeros=None) -> FrozenSet[TipoToken]:
+        """FIRST de una secuencia de símbolos (sin ε)"""
+        primeros = primeros if primeros is not None else self.primeros
+        resultado = set()
+        for simbolo in simbolos:
+            if isinstance(simbolo, TipoToken):
+                resultado.add(simbolo)
+                break
+            resultado |= primeros[simbolo]
+            if simbolo not in self.anulables:
+                break
+        return frozenset(resultado)
+    
+    def secuencia_anulable(self, simbolos) -> bool:
+        """Indicar si todos los símbolos pueden derivar ε"""
+        return all(not isinstance(s, TipoToken) and s in self.anulables for s in simbolos)
+    
+    def _calcular_primeros(self) -> Dict[str, FrozenSet[TipoToken]]:
+        """Conjuntos FIRST por punto fijo"""
+        primeros = {no_terminal: frozenset() for no_terminal in self.producciones}
+        cambiado = True
+        while cambiado:
+            cambiado = False
+            for no_terminal, alternativas in self.producciones.items():
+                nuevos = primeros[no_terminal]
+                for alternativa in alternativas:
+                    nuevos = nuevos | self.primeros_de(alternativa, primeros)
+                if nuevos != primeros[no_terminal]:
+                    primeros[no_terminal] = nuevos
+                    cambiado = True
+        return primeros
+    
+    def _calcular_siguientes(self) -> Dict[str, FrozenSet[TipoToken]]:
+        """Conjuntos FOLLOW por punto fijo"""
+        siguientes = {no_terminal: set() for no_terminal in self.producciones}
+        siguientes[self.inicial].add(TipoToken.EOF)
+        cambiado = True
+        while cambiado:
+            cambiado = False
+            for no_terminal, alternativas in self.producciones.items():
+                for alternativa in alternativas:
+                    for i, simbolo in enumerate(alternativa):
+                        if isinstance(simbolo, TipoToken):
+                            continue
+                        resto = alternativa[i + 1:]
+                        nuevos = set(self.primeros_de(resto))
+                        if self.secuencia_anulable(resto):
+                            nuevos |= siguientes[no_terminal]
+                        if not nuevos <= siguientes[simbolo]:
+                            siguientes[simbolo] |= nuevos
+                            cambiado = True
+        return {no_terminal: frozenset(s) for no_terminal, s in siguientes.items()}
+    
+    def _construir_tabla(self) -> Dict[str, Dict[TipoToken, Tuple[Any, ...]]]:
+        """Tabla de predicción no terminal x terminal -> producción"""
+        tabla = {no_terminal: {} for no_terminal in self.producciones}
+        for no_terminal, alternativas in self.producciones.items():
+            for alternativa in alternativas:
+                prediccion = set(self.primeros_de(alternativa))
+                if self.secuencia_anulable(alternativa):
+                    prediccion |= self.siguientes[no_terminal]
+                for terminal in prediccion:
+                    anterior = tabla[no_terminal].get(terminal)
+                    if anterior is not None and anterior != alternativa:
+                        raise ValueError(
+                            f"La gramática no es LL(1): conflicto en {no_terminal} con {terminal.name}"
+                        )
+                    tabla[no_terminal][terminal] = alternativa
+        return tabla
+    
+    def _construir_tabla_pila(self) -> Dict[str, Dict[TipoToken, Tuple[Any, ...]]]:
+        """Tabla lista para el motor: producciones invertidas y terminales con su papel"""
+        return {
+            no_terminal: {
+                terminal: tuple(
+                    (s, self.roles.get(no_terminal)) if isinstance(s, TipoToken) else s
+                    for s in reversed(produccion)
+                )
+                for terminal, produccion in fila.items()
+            }
+            for no_terminal, fila in self.tabla.items()
         }
     
-    def token_actual(self) -> Tuple[str, Any]:
+    def esperados(self, no_terminal: str) -> List[str]:
+        """Nombres de los terminales admitidos por un no terminal (para mensajes)"""
+        return sorted(t.name for t in self.tabla[no_terminal] if t != TipoToken.EOF)
+    
+    def error(self, no_terminal: str, token: Token, posicion: int) -> ExcepcionSintactica:
+        """Construir el error sintáctico para un no terminal sin entrada en la tabla"""
+        plantilla = self.mensajes.get(no_terminal)
+        if plantilla is None:
+            plantilla = f"Se esperaba {' o '.join(self.esperados(no_terminal))}, se encontró {{encontrado}}"
+        return ExcepcionSintactica(plantilla.format(encontrado=token.tipo.name), posicion)
+
+# Gramática compilada una sola vez al importar el módulo
+GRAMATICA_COMPILADA = GramaticaLL1(GRAMATICA_IOT, "COMANDO", MENSAJES_IOT, ROLES_IOT)
+
+class CursorTokens:
+    """Posición de lectura de un único análisis; vive en la pila de la llamada"""
+    __slots__ = ('tokens', 'posicion')
+    
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.posicion = 0
+    
+    def token_actual(self) -> Token:
         """Obtener token en posición actual"""
         if self.posicion < len(self.tokens):
             return self.tokens[self.posicion]
-        return ("EOF", None)
+        return _EOF
     
     def avanzar(self) -> None:
         """Avanzar a siguiente token"""
         self.posicion += 1
     
-    def consumir(self, tipo_esperado: str) -> Tuple[str, Any]:
+    def consumir(self, tipo_esperado: TipoToken) -> Token:
         """Consumir token del tipo esperado"""
         token = self.token_actual()
-        if token[0] != tipo_esperado:
+        if token.tipo != tipo_esperado:
             raise ExcepcionSintactica(
-                f"Se esperaba {tipo_esperado}, se encontró {token[0]}",
+                f"Se esperaba {tipo_esperado.name}, se encontró {token.tipo.name}",
                 self.posicion
             )
-        self.avanzar()
+        if tipo_esperado != TipoToken.EOF:
+            self.avanzar()
         return token
+
+def derivar(gramatica: GramaticaLL1, inicial: str, cursor: CursorTokens) -> NodoComando:
+    """Motor LL(1) dirigido por tabla a partir de un no terminal (sin estado compartido)"""
+    tabla = gramatica.tabla_pila
+    nodo = NodoComando()
+    pila = [inicial]
+    while pila:
+        simbolo = pila.pop()
+        if simbolo.__class__ is tuple:
+            terminal, rol = simbolo
+            if terminal == TipoToken.EOF:
+                logger.warning("Comando incompleto: falta el final del comando")
+            token = cursor.consumir(terminal)
+            if rol is not None:
+                nodo.asignar(rol, token)
+            continue
+        
+        token = cursor.token_actual()
+        produccion = tabla[simbolo].get(token.tipo)
+        if produccion is None:
+            if gramatica.secuencia_anulable((simbolo, *pila)):
+                break
+            raise gramatica.error(simbolo, token, cursor.posicion)
+        pila.extend(produccion)
     
-    def analizar_consulta(self) -> bool:
-        """Analizar comando de consulta: VER (BATERIA|HORA)"""
-        try:
-            self.consumir("VER")
-            token_siguiente = self.token_actual()
-            
-            if token_siguiente[0] in ["BATERIA", "HORA"]:
-                self.avanzar()
-                return True
-            else:
-                raise ExcepcionSintactica(
-                    f"Después de VER se esperaba BATERIA o HORA, se encontró {token_siguiente[0]}"
-                )
-        except ExcepcionSintactica:
-            raise
+    # Comando completo: un token sobrante es un error (la recuperación lo elimina)
+    token = cursor.token_actual()
+    if token.tipo != TipoToken.EOF:
+        raise ExcepcionSintactica(
+            f"Token sobrante después del comando: {token.tipo.name}", cursor.posicion
+        )
+    return nodo
+
+def analizar_sintaxis(tokens: List[Token],
+                      gramatica: GramaticaLL1 = GRAMATICA_COMPILADA) -> NodoComando:
+    """Análisis sintáctico puro y reentrante: todo el estado vive en esta llamada"""
+    if not tokens:
+        raise ExcepcionSintactica("Comando vacío")
+    return derivar(gramatica, gramatica.inicial, CursorTokens(desde_tuplas(tokens)))
+
+# Tokens que nombran el objetivo de una acción (dispositivo o consulta)
+_MASCARA_OBJETIVOS = MASCARA_DISPOSITIVOS | MASCARA_CONSULTAS
+
+def _fin_objetivo(comando: List[Token]) -> Optional[int]:
+    """Posición siguiente al dispositivo del comando, o None si no tiene"""
+    for i, token in enumerate(comando):
+        if (1 << token.tipo) & _MASCARA_OBJETIVOS:
+            return i + 1
+    return None
+
+def dividir_comandos(tokens: List[Token],
+                     gramatica: GramaticaLL1 = GRAMATICA_COMPILADA) -> List[List[Token]]:
+    """Separar un enunciado compuesto en comandos por los tokens SEPARADOR
     
-    def analizar_accion_simple(self) -> bool:
-        """Analizar acción simple: ACCION DISPOSITIVO [EN HABITACION]"""
-        try:
-            # Consumir acción
-            token_accion = self.token_actual()
-            if token_accion[0] in ["ENCENDER", "APAGAR", "SUBIR", "BAJAR", "SILENCIAR", "ACTIVAR"]:
-                self.avanzar()
-            else:
-                raise ExcepcionSintactica(f"Acción no válida: {token_accion[0]}")
-            
-            # Consumir dispositivo
-            token_dispositivo = self.token_actual()
-            if token_dispositivo[0] in ["LUZ", "VENTILADOR", "TELEVISOR", "CALEFACTOR", "VOLUMEN", "BRILLO"]:
-                self.avanzar()
-            else:
-                raise ExcepcionSintactica(f"Dispositivo no válido: {token_dispositivo[0]}")
-            
-            # Opcional: EN HABITACION
-            if self.token_actual()[0] == "EN":
-                self.avanzar()
-                token_habitacion = self.token_actual()
-                if token_habitacion[0] in ["COCINA", "DORMITORIO", "SALA", "BAÑO", "OFICINA"]:
-                    self.avanzar()
-                elif token_habitacion[0] == "EOF":
-                    # Comando incompleto pero válido hasta aquí
-                    logger.warning("Comando incompleto: falta especificar habitación")
-                    return True
+    Las partes omitidas se toman del comando vecino:
+    - sin acción, hereda la del anterior: "enciende la luz y el ventilador"
+    - sin acción ni dispositivo, hereda ambos del anterior: "enciende la luz
+      en la cocina y en la sala"
+    - solo una acción, toma del siguiente el resto: "enciende y apaga la luz"
+    """
+    inicios = gramatica.tabla_pila[gramatica.inicial]
+    comandos: List[List[Token]] = []
+    actual: List[Token] = []
+    for token in desde_tuplas(tokens) + [_EOF]:
+        if token.tipo != TipoToken.SEPARADOR and token.tipo != TipoToken.EOF:
+            actual.append(token)
+            continue
+        if actual:
+            if comandos and actual[0].tipo not in inicios:
+                anterior = comandos[-1]
+                # Sin dispositivo propio hereda acción y dispositivo; si no, solo la acción
+                fin = _fin_objetivo(anterior) if _fin_objetivo(actual) is None else 1
+                actual = anterior[:fin or 1] + actual
+            comandos.append(actual)
+        actual = []
+    
+    # Acciones sueltas: de atrás adelante, para encadenar "enciende, sube y apaga la luz"
+    for i in range(len(comandos) - 2, -1, -1):
+        comando = comandos[i]
+        if len(comando) == 1 and comando[0].tipo in inicios and comandos[i + 1][0].tipo in inicios:
+            comandos[i] = comando + comandos[i + 1][1:]
+    return comandos
+
+def analizar_lote_sintaxis(tokens: List[Token],
+                           gramatica: GramaticaLL1 = GRAMATICA_COMPILADA) -> List[NodoComando]:
+    """Analizar un enunciado compuesto; devuelve un árbol por comando"""
+    comandos = dividir_comandos(tokens, gramatica)
+    if not comandos:
+        raise ExcepcionSintactica("Comando vacío")
+    return [analizar_sintaxis(comando, gramatica) for comando in comandos]
+
+class Reparacion:
+    """Corrección de un solo token propuesta para un error sintáctico"""
+    __slots__ = ('operacion', 'posicion', 'token')
+    
+    def __init__(self, operacion: str, posicion: int, token: Token):
+        self.operacion = operacion    # "insertar" o "eliminar"
+        self.posicion = posicion      # Índice en los tokens originales
+        self.token = token
+    
+    def __repr__(self) -> str:
+        return f"Reparacion({self.operacion}, {self.posicion}, {self.token!r})"
+
+class ResultadoRecuperacion:
+    """Resultado del análisis con recuperación: errores, reparaciones y árbol reparado"""
+    __slots__ = ('nodo', 'errores', 'reparaciones', 'tokens')
+    
+    def __init__(self, nodo: NodoComando, errores: List[ExcepcionSintactica],
+                 reparaciones: List[Reparacion], tokens: List[Token]):
+        self.nodo = nodo
+        self.errores = errores
+        self.reparaciones = reparaciones
+        self.tokens = tokens          # Tokens tras aplicar las reparaciones
+    
+    @property
+    def valido(self) -> bool:
+        """El comando original no tenía errores"""
+        return not self.errores
+    
+    @property
+    def ejecutable(self) -> bool:
+        """La reparación no dejó huecos sin valor (p. ej. un número inventado)"""
+        return all(token.valor is not None for token in self.tokens)
+    
+    def texto_reparado(self) -> str:
+        """Texto del comando reparado, para preguntar «¿quisiste decir …?»"""
+        return " ".join(
+            str(token.valor) if token.valor is not None else f"<{token.tipo.name.lower()}>"
+            for token in self.tokens
+        )
+
+def _token_insertado(tipo: TipoToken) -> Token:
+    """Token inventado por una reparación; un número inventado queda sin valor"""
+    return Token(tipo, None if tipo == TipoToken.NUMERO else palabra_canonica(tipo))
+
+def _simular(gramatica: GramaticaLL1, pila: List[Any], tokens: List[Token],
+             posicion: int) -> Tuple[bool, int]:
+    """Continuar el análisis sin recuperar: (termina sin error, tokens sin consumir)"""
+    tabla = gramatica.tabla_pila
+    pila = list(pila)
+    while pila:
+        simbolo = pila.pop()
+        token = tokens[posicion] if posicion < len(tokens) else _EOF
+        if simbolo.__class__ is tuple:
+            if simbolo[0] != token.tipo:
+                return False, len(tokens) - posicion
+            if simbolo[0] != TipoToken.EOF:
+                posicion += 1
+            continue
+        produccion = tabla[simbolo].get(token.tipo)
+        if produccion is None:
+            if gramatica.secuencia_anulable((simbolo, *pila)):
+                break
+            return False, len(tokens) - posicion
+        pila.extend(produccion)
+    return True, len(tokens) - posicion
+
+def recuperar_sintaxis(tokens: List[Token],
+                       gramatica: GramaticaLL1 = GRAMATICA_COMPILADA) -> ResultadoRecuperacion:
+    """Analizar un comando registrando todos los errores en una sola pasada
+    
+    Ante cada error se prueba eliminar el token actual o insertar uno de los
+    esperados, y se aplica la opción que permite llegar más lejos; a igualdad,
+    se prefiere eliminar y luego el orden de la gramática.
+    """
+    tokens = list(desde_tuplas(tokens))
+    tabla = gramatica.tabla_pila
+    errores: List[ExcepcionSintactica] = []
+    reparaciones: List[Reparacion] = []
+    limite = len(tokens) + 3
+    nodo = NodoComando()
+    pila: List[Any] = [gramatica.inicial]
+    posicion = 0
+    desplazamiento = 0
+    
+    while pila:
+        simbolo = pila.pop()
+        token = tokens[posicion] if posicion < len(tokens) else _EOF
+        if simbolo.__class__ is tuple:
+            terminal, rol = simbolo
+            if terminal == token.tipo:
+                if rol is not None:
+                    nodo.asignar(rol, token)
+                if terminal != TipoToken.EOF:
+                    posicion += 1
+                continue
+            errores.append(ExcepcionSintactica(
+                f"Se esperaba {terminal.name}, se encontró {token.tipo.name}",
+                posicion - desplazamiento
+            ))
+            insertables = [terminal]
+        else:
+            produccion = tabla[simbolo].get(token.tipo)
+            if produccion is not None:
+                pila.extend(produccion)
+                continue
+            insertables = [t for t in tabla[simbolo] if t != TipoToken.EOF]
+            if gramatica.secuencia_anulable((simbolo, *pila)):
+                # Quedan tokens sin consumir: solo se repara si una inserción los absorbe todos
+                if token.tipo == TipoToken.EOF or len(reparaciones) >= limite:
+                    break
+                pila.append(simbolo)
+                for tipo in insertables:
+                    nuevo = _token_insertado(tipo)
+                    con_token = tokens[:posicion] + [nuevo] + tokens[posicion:]
+                    if _simular(gramatica, pila, con_token, posicion) == (True, 0):
+                        break
                 else:
-                    raise ExcepcionSintactica(f"Habitación no válida: {token_habitacion[0]}")
-            
-            return True
-        except ExcepcionSintactica:
-            raise
+                    # Ninguna inserción los aprovecha: el token sobrante se elimina
+                    errores.append(ExcepcionSintactica(
+                        f"Token sobrante después del comando: {token.tipo.name}",
+                        posicion - desplazamiento
+                    ))
+                    reparaciones.append(Reparacion("eliminar", posicion - desplazamiento, token))
+                    del tokens[posicion]
+                    desplazamiento -= 1
+                    continue
+                errores.append(gramatica.error(simbolo, token, posicion - desplazamiento))
+                reparaciones.append(Reparacion("insertar", posicion - desplazamiento, nuevo))
+                tokens.insert(posicion, nuevo)
+                desplazamiento += 1
+                continue
+            errores.append(gramatica.error(simbolo, token, posicion - desplazamiento))
+        
+        if len(reparaciones) >= limite:
+            break
+        pila.append(simbolo)
+        
+        opciones = []
+        if token.tipo != TipoToken.EOF:
+            sin_token = tokens[:posicion] + tokens[posicion + 1:]
+            completo, sobrantes = _simular(gramatica, pila, sin_token, posicion)
+            opciones.append(((not completo, sobrantes, 0), "eliminar", token))
+        for orden, tipo in enumerate(insertables, start=1):
+            nuevo = _token_insertado(tipo)
+            con_token = tokens[:posicion] + [nuevo] + tokens[posicion:]
+            completo, sobrantes = _simular(gramatica, pila, con_token, posicion)
+            opciones.append(((not completo, sobrantes, orden), "insertar", nuevo))
+        if not opciones:
+            break
+        
+        _, operacion, elegido = min(opciones, key=lambda opcion: opcion[0])
+        reparaciones.append(Reparacion(operacion, posicion - desplazamiento, elegido))
+        if operacion == "eliminar":
+            del tokens[posicion]
+            desplazamiento -= 1
+        else:
+            tokens.insert(posicion, elegido)
+            desplazamiento += 1
+    
+    # Tokens sobrantes tras un comando ya completo (p. ej. "dime la hora luz")
+    while posicion < len(tokens) and len(reparaciones) < limite:
+        token = tokens[posicion]
+        errores.append(ExcepcionSintactica(
+            f"Token sobrante después del comando: {token.tipo.name}",
+            posicion - desplazamiento
+        ))
+        reparaciones.append(Reparacion("eliminar", posicion - desplazamiento, token))
+        del tokens[posicion]
+        desplazamiento -= 1
+    
+    return ResultadoRecuperacion(nodo, errores, reparaciones, tokens)
+
+class ParserIoT:
+    """Fachada con estadísticas; puede compartirse entre hilos"""
+    
+    def __init__(self, gramatica: GramaticaLL1 = GRAMATICA_COMPILADA):
+        self.gramatica = gramatica
+        self.stats = EstadisticasSeguras({
+            'comandos_analizados': 0,
+            'errores_sintacticos': 0,
+            'comandos_validos': 0
+        })
+    
+    def derivar(self, inicial: str, tokens: List[Token]) -> NodoComando:
+        """Derivar un no terminal concreto sobre una lista de tokens"""
+        return derivar(self.gramatica, inicial, CursorTokens(desde_tuplas(tokens)))
+    
+    def analizar_consulta(self, tokens: List[Token]) -> NodoComando:
+        """Analizar comando de consulta: VER (BATERIA|HORA)"""
+        return self.derivar("CONSULTA", tokens)
     
-    def analizar_accion_con_valor(self) -> bool:
-        """Analizar acción con valor: AJUSTAR DISPOSITIVO [A NUMERO] [EN HABITACION]"""
+    def analizar_accion_simple(self, tokens: List[Token]) -> NodoComando:
+        """Analizar acción simple: ACCION DISPOSITIVO [[A] NUMERO] [[EN] HABITACION]"""
+        return self.derivar("ACCION_SIMPLE", tokens)
+    
+    def analizar_accion_con_valor(self, tokens: List[Token]) -> NodoComando:
+        """Analizar acción con valor: AJUSTAR DISPOSITIVO [[A] NUMERO] [[EN] HABITACION]"""
+        return self.derivar("AJUSTE", tokens)
+    
+    def analizar(self, tokens: List[Token]) -> NodoComando:
+        """Análisis sintáctico principal; devuelve el árbol del comando"""
+        self.stats.incrementar('comandos_analizados')
+        
         try:
-            self.consumir("AJUSTAR")
-            
-            # Dispositivo
-            token_dispositivo = self.token_actual()
-            if token_dispositivo[0] in ["VOLUMEN", "BRILLO"]:
-                self.avanzar()
-            else:
-                raise ExcepcionSintactica(f"Dispositivo no compatible con AJUSTAR: {token_dispositivo[0]}")
+            if tokens:
+                logger.info(f"Analizando comando que inicia con: {desde_tuplas(tokens[:1])[0].tipo.name}")
             
-            # Opcional: A NUMERO
-            if self.token_actual()[0] == "A":
-                self.avanzar()
-                if self.token_actual()[0] == "NUMERO":
-                    self.avanzar()
-                elif self.token_actual()[0] == "EOF":
-                    raise ExcepcionSintactica("Se esperaba un número después de 'a'")
-                else:
-                    raise ExcepcionSintactica(f"Se esperaba número, se encontró {self.token_actual()[0]}")
-            elif self.token_actual()[0] == "EOF":
-                # Comando incompleto pero podemos manejarlo
-                logger.warning("Comando 'ajustar' sin valor específico")
-                return True
-            
-            # Opcional: EN HABITACION
-            if self.token_actual()[0] == "EN":
-                self.avanzar()
-                token_habitacion = self.token_actual()
-                if token_habitacion[0] in ["COCINA", "DORMITORIO", "SALA", "BAÑO", "OFICINA"]:
-                    self.avanzar()
-                elif token_habitacion[0] == "EOF":
-                    logger.warning("Comando incompleto: falta especificar habitación")
-                    return True
-                else:
-                    raise ExcepcionSintactica(f"Habitación no válida: {token_habitacion[0]}")
+            nodo = analizar_sintaxis(tokens, self.gramatica)
             
-            return True
-        except ExcepcionSintactica:
+            self.stats.incrementar('comandos_validos')
+            logger.info("Análisis sintáctico exitoso")
+            return nodo
+        
+        except ExcepcionSintactica as e:
+            self.stats.incrementar('errores_sintacticos')
+            logger.error(f"Error sintáctico: {e.mensaje}")
             raise
     
-    def analizar(self, tokens: List[Tuple[str, Any]]) -> bool:
-        """Análisis sintáctico principal"""
-        self.stats['comandos_analizados'] += 1
-        self.tokens = tokens
-        self.posicion = 0
-        
-        if not tokens:
-            self.stats['errores_sintacticos'] += 1
-            raise ExcepcionSintactica("Comando vacío")
+    def analizar_lote(self, tokens: List[Token]) -> List[NodoComando]:
+        """Análisis de un enunciado con varios comandos unidos por "y", "luego" o comas"""
+        self.stats.incrementar('comandos_analizados')
         
         try:
-            primer_token = self.token_actual()
-            logger.info(f"Analizando comando que inicia con: {primer_token[0]}")
-            
-            if primer_token[0] == "VER":
-                self.analizar_consulta()
-            elif primer_token[0] == "AJUSTAR":
-                self.analizar_accion_con_valor()
-            elif primer_token[0] in ["ENCENDER", "APAGAR", "SUBIR", "BAJAR", "SILENCIAR", "ACTIVAR"]:
-                self.analizar_accion_simple()
-            else:
-                raise ExcepcionSintactica(f"Comando no reconocido: {primer_token[0]}")
-            
-            # No es necesario verificar tokens adicionales para comandos incompletos válidos
-            
-            self.stats['comandos_validos'] += 1
-            logger.info("Análisis sintáctico exitoso")
-            return True
+            nodos = analizar_lote_sintaxis(tokens, self.gramatica)
             
+            self.stats.incrementar('comandos_validos')
+            logger.info(f"Análisis sintáctico exitoso: {len(nodos)} comandos")
+            return nodos
+        
         except ExcepcionSintactica as e:
-            self.stats['errores_sintacticos'] += 1
+            self.stats.incrementar('errores_sintacticos')
             logger.error(f"Error sintáctico: {e.mensaje}")
             raise
     
+    def analizar_con_recuperacion(self, tokens: List[Token]) -> List[ResultadoRecuperacion]:
+        """Modo recuperación: todos los errores y una reparación por comando del enunciado"""
+        resultados = [recuperar_sintaxis(comando, self.gramatica)
+                      for comando in dividir_comandos(tokens, self.gramatica)]
+        errores = sum(len(resultado.errores) for resultado in resultados)
+        if errores:
+            self.stats.incrementar('errores_sintacticos', errores)
+            logger.info(f"Recuperación sintáctica: {errores} errores reparados")
+        return resultados
+    
     def get_stats(self) -> Dict[str, int]:
         """Obtener estadísticas del parser"""
         return self.stats.copy()
 
-# Instancia global del parser
+class EstadoPrefijo(Enum):
+    """Estado de un comando parcialmente recibido"""
+    INCOMPLETO = "incompleto"              # Faltan tokens obligatorios
+    EXTENSIBLE = "completo_extensible"     # Válido, pero aún admite complementos
+    COMPLETO = "completo"                  # Válido y sin complementos posibles
+
+class ParserIncremental:
+    """Parser que consume tokens uno a uno e informa si el comando ya está completo
+    
+    Permite despachar la acción en cuanto el comando es inequívoco, sin esperar
+    a que el reconocedor de voz dé por terminada la frase. Usa la misma tabla
+    LL(1) que ParserIoT, con la pila de análisis conservada entre tokens.
+    """
+    
+    def __init__(self, gramatica: GramaticaLL1 = GRAMATICA_COMPILADA):
+        self.gramatica = gramatica
+        self.reiniciar()
+    
+    def reiniciar(self) -> None:
+        """Empezar un comando nuevo"""
+        self.tokens: List[Token] = []
+        self.pila: List[Any] = [self.gramatica.inicial]
+        self.nodo = NodoComando()
+        self.completitud = EstadoPrefijo.INCOMPLETO
+    
+    def _evaluar_pila(self) -> EstadoPrefijo:
+        """Completitud según lo que queda por derivar"""
+        if not self.pila:
+            return EstadoPrefijo.COMPLETO
+        if self.gramatica.secuencia_anulable(self.pila):
+            return EstadoPrefijo.EXTENSIBLE
+        return EstadoPrefijo.INCOMPLETO
+    
+    def alimentar(self, token: Token) -> EstadoPrefijo:
+        """Consumir un token y devolver la completitud del comando"""
+        if self.completitud is EstadoPrefijo.COMPLETO:
+            # Los tokens posteriores ya no pertenecen a este comando
+            return self.completitud
+        
+        tabla = self.gramatica.tabla_pila
+        pila = list(self.pila)
+        while pila:
+            simbolo = pila.pop()
+            if simbolo.__class__ is tuple:
+                terminal, rol = simbolo
+                if terminal != token.tipo:
+                    raise ExcepcionSintactica(
+                        f"Se esperaba {terminal.name}, se encontró {token.tipo.name}",
+                        len(self.tokens)
+                    )
+                if rol is not None:
+                    self.nodo.asignar(rol, token)
+                self.tokens.append(token)
+                self.pila = pila
+                self.completitud = self._evaluar_pila()
+                return self.completitud
+            
+            produccion = tabla[simbolo].get(token.tipo)
+            if produccion is None:
+                if self.gramatica.secuencia_anulable((simbolo, *pila)):
+                    # El token no extiende un comando ya válido: darlo por completo
+                    self.pila = []
+                    self.completitud = EstadoPrefijo.COMPLETO
+                    return self.completitud
+                raise self.gramatica.error(simbolo, token, len(self.tokens))
+            pila.extend(produccion)
+        
+        self.pila = pila
+        self.completitud = EstadoPrefijo.COMPLETO
+        return self.completitud
+    
+    def evaluar(self, tokens: List[Token]) -> EstadoPrefijo:
+        """Consumir solo los tokens nuevos de una lista que crece (p. ej. tokens estables)"""
+        for token in desde_tuplas(tokens)[len(self.tokens):]:
+            if self.alimentar(token) is EstadoPrefijo.COMPLETO:
+                break
+        return self.completitud
+
+# Instancia global del parser (sin estado por análisis: segura entre hilos)
 _parser_instance = None
+_parser_lock = threading.Lock()
 
-def analizar(tokens: List[Tuple[str, Any]]) -> bool:
-    """Función principal de análisis sintáctico"""
+def _obtener_parser() -> ParserIoT:
+    """Obtener (creando si hace falta) la instancia global del parser"""
     global _parser_instance
     if _parser_instance is None:
-        _parser_instance = ParserIoT()
-    
-    return _parser_instance.analizar(tokens)
\ No newline at end of file
+        with _parser_lock:
+            if _parser_instance is None:
+                _parser_instance = ParserIoT()
+    return _parser_instance
+
+def analizar(tokens: List[Token]) -> NodoComando:
+    """Función principal de análisis sintáctico"""
+    return _obtener_parser().analizar(tokens)
+
+def analizar_lote(tokens: List[Token]) -> List[NodoComando]:
+    """Análisis sintáctico de un enunciado compuesto"""
+    return _obtener_parser().analizar_lote(tokens)
+
+def analizar_con_recuperacion(tokens: List[Token]) -> List[ResultadoRecuperacion]:
+    """Análisis con recuperación de errores y propuesta de reparación"""
+    return _obtener_parser().analizar_con_recuperacion(tokens)
\ No newline at end of file
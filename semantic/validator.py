@@ -3,10 +3,26 @@
 # ============================================================================
 
 import logging
-from typing import List, Tuple, Any, Dict, Optional
+import threading
+from enum import IntEnum
+from typing import List, Tuple, Any, Dict, Optional, Union, Sequence
 import json
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:  # Opcional: solo la validación por lotes lo necesita
+    np = None
+
+from lexer.tokenizer import (
+    Token, TipoToken, desde_tuplas, mascara,
+    MASCARA_ACCIONES, MASCARA_DISPOSITIVOS, MASCARA_CONSULTAS, MASCARA_HABITACIONES
+)
+from parser.parser import NodoComando
+from utils.estadisticas import EstadisticasSeguras
+from utils.registro import RegistroDispositivos, obtener_registro
+from utils.almacen_estado import AlmacenEstado, obtener_almacen
+
 logger = logging.getLogger(__name__)
 
 class ExcepcionSemantica(Exception):
@@ -16,79 +32,112 @@ class ExcepcionSemantica(Exception):
         self.contexto = contexto
         super().__init__(self.mensaje)
 
+# Dispositivos y consultas que pueden ser objetivo de una acción
+_MASCARA_OBJETIVOS = MASCARA_DISPOSITIVOS | MASCARA_CONSULTAS
+
+# Número de códigos de token: tamaño de las tablas indexadas por código
+_NUM_CODIGOS = max(TipoToken) + 1
+
+class CodigoErrorSemantico(IntEnum):
+    """Resultado por fila de la validación por lotes (0 = comando válido)"""
+    VALIDO = 0
+    DISPOSITIVO_DESCONOCIDO = 1
+    ACCION_DESCONOCIDA = 2
+    INCOMPATIBLE = 3
+    HABITACION_DESCONOCIDA = 4
+    FUERA_DE_RANGO = 5
+
+def _codigo(nombre: Optional[str]) -> int:
+    """Código de token de un nombre (DESCONOCIDO si no es un tipo de token)"""
+    tipo = TipoToken.__members__.get(nombre) if nombre else None
+    return TipoToken.DESCONOCIDO if tipo is None else tipo
+
 class ValidadorSemanticoIoT:
-    def __init__(self):
-        # Contexto del dominio IoT
-        self.dispositivos_validos = {
-            "LUZ", "VENTILADOR", "TELEVISOR", "CALEFACTOR", 
-            "VOLUMEN", "BRILLO", "BATERIA", "HORA"
-        }
-        
-        self.habitaciones_validas = {
-            "COCINA", "DORMITORIO", "SALA", "BAÑO", "OFICINA"
-        }
-        
-        # Compatibilidad acción-dispositivo
-        self.compatibilidad = {
-            "ENCENDER": {"LUZ", "VENTILADOR", "TELEVISOR", "CALEFACTOR"},
-            "APAGAR": {"LUZ", "VENTILADOR", "TELEVISOR", "CALEFACTOR"},
-            "SUBIR": {"VOLUMEN", "BRILLO", "LUZ"},  # Agregado LUZ
-            "BAJAR": {"VOLUMEN", "BRILLO", "LUZ"},  # Agregado LUZ
-            "AJUSTAR": {"VOLUMEN", "BRILLO"},
-            "SILENCIAR": {"VOLUMEN"},
-            "ACTIVAR": {"VOLUMEN"},
-            "VER": {"BATERIA", "HORA"}
-        }
+    def __init__(self, registro: Optional[RegistroDispositivos] = None,
+                 almacen: Optional[AlmacenEstado] = None):
+        # Contexto del dominio IoT, tomado de la topología del hogar
+        registro = registro or obtener_registro()
+        self.dispositivos_validos = set(registro.tipos)
+        self.habitaciones_validas = set(registro.habitaciones)
+        
+        # Compatibilidad acción-dispositivo (derivada de las capacidades de cada tipo)
+        self.compatibilidad = registro.compatibilidad()
         
         # Rangos válidos para valores numéricos
-        self.rangos_validos = {
-            "VOLUMEN": (0, 100),
-            "BRILLO": (0, 100)
-        }
-        
-        # Estado simulado de dispositivos
-        self.estado_dispositivos = {
-            "LUZ": {"encendido": False, "ubicaciones": set()},
-            "VENTILADOR": {"encendido": False, "ubicaciones": set()},
-            "TELEVISOR": {"encendido": False, "ubicaciones": set()},
-            "CALEFACTOR": {"encendido": False, "ubicaciones": set()},
-            "VOLUMEN": {"nivel": 50, "silenciado": False},
-            "BRILLO": {"nivel": 70}
-        }
-        
-        self.stats = {
+        self.rangos_validos = dict(registro.rangos)
+        
+        # Estado de dispositivos: el mismo almacén que actualiza el ejecutor
+        self.estado = almacen or obtener_almacen()
+        
+        self.stats = EstadisticasSeguras({
             'comandos_validados': 0,
             'errores_semanticos': 0,
             'validaciones_exitosas': 0
-        }
+        })
+        
+        self.compilar_tablas()
+    
+    def compilar_tablas(self) -> None:
+        """Compilar la configuración en máscaras y tablas indexadas por código de token"""
+        self._mascara_dispositivos = mascara(*(TipoToken[d] for d in self.dispositivos_validos))
+        self._mascara_habitaciones = mascara(*(TipoToken[h] for h in self.habitaciones_validas))
+        self._mascara_acciones = mascara(*(TipoToken[a] for a in self.compatibilidad))
+        
+        # Fila por acción: máscara de dispositivos compatibles y su texto ya ordenado
+        self._matriz_compatibilidad = [0] * _NUM_CODIGOS
+        self._texto_compatibles = [""] * _NUM_CODIGOS
+        for accion, dispositivos in self.compatibilidad.items():
+            codigo = TipoToken[accion]
+            self._matriz_compatibilidad[codigo] = mascara(*(TipoToken[d] for d in dispositivos))
+            self._texto_compatibles[codigo] = ", ".join(sorted(dispositivos))
+        
+        self._rangos: List[Optional[Tuple[int, int]]] = [None] * _NUM_CODIGOS
+        for dispositivo, rango in self.rangos_validos.items():
+            self._rangos[TipoToken[dispositivo]] = rango
+        
+        self._texto_habitaciones = ", ".join(sorted(self.habitaciones_validas))
+        
+        if np is not None:
+            self._compilar_tablas_lote()
     
-    def extraer_elementos(self, tokens: List[Tuple[str, Any]]) -> Tuple[str, str, Optional[str], Optional[int]]:
-        """Extraer elementos semánticos del comando"""
+    def _compilar_tablas_lote(self) -> None:
+        """Versión NumPy de las tablas para validar_lote"""
+        codigos = np.arange(_NUM_CODIGOS)
+        bits = np.left_shift(1, codigos, dtype=np.int64)
+        self._np_dispositivos = (bits & self._mascara_dispositivos) != 0
+        self._np_acciones = (bits & self._mascara_acciones) != 0
+        self._np_habitaciones = (bits & self._mascara_habitaciones) != 0
+        self._np_habitaciones[TipoToken.EOF] = True   # EOF = sin habitación
+        filas = np.array(self._matriz_compatibilidad, dtype=np.int64)
+        self._np_compatibilidad = (filas[:, None] & bits[None, :]) != 0
+        self._np_con_rango = np.array([r is not None for r in self._rangos])
+        self._np_minimos = np.array([r[0] if r else -np.inf for r in self._rangos], dtype=np.float64)
+        self._np_maximos = np.array([r[1] if r else np.inf for r in self._rangos], dtype=np.float64)
+    
+    def extraer_elementos(self, tokens: List[Token]) -> Tuple[str, str, Optional[str], Optional[int]]:
+        """Extraer elementos semánticos de una lista de tokens (sin árbol sintáctico)"""
         accion = None
         dispositivo = None
         habitacion = None
         valor = None
         
-        i = 0
-        while i < len(tokens):
-            tipo, val = tokens[i]
-            
-            if tipo in self.compatibilidad.keys():
-                accion = tipo
-            elif tipo in self.dispositivos_validos:
-                dispositivo = tipo
-            elif tipo in self.habitaciones_validas:
-                habitacion = tipo
-            elif tipo == "NUMERO":
-                valor = val
+        for token in desde_tuplas(tokens):
+            bit = 1 << token.tipo
             
-            i += 1
+            if bit & MASCARA_ACCIONES:
+                accion = token.tipo.name
+            elif bit & _MASCARA_OBJETIVOS:
+                dispositivo = token.tipo.name
+            elif bit & MASCARA_HABITACIONES:
+                habitacion = token.tipo.name
+            elif token.tipo == TipoToken.NUMERO:
+                valor = token.valor
         
         return accion, dispositivo, habitacion, valor
     
     def validar_existencia(self, dispositivo: str) -> None:
         """Validar que el dispositivo existe en el contexto"""
-        if dispositivo not in self.dispositivos_validos:
+        if not (1 << _codigo(dispositivo)) & self._mascara_dispositivos:
             raise ExcepcionSemantica(
                 f"Dispositivo desconocido: {dispositivo}",
                 "dispositivos_disponibles"
@@ -96,34 +145,34 @@ class ValidadorSemanticoIoT:
     
     def validar_compatibilidad(self, accion: str, dispositivo: str) -> None:
         """Validar compatibilidad acción-dispositivo"""
-        if accion not in self.compatibilidad:
+        codigo_accion = _codigo(accion)
+        if not (1 << codigo_accion) & self._mascara_acciones:
             raise ExcepcionSemantica(
                 f"Acción desconocida: {accion}",
                 "acciones_disponibles"
             )
         
-        if dispositivo not in self.compatibilidad[accion]:
-            dispositivos_compatibles = ", ".join(self.compatibilidad[accion])
+        if not (1 << _codigo(dispositivo)) & self._matriz_compatibilidad[codigo_accion]:
             raise ExcepcionSemantica(
                 f"La acción '{accion}' no es compatible con '{dispositivo}'. "
-                f"Dispositivos compatibles: {dispositivos_compatibles}",
+                f"Dispositivos compatibles: {self._texto_compatibles[codigo_accion]}",
                 "compatibilidad_accion_dispositivo"
             )
     
     def validar_habitacion(self, habitacion: Optional[str]) -> None:
         """Validar que la habitación existe"""
-        if habitacion and habitacion not in self.habitaciones_validas:
-            habitaciones_disponibles = ", ".join(self.habitaciones_validas)
+        if habitacion and not (1 << _codigo(habitacion)) & self._mascara_habitaciones:
             raise ExcepcionSemantica(
                 f"Habitación no reconocida: {habitacion}. "
-                f"Habitaciones disponibles: {habitaciones_disponibles}",
+                f"Habitaciones disponibles: {self._texto_habitaciones}",
                 "habitaciones_disponibles"
             )
     
     def validar_rango_valor(self, dispositivo: str, valor: Optional[int]) -> None:
         """Validar que el valor está en rango válido"""
-        if valor is not None and dispositivo in self.rangos_validos:
-            min_val, max_val = self.rangos_validos[dispositivo]
+        rango = self._rangos[_codigo(dispositivo)]
+        if valor is not None and rango is not None:
+            min_val, max_val = rango
             if not (min_val <= valor <= max_val):
                 raise ExcepcionSemantica(
                     f"Valor {valor} fuera de rango para {dispositivo}. "
@@ -133,8 +182,8 @@ class ValidadorSemanticoIoT:
     
     def validar_transicion_estado(self, dispositivo: str, accion: str) -> None:
         """Validar que la transición de estado es válida"""
-        if dispositivo in self.estado_dispositivos:
-            estado_actual = self.estado_dispositivos[dispositivo]
+        _, estado_actual = self.estado.vista(dispositivo)
+        if estado_actual is not None:
             
             # Validaciones específicas por tipo de dispositivo
             if dispositivo in ["LUZ", "VENTILADOR", "TELEVISOR", "CALEFACTOR"]:
@@ -149,15 +198,18 @@ class ValidadorSemanticoIoT:
                 elif accion == "ACTIVAR" and not estado_actual.get("silenciado", False):
                     logger.warning("El volumen ya está activo")
     
-    def validar(self, tokens: List[Tuple[str, Any]]) -> Tuple[str, str, Optional[str], Optional[int]]:
-        """Validación semántica principal"""
-        self.stats['comandos_validados'] += 1
+    def validar(self, comando: Union[NodoComando, List[Token]]) -> Tuple[str, str, Optional[str], Optional[int]]:
+        """Validación semántica principal sobre el árbol del parser (o tokens heredados)"""
+        self.stats.incrementar('comandos_validados')
         
         try:
             logger.info("Iniciando validación semántica")
             
-            # Extraer elementos del comando
-            accion, dispositivo, habitacion, valor = self.extraer_elementos(tokens)
+            # Elementos del comando: directos del árbol, o reconstruidos de los tokens
+            if isinstance(comando, NodoComando):
+                accion, dispositivo, habitacion, valor = comando.como_tupla()
+            else:
+                accion, dispositivo, habitacion, valor = self.extraer_elementos(comando)
             
             logger.info(f"Elementos extraídos - Acción: {accion}, Dispositivo: {dispositivo}, "
                        f"Habitación: {habitacion}, Valor: {valor}")
@@ -176,27 +228,81 @@ class ValidadorSemanticoIoT:
             self.validar_rango_valor(dispositivo, valor)
             self.validar_transicion_estado(dispositivo, accion)
             
-            self.stats['validaciones_exitosas'] += 1
+            self.stats.incrementar('validaciones_exitosas')
             logger.info("Validación semántica exitosa")
             
             return accion, dispositivo, habitacion, valor
             
         except ExcepcionSemantica as e:
-            self.stats['errores_semanticos'] += 1
+            self.stats.incrementar('errores_semanticos')
             logger.error(f"Error semántico: {e.mensaje}")
             raise
     
+    def validar_lote(self, acciones: Sequence[int], dispositivos: Sequence[int],
+                     habitaciones: Sequence[int], valores: Sequence[float]) -> "np.ndarray":
+        """Validar columnas de códigos de token sin excepciones por fila
+        
+        habitaciones usa TipoToken.EOF para "sin habitación" y valores NaN para
+        "sin valor". Devuelve un CodigoErrorSemantico por fila, con la misma
+        prioridad que validar().
+        """
+        if np is None:
+            raise RuntimeError("validar_lote requiere NumPy (pip install numpy)")
+        
+        def columna(codigos):
+            codigos = np.asarray(codigos, dtype=np.intp)
+            fuera = (codigos < 0) | (codigos >= _NUM_CODIGOS)
+            return np.where(fuera, TipoToken.DESCONOCIDO, codigos)
+        
+        acciones = columna(acciones)
+        dispositivos = columna(dispositivos)
+        habitaciones = columna(habitaciones)
+        valores = np.asarray(valores, dtype=np.float64)
+        
+        fuera_de_rango = self._np_con_rango[dispositivos] & (
+            (valores < self._np_minimos[dispositivos]) | (valores > self._np_maximos[dispositivos])
+        )
+        
+        # De la comprobación menos a la más prioritaria: gana la primera que falla
+        errores = np.zeros(len(acciones), dtype=np.uint8)
+        errores[fuera_de_rango] = CodigoErrorSemantico.FUERA_DE_RANGO
+        errores[~self._np_habitaciones[habitaciones]] = CodigoErrorSemantico.HABITACION_DESCONOCIDA
+        errores[~self._np_compatibilidad[acciones, dispositivos]] = CodigoErrorSemantico.INCOMPATIBLE
+        errores[~self._np_acciones[acciones]] = CodigoErrorSemantico.ACCION_DESCONOCIDA
+        errores[~self._np_dispositivos[dispositivos]] = CodigoErrorSemantico.DISPOSITIVO_DESCONOCIDO
+        
+        fallidos = int(np.count_nonzero(errores))
+        self.stats.incrementar('comandos_validados', len(errores))
+        self.stats.incrementar('errores_semanticos', fallidos)
+        self.stats.incrementar('validaciones_exitosas', len(errores) - fallidos)
+        return errores
+    
     def get_stats(self) -> Dict[str, int]:
         """Obtener estadísticas del validador"""
         return self.stats.copy()
 
-# Instancia global del validador
+# Instancia global del validador (solo lee su configuración: segura entre hilos)
 _validator_instance = None
+_validator_lock = threading.Lock()
 
-def validar(tokens: List[Tuple[str, Any]]) -> Tuple[str, str, Optional[str], Optional[int]]:
-    """Función principal de validación semántica"""
+def _obtener_validador() -> ValidadorSemanticoIoT:
+    """Obtener (creando si hace falta) la instancia global del validador"""
     global _validator_instance
     if _validator_instance is None:
-        _validator_instance = ValidadorSemanticoIoT()
-    
-    return _validator_instance.validar(tokens)
\ No newline at end of file
+        with _validator_lock:
+            if _validator_instance is None:
+                _validator_instance = ValidadorSemanticoIoT()
+    return _validator_instance
+
+def validar(comando: Union[NodoComando, List[Token]]) -> Tuple[str, str, Optional[str], Optional[int]]:
+    """Función principal de validación semántica"""
+    return _obtener_validador().validar(comando)
+
+def validar_lote(acciones: Sequence[int], dispositivos: Sequence[int],
+                 habitaciones: Sequence[int], valores: Sequence[float]) -> "np.ndarray":
+    """Validación vectorizada de columnas de códigos (requiere NumPy)"""
+    return _obtener_validador().validar_lote(acciones, dispositivos, habitaciones, valores)
+
+def validar_transicion_estado(dispositivo: str, accion: str) -> None:
+    """Repetir solo las comprobaciones que dependen del estado actual"""
+    _obtener_validador().validar_transicion_estado(dispositivo, accion)
\ No newline at end of file
@@ -0,0 +1,190 @@
+# ============================================================================
+# speech/gramatica.py - Gramática de reconocimiento offline generada del léxico
+# ============================================================================
+
+import hashlib
+import logging
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import AbstractSet, Dict, FrozenSet, List, Optional
+
+from lexer.tokenizer import (
+    TipoToken, TokenizerIoT, MASCARA_CONSULTAS, MASCARA_DISPOSITIVOS, MASCARA_HABITACIONES
+)
+from parser.parser import GRAMATICA_IOT
+
+logger = logging.getLogger(__name__)
+
+# Números que el reconocedor offline devuelve en palabras ("cincuenta")
+_UNIDADES = ["cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho",
+             "nueve", "diez", "once", "doce", "trece", "catorce", "quince", "dieciséis",
+             "diecisiete", "dieciocho", "diecinueve", "veinte", "veintiuno", "veintidós",
+             "veintitrés", "veinticuatro", "veinticinco", "veintiséis", "veintisiete",
+             "veintiocho", "veintinueve"]
+_DECENAS = {30: "treinta", 40: "cuarenta", 50: "cincuenta", 60: "sesenta",
+            70: "setenta", 80: "ochenta", 90: "noventa"}
+
+def _numeros_hablados() -> Dict[str, int]:
+    numeros = {palabra: valor for valor, palabra in enumerate(_UNIDADES)}
+    for decena, palabra in _DECENAS.items():
+        numeros[palabra] = decena
+        for unidad in range(1, 10):
+            numeros[f"{palabra} y {_UNIDADES[unidad]}"] = decena + unidad
+    numeros["cien"] = 100
+    return numeros
+
+NUMEROS_HABLADOS: Dict[str, int] = _numeros_hablados()
+
+# De la expresión más larga a la más corta: "treinta y uno" antes que "treinta"
+_PATRON_NUMEROS = re.compile(
+    r"\b(" + "|".join(sorted(NUMEROS_HABLADOS, key=len, reverse=True)) + r")\b"
+)
+
+def convertir_numeros(texto: str) -> str:
+    """Sustituir los números dichos en palabras por cifras ("a cincuenta" → "a 50")"""
+    return _PATRON_NUMEROS.sub(lambda m: str(NUMEROS_HABLADOS[m.group(1)]), texto)
+
+# Terminales que admiten artículo delante ("la luz", "el baño")
+_MASCARA_CON_ARTICULO = MASCARA_DISPOSITIVOS | MASCARA_CONSULTAS | MASCARA_HABITACIONES
+
+def palabras_por_tipo(tokenizer: Optional[TokenizerIoT] = None) -> Dict[TipoToken, List[str]]:
+    """Palabras y frases del léxico agrupadas por el tipo que les asigna el tokenizador"""
+    tokenizer = tokenizer or TokenizerIoT(corregir_errores=False)
+    grupos: Dict[TipoToken, List[str]] = {}
+    for categoria in (tokenizer.ACCIONES, tokenizer.DISPOSITIVOS, tokenizer.HABITACIONES,
+                      tokenizer.CONSULTAS, tokenizer.PREPOSICIONES, tokenizer.CONJUNCIONES):
+        for palabra in categoria:
+            if not palabra.isalpha():
+                continue  # Signos (",") no se pronuncian
+            tipo = tokenizer.lexico[tokenizer.normalizar_texto(palabra)]
+            grupos.setdefault(tipo, []).append(palabra)
+    for frase, tipo in tokenizer.FRASES.items():
+        grupos.setdefault(TipoToken[tipo], []).append(frase)
+    return {tipo: list(dict.fromkeys(palabras)) for tipo, palabras in grupos.items()}
+
+def cargar_diccionario(ruta: Optional[Path] = None) -> Optional[FrozenSet[str]]:
+    """Palabras del diccionario de pronunciación de Sphinx (es-ES por defecto)
+
+    None si no está instalado: entonces la gramática no se filtra.
+    """
+    if ruta is None:
+        try:
+            import speech_recognition as sr
+        except ImportError:
+            return None
+        ruta = Path(sr.__file__).parent / "pocketsphinx-data" / "es-ES" / "pronounciation-dictionary.dict"
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return None
+    palabras = set()
+    with open(ruta, encoding="utf-8", errors="replace") as f:
+        for linea in f:
+            if linea.strip():
+                # Las variantes de pronunciación se escriben "palabra(2)"
+                palabras.add(linea.split(None, 1)[0].split("(", 1)[0].lower())
+    return frozenset(palabras)
+
+def _pronunciables(opciones: List[str], diccionario: Optional[AbstractSet[str]]) -> List[str]:
+    """Opciones cuyas palabras están todas en el diccionario (todas si no hay)"""
+    if diccionario is None:
+        return opciones
+    validas = [o for o in opciones if all(p in diccionario for p in o.split())]
+    descartadas = [o for o in opciones if o not in validas]
+    if descartadas:
+        logger.warning(f"Fuera del diccionario de pronunciación: {', '.join(descartadas)}")
+    return validas
+
+def _regla(nombre: str) -> str:
+    return "<" + nombre.lower().translate(str.maketrans("ñÑ", "nn")) + ">"
+
+def _alternativas(opciones: List[str]) -> str:
+    if not opciones:
+        return "<VOID>"  # Ninguna palabra pronunciable: la regla nunca se reconoce
+    return "( " + " | ".join(opciones) + " )"
+
+def generar_jsgf(nombre: str, tokenizer: Optional[TokenizerIoT] = None,
+                 diccionario: Optional[AbstractSet[str]] = None) -> str:
+    """Gramática JSGF con la estructura de GRAMATICA_IOT y las palabras del léxico
+
+    Solo se aceptan frases que el tokenizador y el parser entienden, de modo que
+    el decodificador busca entre unas pocas decenas de palabras y no en todo el
+    vocabulario del idioma. Con un diccionario se omiten las palabras que Sphinx
+    no sabe pronunciar ("tv", "mutear"), que harían fallar la carga.
+    """
+    palabras = {tipo: _pronunciables(lista, diccionario)
+                for tipo, lista in palabras_por_tipo(tokenizer).items()}
+    articulos = palabras.get(TipoToken.LA, []) + palabras.get(TipoToken.EL, [])
+
+    def simbolo(nombre_simbolo: str) -> Optional[str]:
+        if nombre_simbolo in GRAMATICA_IOT:
+            return _regla(nombre_simbolo)
+        tipo = TipoToken[nombre_simbolo]
+        if tipo == TipoToken.EOF:
+            return None  # Comandos cortados: no se generan al hablar
+        regla = _regla("t_" + nombre_simbolo)
+        if (1 << tipo) & _MASCARA_CON_ARTICULO:
+            return f"[ <articulo> ] {regla}"
+        return regla
+
+    terminales = set()
+    reglas = []
+    for no_terminal, producciones in GRAMATICA_IOT.items():
+        alternativas = []
+        for produccion in producciones:
+            if "EOF" in produccion:
+                continue
+            terminales.update(s for s in produccion if s not in GRAMATICA_IOT)
+            simbolos = [simbolo(s) for s in produccion]
+            alternativas.append(" ".join(simbolos) if simbolos else "<NULL>")
+        reglas.append(f"{_regla(no_terminal)} = {_alternativas(alternativas)};")
+
+    for terminal in sorted(terminales - {"EOF"}):
+        tipo = TipoToken[terminal]
+        if tipo == TipoToken.NUMERO:
+            opciones = _pronunciables(sorted(NUMEROS_HABLADOS, key=NUMEROS_HABLADOS.get), diccionario)
+        else:
+            opciones = palabras[tipo]
+        reglas.append(f"{_regla('t_' + terminal)} = {_alternativas(opciones)};")
+    reglas.append(f"<articulo> = {_alternativas(articulos)};")
+    reglas.append(f"{_regla('t_SEPARADOR')} = {_alternativas(palabras[TipoToken.SEPARADOR])};")
+
+    return "\n".join([
+        "#JSGF V1.0 UTF-8;",
+        f"grammar {nombre};",
+        f"public <{nombre}> = <comando> ( <t_separador> <comando> )*;",
+        *reglas,
+        ""
+    ])
+
+def escribir_gramatica(directorio: Optional[Path] = None,
+                       tokenizer: Optional[TokenizerIoT] = None,
+                       diccionario: Optional[AbstractSet[str]] = None) -> Path:
+    """Escribir la gramática JSGF y devolver su ruta
+
+    El nombre lleva un resumen del contenido: si el léxico cambia se genera otro
+    archivo, y Sphinx no reutiliza una versión compilada (.fsg) anterior.
+    """
+    directorio = Path(directorio or Path(tempfile.gettempdir()) / "voice_iot_gramatica")
+    resumen = hashlib.sha1(generar_jsgf("comandos", tokenizer, diccionario).encode("utf-8")).hexdigest()[:10]
+    nombre = f"comandos_{resumen}"
+    ruta = directorio / f"{nombre}.gram"
+    if not ruta.exists():
+        directorio.mkdir(parents=True, exist_ok=True)
+        ruta.write_text(generar_jsgf(nombre, tokenizer, diccionario), encoding="utf-8")
+        logger.info(f"Gramática de reconocimiento offline generada: {ruta}")
+    return ruta
+
+# Gramática compartida, generada la primera vez que se reconoce offline
+_gramatica_instance = None
+_gramatica_lock = threading.Lock()
+
+def obtener_gramatica() -> Path:
+    """Ruta de la gramática del léxico actual, generándola si hace falta"""
+    global _gramatica_instance
+    if _gramatica_instance is None:
+        with _gramatica_lock:
+            if _gramatica_instance is None:
+                _gramatica_instance = escribir_gramatica(diccionario=cargar_diccionario())
+    return _gramatica_instance
@@ -3,31 +3,104 @@
 # ============================================================================
 
 import speech_recognition as sr
+import atexit
+import queue
 import threading
+from collections import deque
 from datetime import datetime
 import json
 import logging
 import time
 import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Opcional: solo la escucha continua lo necesita
+    np = None
+
+from lexer.tokenizer import normalizar
+from speech.gramatica import convertir_numeros, obtener_gramatica
+from utils.estadisticas import EstadisticasSeguras
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# "online": Google, con reconocimiento local si no hay conexión; "offline": solo local
+MODOS_RECONOCIMIENTO = ("online", "offline")
+
+def reconocer_offline(audio: sr.AudioData, recognizer: Optional[sr.Recognizer] = None) -> str:
+    """Reconocimiento local (Sphinx) restringido a la gramática de comandos, sin red
+    
+    Lanza sr.UnknownValueError si el audio no es un comando de la gramática.
+    """
+    recognizer = recognizer or sr.Recognizer()
+    logger.info("Intentando reconocimiento offline...")
+    texto = recognizer.recognize_sphinx(
+        audio,
+        language="es-ES",
+        grammar=str(obtener_gramatica())
+    )
+    command = convertir_numeros(texto.lower().strip())
+    print(f"📝 Reconocido (offline): {command}")
+    logger.info(f"Comando reconocido offline: {command}")
+    return command
+
 class VoiceRecognizer:
-    def __init__(self):
+    """Sesión de reconocimiento de voz de larga duración
+    
+    El micrófono se abre y se calibra una sola vez; el flujo de audio sigue
+    abierto entre comandos y lo acumulado mientras tanto se descarta antes de
+    escuchar el siguiente. Un hilo recalibra en segundo plano cada cierto
+    tiempo, o antes si el ruido ambiente parece haber cambiado.
+    """
+    
+    def __init__(self, intervalo_recalibracion: float = 300.0,
+                 duracion_recalibracion: float = 0.5,
+                 max_fallos_seguidos: int = 3, factor_deriva: float = 2.0,
+                 modo: str = "online"):
+        if modo not in MODOS_RECONOCIMIENTO:
+            raise ValueError(f"Modo de reconocimiento no válido: {modo}")
         try:
             logger.info("Inicializando VoiceRecognizer...")
+            self.modo = modo
             self.recognizer = sr.Recognizer()
             self.microphone = sr.Microphone()
             # REMOVED: TTS engine initialization to avoid conflicts
             self.tts_enabled = False  # Disabled to prevent conflicts
-            self.calibrate_microphone()
-            self.stats = {
+            self.stats = EstadisticasSeguras({
                 'total_commands': 0,
                 'successful_recognitions': 0,
                 'failed_recognitions': 0,
-                'average_response_time': 0
-            }
+                'average_response_time': 0,
+                'calibraciones': 0
+            })
+            
+            # Configurar valores óptimos (la calibración ajusta el umbral de energía)
+            self.recognizer.energy_threshold = 4000
+            self.recognizer.dynamic_energy_threshold = True
+            self.recognizer.pause_threshold = 0.8
+            self.recognizer.phrase_threshold = 0.3
+            
+            self.intervalo_recalibracion = intervalo_recalibracion
+            self.duracion_recalibracion = duracion_recalibracion
+            self.max_fallos_seguidos = max_fallos_seguidos
+            self.factor_deriva = factor_deriva
+            self.umbral_calibrado = self.recognizer.energy_threshold
+            self._fallos_seguidos = 0
+            
+            # Flujo abierto durante toda la sesión; un solo hilo lo lee a la vez
+            self._lock_fuente = threading.Lock()
+            self._fuente = self.microphone.__enter__()
+            self.calibrate_microphone()
+            
+            self._recalibrar_ahora = threading.Event()
+            self._detener = threading.Event()
+            self._hilo_recalibracion = threading.Thread(
+                target=self._bucle_recalibracion, name="recalibracion-microfono", daemon=True
+            )
+            self._hilo_recalibracion.start()
             logger.info("VoiceRecognizer inicializado correctamente")
         except Exception as e:
             logger.error(f"Error inicializando VoiceRecognizer: {e}", exc_info=True)
@@ -43,22 +116,159 @@ class VoiceRecognizer:
             logger.error(f"Error en setup_tts: {e}")
             self.tts_enabled = False
     
-    def calibrate_microphone(self):
+    def calibrate_microphone(self, duracion: float = 1.0):
         """Calibrar micrófono para ruido ambiente"""
         try:
             logger.info("Calibrando micrófono...")
-            with self.microphone as source:
+            with self._lock_fuente:
                 logger.info("Ajustando para ruido ambiente...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                # Configurar valores óptimos
-                self.recognizer.energy_threshold = 4000
-                self.recognizer.dynamic_energy_threshold = True
-                self.recognizer.pause_threshold = 0.8
-                self.recognizer.phrase_threshold = 0.3
+                self._calibrar(duracion)
             logger.info("Micrófono calibrado exitosamente")
         except Exception as e:
             logger.error(f"Error calibrando micrófono: {e}", exc_info=True)
     
+    def _calibrar(self, duracion: float):
+        """Ajustar el umbral de energía al ruido actual (con el flujo ya reservado)"""
+        self.recognizer.adjust_for_ambient_noise(self._fuente, duration=duracion)
+        self.umbral_calibrado = self.recognizer.energy_threshold
+        self._fallos_seguidos = 0
+        self.stats.incrementar('calibraciones')
+        logger.info(f"Umbral de energía calibrado: {self.umbral_calibrado:.0f}")
+    
+    def _bucle_recalibracion(self):
+        """Hilo de recalibración: periódica o cuando el ruido ambiente deriva"""
+        while not self._detener.is_set():
+            self._recalibrar_ahora.wait(self.intervalo_recalibracion)
+            self._recalibrar_ahora.clear()
+            if self._detener.is_set():
+                break
+            # Si se está escuchando, el umbral dinámico ya se adapta: no se espera
+            if not self._lock_fuente.acquire(blocking=False):
+                continue
+            try:
+                self._calibrar(self.duracion_recalibracion)
+            except Exception as e:
+                logger.error(f"Error recalibrando micrófono: {e}")
+            finally:
+                self._lock_fuente.release()
+    
+    def _comprobar_deriva(self, fallo: bool):
+        """Pedir una recalibración si el umbral se alejó mucho o se acumulan fallos"""
+        self._fallos_seguidos = self._fallos_seguidos + 1 if fallo else 0
+        umbral = self.recognizer.energy_threshold
+        deriva = max(umbral, self.umbral_calibrado) / max(min(umbral, self.umbral_calibrado), 1)
+        if deriva > self.factor_deriva or self._fallos_seguidos >= self.max_fallos_seguidos:
+            logger.info(f"Ruido ambiente cambiado (umbral {umbral:.0f}, "
+                        f"{self._fallos_seguidos} fallos seguidos): recalibrando")
+            self._recalibrar_ahora.set()
+    
+    def _descartar_pendiente(self) -> int:
+        """Descartar el audio que el flujo acumuló sin leer desde el último comando
+        
+        Entre comandos nadie lee el micrófono y PortAudio conserva lo último que
+        captó: sin vaciarlo, listen() empezaría con sonido antiguo. Solo se lee
+        lo ya disponible, sin esperar audio nuevo. Devuelve las tramas descartadas.
+        """
+        flujo = getattr(self._fuente.stream, "pyaudio_stream", None)
+        if flujo is None:
+            return 0
+        descartadas = 0
+        try:
+            pendientes = flujo.get_read_available()
+            while pendientes > 0:
+                bloque = min(pendientes, self._fuente.CHUNK)
+                flujo.read(bloque, exception_on_overflow=False)
+                descartadas += bloque
+                pendientes -= bloque
+        except Exception as e:
+            logger.warning(f"No se pudo vaciar el flujo del micrófono: {e}")
+        return descartadas
+    
+    def escuchar(self, timeout: float = 5, phrase_time_limit: float = 10) -> Optional[sr.AudioData]:
+        """Capturar una frase del flujo abierto; None si no se habló a tiempo"""
+        # Con la escucha continua activa el flujo está ocupado: no se espera más que timeout
+        if not self._lock_fuente.acquire(timeout=timeout):
+            logger.warning("Micrófono ocupado por la escucha continua")
+            return None
+        try:
+            self._descartar_pendiente()
+            audio = self.recognizer.listen(
+                self._fuente,
+                timeout=timeout,
+                phrase_time_limit=phrase_time_limit
+            )
+        except sr.WaitTimeoutError:
+            audio = None
+        finally:
+            self._lock_fuente.release()
+        self._comprobar_deriva(fallo=audio is None)
+        return audio
+    
+    def reconocer(self, audio: sr.AudioData, start_time: Optional[float] = None) -> Optional[str]:
+        """Transcribir una frase capturada; None si no se entendió"""
+        start_time = time.time() if start_time is None else start_time
+        try:
+            if self.modo == "offline":
+                command = reconocer_offline(audio, self.recognizer)
+            else:
+                try:
+                    # Intentar Google Speech Recognition primero
+                    logger.info("Intentando reconocimiento con Google Speech API...")
+                    command = self.recognizer.recognize_google(
+                        audio, 
+                        language="es-ES"
+                    ).lower().strip()
+                    print(f"📝 Reconocido: {command}")
+                    logger.info(f"Comando reconocido exitosamente: {command}")
+                except sr.RequestError as e:
+                    logger.warning(f"Error de API de Google: {e}")
+                    # Sin conexión: reconocimiento local con la gramática de comandos
+                    command = reconocer_offline(audio, self.recognizer)
+        
+        except sr.RequestError as offline_error:
+            logger.error(f"Error en reconocimiento offline: {offline_error}")
+            print("❌ Reconocimiento local no disponible")
+            self.stats.incrementar('failed_recognitions')
+            return None
+        
+        except sr.UnknownValueError:
+            print("❌ No se pudo entender el audio")
+            logger.warning("Audio no reconocido")
+            print("💡 Intenta hablar más claro y cerca del micrófono")
+            self.registrar_fallo()
+            return None
+        
+        # Calcular tiempo de respuesta
+        response_time = time.time() - start_time
+        self.stats.incrementar('successful_recognitions')
+        self.stats.asignar('average_response_time', (
+            self.stats['average_response_time'] + response_time
+        ) / 2)
+        
+        # FIXED: No usar TTS aquí - solo feedback en consola
+        print("✅ Comando recibido y procesado")
+        return command
+    
+    def registrar_fallo(self):
+        """Anotar un audio que no se pudo entender"""
+        self.stats.incrementar('failed_recognitions')
+        self._comprobar_deriva(fallo=True)
+    
+    def cerrar(self):
+        """Detener la recalibración y cerrar el flujo del micrófono"""
+        if self._detener.is_set():
+            return
+        self._detener.set()
+        self._recalibrar_ahora.set()
+        self._hilo_recalibracion.join(timeout=5)
+        if not self._lock_fuente.acquire(timeout=5):
+            logger.warning("Micrófono aún ocupado al cerrar la sesión")
+            return
+        try:
+            self.microphone.__exit__(None, None, None)
+        finally:
+            self._lock_fuente.release()
+    
     def speak(self, text):
         """Retroalimentación de voz DESHABILITADA - solo muestra en consola"""
         try:
@@ -73,86 +283,215 @@ class VoiceRecognizer:
         """Obtener estadísticas de uso"""
         return self.stats.copy()
 
+class DetectorVoz:
+    """Detector de actividad de voz por energía y cruces por cero (PCM de 16 bits)
+    
+    Una trama es voz si su energía supera el umbral. Las tramas con muchos cruces
+    por cero (siseo, ventiladores, pero también fricativas como la «s») no abren
+    una frase, aunque sí la continúan. El umbral sigue al ruido de fondo medido
+    en las tramas sin voz.
+    """
+    
+    def __init__(self, umbral_inicial: float = 300.0, factor_ruido: float = 3.0,
+                 umbral_minimo: float = 100.0, zcr_maximo: float = 0.35,
+                 adaptacion: float = 0.05):
+        if np is None:
+            raise RuntimeError("La escucha continua requiere NumPy (pip install numpy)")
+        self.factor_ruido = factor_ruido
+        self.umbral_minimo = umbral_minimo
+        self.zcr_maximo = zcr_maximo
+        self.adaptacion = adaptacion
+        self.ruido = max(umbral_inicial, umbral_minimo) / factor_ruido
+    
+    @property
+    def umbral(self) -> float:
+        return max(self.umbral_minimo, self.ruido * self.factor_ruido)
+    
+    def es_voz(self, trama: bytes, en_frase: bool = False) -> bool:
+        """Clasificar una trama y, si es silencio, actualizar el nivel de ruido"""
+        muestras = np.frombuffer(trama, dtype=np.int16)
+        if muestras.size < 2:
+            return False
+        energia = float(np.sqrt(np.mean(np.square(muestras, dtype=np.float32))))
+        cruces = np.count_nonzero(np.signbit(muestras[1:]) != np.signbit(muestras[:-1])) / muestras.size
+        voz = energia > self.umbral and (en_frase or cruces < self.zcr_maximo)
+        if not voz:
+            self.ruido += self.adaptacion * (energia - self.ruido)
+        return voz
+
+class EscuchaContinua:
+    """Escucha manos libres: un hilo captura, el VAD corta las frases y otro las reconoce
+    
+    El audio pasa por un búfer circular corto (preludio) para no perder el
+    inicio de cada frase; solo las frases con voz llegan a la cola de
+    reconocimiento, nunca el silencio. Mientras está activa ocupa el flujo del
+    micrófono de la sesión.
+    """
+    
+    def __init__(self, reconocedor: VoiceRecognizer, al_reconocer: Callable[[str], None],
+                 detector: Optional[DetectorVoz] = None, pausa: float = 0.8,
+                 preludio: float = 0.3, min_voz: float = 0.1, max_frase: float = 10.0,
+                 max_cola: int = 4):
+        self.reconocedor = reconocedor
+        self.al_reconocer = al_reconocer
+        self.detector = detector or DetectorVoz(reconocedor.recognizer.energy_threshold)
+        fuente = reconocedor._fuente
+        self.frecuencia = fuente.SAMPLE_RATE
+        self.ancho_muestra = fuente.SAMPLE_WIDTH
+        self.tam_trama = fuente.CHUNK
+        duracion_trama = self.tam_trama / self.frecuencia
+        self.tramas_pausa = max(1, round(pausa / duracion_trama))
+        self.tramas_min_voz = max(1, round(min_voz / duracion_trama))
+        self.tramas_max_frase = max(1, round(max_frase / duracion_trama))
+        self._preludio = deque(maxlen=max(1, round(preludio / duracion_trama)))
+        self.cola_frases: "queue.Queue[Optional[sr.AudioData]]" = queue.Queue(max_cola)
+        self._detener = threading.Event()
+        self._hilos = []
+        self.stats = EstadisticasSeguras({
+            'frases_detectadas': 0,
+            'frases_descartadas': 0,
+            'comandos_reconocidos': 0
+        })
+    
+    @property
+    def activa(self) -> bool:
+        return any(hilo.is_alive() for hilo in self._hilos)
+    
+    def iniciar(self):
+        """Arrancar los hilos de captura y de reconocimiento"""
+        if self.activa:
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._bucle_captura, name="escucha-continua", daemon=True),
+            threading.Thread(target=self._bucle_reconocimiento, name="reconocimiento-continuo", daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        logger.info("Escucha continua iniciada")
+    
+    def detener(self):
+        """Detener la escucha y liberar el micrófono"""
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        logger.info("Escucha continua detenida")
+    
+    def _bucle_captura(self):
+        """Leer tramas del micrófono y encolar cada frase delimitada por el VAD"""
+        with self.reconocedor._lock_fuente:
+            flujo = self.reconocedor._fuente.stream
+            frase = []
+            voz_seguidas = silencio = 0
+            while not self._detener.is_set():
+                try:
+                    trama = flujo.read(self.tam_trama)
+                except Exception as e:
+                    logger.error(f"Error leyendo el micrófono: {e}")
+                    break
+                voz = self.detector.es_voz(trama, en_frase=bool(frase))
+                
+                if not frase:
+                    # En espera: solo se guarda el preludio
+                    self._preludio.append(trama)
+                    voz_seguidas = voz_seguidas + 1 if voz else 0
+                    if voz_seguidas >= self.tramas_min_voz:
+                        frase = list(self._preludio)
+                        self._preludio.clear()
+                        silencio = 0
+                    continue
+                
+                frase.append(trama)
+                silencio = 0 if voz else silencio + 1
+                if silencio >= self.tramas_pausa or len(frase) >= self.tramas_max_frase:
+                    # El silencio final no se envía al reconocedor
+                    self._encolar(frase[:len(frase) - silencio])
+                    frase = []
+                    voz_seguidas = 0
+        self.cola_frases.put(None)  # Fin: despierta al hilo de reconocimiento
+    
+    def _encolar(self, tramas):
+        """Pasar una frase al reconocimiento (descartándola si va muy retrasado)"""
+        audio = sr.AudioData(b"".join(tramas), self.frecuencia, self.ancho_muestra)
+        try:
+            self.cola_frases.put_nowait(audio)
+            self.stats.incrementar('frases_detectadas')
+        except queue.Full:
+            self.stats.incrementar('frases_descartadas')
+            logger.warning("Cola de reconocimiento llena: frase descartada")
+    
+    def _bucle_reconocimiento(self):
+        """Reconocer las frases encoladas y entregar el texto"""
+        while True:
+            audio = self.cola_frases.get()
+            if audio is None:
+                break
+            self.reconocedor.stats.incrementar('total_commands')
+            try:
+                comando = self.reconocedor.reconocer(audio)
+            except Exception as e:
+                # Un fallo con una frase no debe parar la escucha
+                logger.error(f"Error reconociendo frase continua: {e}", exc_info=True)
+                continue
+            if comando:
+                self.stats.incrementar('comandos_reconocidos')
+                try:
+                    self.al_reconocer(comando)
+                except Exception as e:
+                    logger.error(f"Error procesando comando continuo: {e}", exc_info=True)
+
+# Sesión de reconocimiento compartida: se crea (y calibra) en el primer comando
+_recognizer_instance = None
+_recognizer_lock = threading.Lock()
+_modo_reconocimiento = "online"
+
+def establecer_modo(modo: str):
+    """Elegir el modo de reconocimiento ("online" u "offline") de la sesión"""
+    global _modo_reconocimiento
+    if modo not in MODOS_RECONOCIMIENTO:
+        raise ValueError(f"Modo de reconocimiento no válido: {modo}")
+    _modo_reconocimiento = modo
+    if _recognizer_instance is not None:
+        _recognizer_instance.modo = modo
+    logger.info(f"Modo de reconocimiento: {modo}")
+
+def obtener_modo() -> str:
+    """Modo de reconocimiento actual de la sesión"""
+    return _modo_reconocimiento
+
+def obtener_reconocedor() -> VoiceRecognizer:
+    """Obtener la sesión de reconocimiento, abriéndola si aún no existe"""
+    global _recognizer_instance
+    if _recognizer_instance is None:
+        with _recognizer_lock:
+            if _recognizer_instance is None:
+                _recognizer_instance = VoiceRecognizer(modo=_modo_reconocimiento)
+    return _recognizer_instance
+
 def reconocer_comando_voz():
     """Función principal para reconocimiento de voz SIN conflictos TTS"""
     try:
         logger.info("=== INICIANDO RECONOCIMIENTO DE VOZ ===")
-        recognizer = VoiceRecognizer()
+        recognizer = obtener_reconocedor()
         start_time = time.time()
         
-        recognizer.stats['total_commands'] += 1
+        recognizer.stats.incrementar('total_commands')
         
         logger.info("Capturando audio del micrófono...")
-        with recognizer.microphone as source:
-            print("🎤 Escuchando...")
-            logger.info("Iniciando captura de audio")
-            try:
-                audio = recognizer.recognizer.listen(
-                    source, 
-                    timeout=5, 
-                    phrase_time_limit=10
-                )
-                logger.info("Audio capturado exitosamente")
-            except sr.WaitTimeoutError:
-                logger.warning("Timeout esperando audio")
-                print("⏰ Timeout esperando comando")
-                return None
+        print("🎤 Escuchando...")
+        logger.info("Iniciando captura de audio")
+        audio = recognizer.escuchar(timeout=5, phrase_time_limit=10)
+        if audio is None:
+            logger.warning("Timeout esperando audio")
+            print("⏰ Timeout esperando comando")
+            return None
+        logger.info("Audio capturado exitosamente")
         
         print("🔄 Procesando audio...")
         logger.info("Audio capturado, iniciando reconocimiento")
         
         try:
-            # Intentar Google Speech Recognition primero
-            logger.info("Intentando reconocimiento con Google Speech API...")
-            command = recognizer.recognizer.recognize_google(
-                audio, 
-                language="es-ES"
-            )
-            
-            # Calcular tiempo de respuesta
-            response_time = time.time() - start_time
-            recognizer.stats['successful_recognitions'] += 1
-            recognizer.stats['average_response_time'] = (
-                recognizer.stats['average_response_time'] + response_time
-            ) / 2
-            
-            print(f"📝 Reconocido: {command}")
-            logger.info(f"Comando reconocido exitosamente: {command}")
-            
-            # FIXED: No usar TTS aquí - solo feedback en consola
-            print("✅ Comando recibido y procesado")
-            
-            return command.lower().strip()
-        
-        except sr.RequestError as e:
-            logger.warning(f"Error de API de Google: {e}")
-            # Fallback a reconocimiento offline si está disponible
-            try:
-                logger.info("Intentando reconocimiento offline...")
-                command = recognizer.recognizer.recognize_sphinx(
-                    audio, 
-                    language="es-ES"
-                )
-                print(f"📝 Reconocido (offline): {command}")
-                logger.info(f"Comando reconocido offline: {command}")
-                
-                # FIXED: No usar TTS - solo mensaje en consola
-                print("✅ Comando recibido usando reconocimiento local")
-                return command.lower().strip()
-                
-            except Exception as offline_error:
-                logger.error(f"Error en reconocimiento offline: {offline_error}")
-                print("❌ Error de conexión y reconocimiento local no disponible")
-                recognizer.stats['failed_recognitions'] += 1
-                return None
-        
-        except sr.UnknownValueError:
-            print("❌ No se pudo entender el audio")
-            logger.warning("Audio no reconocido")
-            print("💡 Intenta hablar más claro y cerca del micrófono")
-            recognizer.stats['failed_recognitions'] += 1
-            return None
-            
+            return recognizer.reconocer(audio, start_time)
         except Exception as e:
             logger.error(f"Error inesperado en reconocimiento: {e}", exc_info=True)
             print(f"❌ Error inesperado en reconocimiento: {str(e)}")
@@ -166,6 +505,75 @@ def reconocer_comando_voz():
         traceback.print_exc()
         return None
 
+_escucha_continua = None
+
+def iniciar_escucha_continua(al_reconocer: Callable[[str], None]) -> EscuchaContinua:
+    """Activar el modo manos libres; al_reconocer recibe cada comando (en otro hilo)"""
+    global _escucha_continua
+    reconocedor = obtener_reconocedor()
+    with _recognizer_lock:
+        if _escucha_continua is None or not _escucha_continua.activa:
+            _escucha_continua = EscuchaContinua(reconocedor, al_reconocer)
+            _escucha_continua.iniciar()
+    return _escucha_continua
+
+def detener_escucha_continua():
+    """Desactivar el modo manos libres"""
+    global _escucha_continua
+    with _recognizer_lock:
+        escucha, _escucha_continua = _escucha_continua, None
+    if escucha is not None:
+        escucha.detener()
+
+def _cerrar_sesion():
+    """Al salir: detener la escucha continua y después cerrar el micrófono"""
+    detener_escucha_continua()
+    if _recognizer_instance is not None:
+        _recognizer_instance.cerrar()
+
+atexit.register(_cerrar_sesion)
+
+def evaluar_corpus(directorio: str) -> Dict[str, Any]:
+    """Pasar un corpus de audios grabados por el reconocimiento offline
+    
+    Cada archivo .wav del directorio puede ir acompañado de un .txt con el
+    comando esperado. No necesita micrófono ni conexión.
+    """
+    recognizer = sr.Recognizer()
+    resultados = []
+    for ruta in sorted(Path(directorio).glob("*.wav")):
+        with sr.AudioFile(str(ruta)) as fuente:
+            audio = recognizer.record(fuente)
+        
+        inicio = time.perf_counter()
+        try:
+            reconocido = reconocer_offline(audio, recognizer)
+        except sr.UnknownValueError:
+            reconocido = None
+        duracion = time.perf_counter() - inicio
+        
+        ruta_esperado = ruta.with_suffix(".txt")
+        esperado = ruta_esperado.read_text(encoding="utf-8").strip() if ruta_esperado.exists() else None
+        acierto = (None if esperado is None else reconocido is not None and
+                   normalizar(convertir_numeros(esperado.lower())) == normalizar(reconocido))
+        resultados.append({
+            'archivo': ruta.name,
+            'esperado': esperado,
+            'reconocido': reconocido,
+            'acierto': acierto,
+            'tiempo': duracion
+        })
+    
+    evaluados = [r for r in resultados if r['acierto'] is not None]
+    aciertos = sum(1 for r in evaluados if r['acierto'])
+    return {
+        'total': len(resultados),
+        'aciertos': aciertos,
+        'precision': aciertos / len(evaluados) if evaluados else None,
+        'tiempo_medio': sum(r['tiempo'] for r in resultados) / len(resultados) if resultados else 0.0,
+        'resultados': resultados
+    }
+
 # Alternative simple function if the class approach has issues
 def simple_voice_recognition():
     """Versión ultra-simple de reconocimiento sin TTS"""
@@ -0,0 +1,86 @@
+# ============================================================================
+# tests/test_almacen_estado.py - Almacén único del estado de los dispositivos
+# ============================================================================
+
+import pytest
+
+from utils.almacen_estado import AlmacenEstado, estados_por_defecto, nivel_siguiente
+from utils.registro import obtener_registro
+
+@pytest.fixture
+def almacen():
+    return AlmacenEstado(estados_por_defecto(obtener_registro()))
+
+@pytest.mark.parametrize("tipo, nivel, accion, valor, esperado", [
+    ("VOLUMEN", 50, "subir", None, 60),
+    ("VOLUMEN", 95, "subir", None, 100),
+    ("VOLUMEN", 5, "bajar", None, 0),
+    ("BRILLO", 15, "bajar", None, 10),
+    ("VOLUMEN", 50, "AJUSTAR", 30, 30),
+    ("VOLUMEN", 50, "ajustar", None, 50),
+    ("VOLUMEN", 50, "silenciar", None, 50),
+])
+def test_nivel_siguiente(tipo, nivel, accion, valor, esperado):
+    assert nivel_siguiente(tipo, nivel, accion, valor) == esperado
+
+def test_ajustar_nivel(almacen):
+    assert almacen.ajustar_nivel("volumen", "subir") == 60
+    assert almacen.ajustar_nivel("VOLUMEN", "ajustar", 20) == 20
+    assert almacen.leer("volumen", "nivel") == 20
+
+def test_consultas_no_tienen_estado(almacen):
+    assert "HORA" not in almacen and "BATERIA" not in almacen
+
+def test_cada_escritura_incrementa_la_version(almacen):
+    inicial = almacen.version
+    assert almacen.modificar("luz", encendido=True) == inicial + 1
+    assert almacen.modificar_ubicacion("ventilador", "SALA", True) == inicial + 2
+    assert almacen.vista("LUZ")[0] == inicial + 1
+    assert almacen.vista("VENTILADOR")[0] == inicial + 2
+    assert almacen.vista("DESCONOCIDO") == (0, None)
+
+def test_vistas_inmutables(almacen):
+    _, vista = almacen.vista("luz")
+    with pytest.raises(TypeError):
+        vista["encendido"] = True
+    with pytest.raises(TypeError):
+        vista["ubicaciones"]["COCINA"] = True
+    _, todas = almacen.vistas()
+    with pytest.raises(TypeError):
+        todas["LUZ"] = {}
+
+def test_vistas_anteriores_no_cambian(almacen):
+    version, vista = almacen.vista("luz")
+    _, global_anterior = almacen.vistas()
+    almacen.modificar_ubicacion("luz", "COCINA", True)
+    assert vista["ubicaciones"]["COCINA"] is False
+    assert global_anterior["LUZ"] is vista
+    nueva_version, nueva = almacen.vista("luz")
+    assert nueva_version > version and nueva["ubicaciones"]["COCINA"] is True
+
+def test_instantanea_es_una_copia_mutable(almacen):
+    _, copia = almacen.instantanea("luz")
+    copia["ubicaciones"]["COCINA"] = True
+    assert almacen.leer("luz", "ubicaciones")["COCINA"] is False
+    assert almacen.instantanea("HORA") == (0, None)
+
+def test_editar_con_error_no_publica(almacen):
+    version = almacen.version
+    with pytest.raises(RuntimeError):
+        with almacen.editar("luz") as estado:
+            estado["encendido"] = True
+            raise RuntimeError("fallo a mitad")
+    assert almacen.version == version
+    assert almacen.leer("luz", "encendido") is False
+
+def test_observadores_reciben_escrituras_en_orden(almacen):
+    recibidas = []
+    def observador(clave, anterior, nueva, version):
+        recibidas.append((clave, anterior.get("nivel"), nueva["nivel"], version))
+    almacen.observar(observador)
+    almacen.ajustar_nivel("volumen", "ajustar", 30)
+    almacen.ajustar_nivel("volumen", "subir")
+    almacen.dejar_de_observar(observador)
+    almacen.ajustar_nivel("volumen", "subir")
+    assert [r[:3] for r in recibidas] == [("VOLUMEN", 50, 30), ("VOLUMEN", 30, 40)]
+    assert recibidas[0][3] < recibidas[1][3]
@@ -0,0 +1,75 @@
+# ============================================================================
+# tests/test_executor.py - Ejecución de lotes de comandos
+# ============================================================================
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("psutil")
+pytest.importorskip("pyttsx3")
+
+from executor.executor import EjecutorAccionesIoT, agrupar_por_recurso
+from utils.almacen_estado import AlmacenEstado, estados_por_defecto
+from utils.estadisticas import EstadisticasSeguras
+from utils.registro import obtener_registro
+
+def test_luz_y_brillo_comparten_recurso():
+    comandos = [("APAGAR", "LUZ", None, None), ("SUBIR", "BRILLO", None, None),
+                ("ENCENDER", "VENTILADOR", "OFICINA", None)]
+    assert agrupar_por_recurso(comandos) == [comandos[:2], comandos[2:]]
+
+def test_lote_luz_brillo_se_ejecuta_en_orden():
+    ejecutor = EjecutorAccionesIoT.__new__(EjecutorAccionesIoT)  # Sin TTS ni sistema
+    orden = []
+    lock = threading.Lock()
+    
+    def execute(accion, dispositivo, ubicacion=None, valor=None):
+        if dispositivo == "LUZ":
+            time.sleep(0.05)  # Si corriera en paralelo, BRILLO terminaría antes
+        with lock:
+            orden.append((accion, dispositivo))
+    
+    ejecutor.execute = execute
+    ejecutor.execute_batch([("APAGAR", "LUZ", None, None), ("SUBIR", "BRILLO", None, None)])
+    assert orden == [("APAGAR", "LUZ"), ("SUBIR", "BRILLO")]
+
+def _ejecutor_simulado():
+    """Ejecutor sin TTS ni controladores del sistema: solo la rama simulada"""
+    ejecutor = EjecutorAccionesIoT.__new__(EjecutorAccionesIoT)
+    ejecutor.platform = "Simulado"
+    ejecutor.estado = AlmacenEstado(estados_por_defecto(obtener_registro()))
+    ejecutor.stats = EstadisticasSeguras({'comandos_simulados': 0, 'comandos_reales': 0})
+    return ejecutor
+
+@pytest.mark.parametrize("accion, nivel", [("subir", 60), ("bajar", 40), ("SUBIR", 60)])
+def test_volumen_simulado_sube_y_baja(accion, nivel):
+    ejecutor = _ejecutor_simulado()
+    assert ejecutor.controlar_volumen_sistema(accion)
+    assert ejecutor.estado.leer("volumen", "nivel") == nivel
+
+def test_brillo_simulado_respeta_limites():
+    ejecutor = _ejecutor_simulado()
+    ejecutor.controlar_brillo_sistema("ajustar", 15)
+    ejecutor.controlar_brillo_sistema("bajar")
+    ejecutor.controlar_brillo_sistema("bajar")
+    assert ejecutor.estado.leer("brillo", "nivel") == 10
+
+def test_ejecutor_global_se_crea_una_sola_vez(monkeypatch):
+    import executor.executor as modulo
+    creados = []
+    
+    class EjecutorLento:
+        def __init__(self):
+            time.sleep(0.05)  # Como pyttsx3.init(): deja a otros hilos llegar a la vez
+            creados.append(self)
+    
+    monkeypatch.setattr(modulo, "EjecutorAccionesIoT", EjecutorLento)
+    monkeypatch.setattr(modulo, "_executor_instance", None)
+    hilos = [threading.Thread(target=modulo._obtener_ejecutor) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(creados) == 1
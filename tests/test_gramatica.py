@@ -0,0 +1,83 @@
+# ============================================================================
+# tests/test_gramatica.py - Gramática JSGF del reconocimiento offline
+# ============================================================================
+
+import re
+import wave
+
+import pytest
+
+from lexer.tokenizer import tokenizar
+from parser.parser import analizar_lote
+from speech.gramatica import (
+    cargar_diccionario, convertir_numeros, escribir_gramatica, generar_jsgf
+)
+
+def _reglas(jsgf):
+    """Reglas de la gramática: nombre → cuerpo"""
+    return dict(re.findall(r"^(?:public )?(<\w+>) = (.*);$", jsgf, re.MULTILINE))
+
+def _vocabulario(jsgf):
+    palabras = set()
+    for cuerpo in _reglas(jsgf).values():
+        palabras.update(re.findall(r"(?<![<\w])[^\W\d_]+(?![\w>])", cuerpo))
+    return palabras
+
+def test_todas_las_reglas_usadas_estan_definidas():
+    jsgf = generar_jsgf("comandos")
+    assert jsgf.startswith("#JSGF V1.0 UTF-8;\ngrammar comandos;\n")
+    reglas = _reglas(jsgf)
+    usadas = {r for cuerpo in reglas.values() for r in re.findall(r"<\w+>", cuerpo)}
+    assert usadas - {"<NULL>", "<VOID>"} <= set(reglas)
+
+@pytest.mark.parametrize("frase, esperado", [
+    ("enciende la luz en la cocina", ("ENCENDER", "LUZ", "COCINA", None)),
+    ("ajusta el volumen a cincuenta", ("AJUSTAR", "VOLUMEN", None, 50)),
+    ("sube el brillo treinta y cinco", ("SUBIR", "BRILLO", None, 35)),
+    ("dime la hora", ("VER", "HORA", None, None)),
+])
+def test_frases_de_la_gramatica_se_analizan(frase, esperado):
+    assert set(frase.split()) <= _vocabulario(generar_jsgf("comandos"))
+    [nodo] = analizar_lote(tokenizar(convertir_numeros(frase)))
+    assert nodo.como_tupla() == esperado
+
+def test_palabras_fuera_del_diccionario_se_omiten():
+    vocabulario = _vocabulario(generar_jsgf("comandos"))
+    assert {"tv", "mutear", "living"} <= vocabulario
+    jsgf = generar_jsgf("comandos", diccionario=vocabulario - {"tv", "mutear", "living"})
+    assert not {"tv", "mutear", "living"} & _vocabulario(jsgf)
+    assert "televisor" in _vocabulario(jsgf)
+
+def test_regla_sin_palabras_pronunciables_es_void():
+    jsgf = generar_jsgf("comandos", diccionario=_vocabulario(generar_jsgf("comandos")) - {"cocina"})
+    assert _reglas(jsgf)["<t_cocina>"] == "<VOID>"
+
+def test_cargar_diccionario(tmp_path):
+    ruta = tmp_path / "es.dict"
+    ruta.write_text("luz l u z\nsala s a l a\nsala(2) s a l a\n", encoding="utf-8")
+    assert cargar_diccionario(ruta) == {"luz", "sala"}
+    assert cargar_diccionario(tmp_path / "no_existe.dict") is None
+
+def test_escribir_gramatica_nombre_por_contenido(tmp_path):
+    ruta = escribir_gramatica(tmp_path)
+    assert ruta == escribir_gramatica(tmp_path)
+    assert f"grammar {ruta.stem};" in ruta.read_text(encoding="utf-8")
+    otra = escribir_gramatica(tmp_path, diccionario=_vocabulario(ruta.read_text(encoding="utf-8")) - {"tv"})
+    assert otra != ruta
+
+def test_evaluar_corpus(tmp_path):
+    pytest.importorskip("speech_recognition")
+    pytest.importorskip("pocketsphinx")
+    from speech.recognizer import evaluar_corpus
+
+    with wave.open(str(tmp_path / "silencio.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\x00\x00" * 16000)
+    (tmp_path / "silencio.txt").write_text("enciende la luz", encoding="utf-8")
+
+    resultado = evaluar_corpus(str(tmp_path))
+    assert resultado['total'] == 1
+    assert resultado['aciertos'] == 0
+    assert resultado['resultados'][0]['esperado'] == "enciende la luz"
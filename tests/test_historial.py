@@ -0,0 +1,154 @@
+# ============================================================================
+# tests/test_historial.py - Historial de comandos (SQLite y memoria)
+# ============================================================================
+
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from utils.historial import EntradaHistorial, HistorialComandos, HistorialReciente
+
+@pytest.fixture
+def historial(tmp_path):
+    historial = HistorialComandos(str(tmp_path / "historial.db"), tam_lote=1000,
+                                  intervalo_escritura=3600)
+    yield historial
+    historial.cerrar()
+
+def test_ultimas_acciones_filtra_y_ordena(historial):
+    historial.registrar("ENCENDER", "LUZ", "COCINA", timestamp=100)
+    historial.registrar("APAGAR", "LUZ", "SALA", timestamp=200)
+    historial.registrar("AJUSTAR", "VOLUMEN", None, 30, exito=False, timestamp=300)
+    historial.registrar_texto("enciende la luz")
+    
+    assert [a['accion'] for a in historial.ultimas_acciones()] == ["AJUSTAR", "APAGAR", "ENCENDER"]
+    assert [a['ubicacion'] for a in historial.ultimas_acciones("LUZ")] == ["SALA", "COCINA"]
+    assert [a['accion'] for a in historial.ultimas_acciones(ubicacion="COCINA")] == ["ENCENDER"]
+    assert historial.ultimas_acciones("LUZ", n=1)[0]['accion'] == "APAGAR"
+    [ajuste] = historial.ultimas_acciones("VOLUMEN")
+    assert ajuste['valor'] == 30 and ajuste['exito'] is False
+    assert ajuste['timestamp'] == datetime.fromtimestamp(300).isoformat()
+
+def test_ultimo_texto(historial):
+    assert historial.ultimo_texto() is None
+    historial.registrar_texto("enciende la luz")
+    historial.registrar("ENCENDER", "LUZ")
+    historial.registrar_texto("apaga la luz")
+    assert historial.ultimo_texto() == "apaga la luz"
+
+def test_conteo_por_hora_agrupa_y_filtra(historial):
+    base = datetime(2024, 5, 1, 10).timestamp()
+    for minutos in (0, 15, 59):
+        historial.registrar("ENCENDER", "LUZ", timestamp=base + minutos * 60)
+    historial.registrar("APAGAR", "VENTILADOR", timestamp=base + 30 * 60)
+    historial.registrar("SUBIR", "LUZ", timestamp=base + 2 * 3600)
+    historial.registrar_texto("texto sin acción")
+    
+    assert historial.conteo_por_hora() == [
+        (datetime(2024, 5, 1, 10), 4), (datetime(2024, 5, 1, 12), 1)
+    ]
+    assert historial.conteo_por_hora(dispositivo="LUZ") == [
+        (datetime(2024, 5, 1, 10), 3), (datetime(2024, 5, 1, 12), 1)
+    ]
+    assert historial.conteo_por_hora(desde=datetime(2024, 5, 1, 11)) == [(datetime(2024, 5, 1, 12), 1)]
+    assert historial.conteo_por_hora(hasta=datetime(2024, 5, 1, 11)) == [(datetime(2024, 5, 1, 10), 4)]
+
+def test_persistencia_al_reabrir(tmp_path):
+    ruta = str(tmp_path / "historial.db")
+    historial = HistorialComandos(ruta, intervalo_escritura=3600)
+    historial.registrar("ENCENDER", "LUZ", "COCINA", timestamp=100)
+    historial.cerrar()
+    
+    reabierto = HistorialComandos(ruta, intervalo_escritura=3600)
+    try:
+        assert reabierto.ultimas_acciones()[0]['dispositivo'] == "LUZ"
+    finally:
+        reabierto.cerrar()
+
+@pytest.fixture
+def zona_horaria(monkeypatch):
+    """Cambiar la zona horaria local del proceso (Python y SQLite) durante la prueba"""
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset no disponible")
+    def cambiar(tz):
+        monkeypatch.setenv("TZ", tz)
+        time.tzset()
+    yield cambiar
+    monkeypatch.undo()
+    time.tzset()
+
+def test_conteo_por_hora_local_con_desfase_no_entero(historial, zona_horaria):
+    zona_horaria("IST-5:30")
+    # 10:45 y 11:10 hora local caen en horas distintas aunque compartan hora UTC (05:xx)
+    historial.registrar("ENCENDER", "LUZ", timestamp=datetime(2024, 5, 1, 10, 45).timestamp())
+    historial.registrar("APAGAR", "LUZ", timestamp=datetime(2024, 5, 1, 11, 10).timestamp())
+    assert historial.conteo_por_hora() == [
+        (datetime(2024, 5, 1, 10), 1), (datetime(2024, 5, 1, 11), 1)
+    ]
+    assert historial.conteo_por_hora(desde=datetime(2024, 5, 1, 11)) == [(datetime(2024, 5, 1, 11), 1)]
+
+def test_base_anterior_migra_a_hora_local(tmp_path, zona_horaria):
+    zona_horaria("IST-5:30")
+    ruta = str(tmp_path / "historial.db")
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(
+        "CREATE TABLE comandos (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, accion TEXT, "
+        "dispositivo TEXT, ubicacion TEXT, valor INTEGER, exito INTEGER NOT NULL DEFAULT 1, texto TEXT);"
+        "CREATE TABLE conteo_horario (hora INTEGER, dispositivo TEXT, total INTEGER);"
+    )
+    conexion.execute("INSERT INTO comandos (timestamp, accion, dispositivo) VALUES (?, 'ENCENDER', 'LUZ')",
+                     (datetime(2024, 5, 1, 10, 45).timestamp(),))
+    conexion.commit()
+    conexion.close()
+    
+    historial = HistorialComandos(ruta, intervalo_escritura=3600)
+    try:
+        assert historial.conteo_por_hora() == [(datetime(2024, 5, 1, 10), 1)]
+        tablas = {fila[0] for fila in historial._consultar("SELECT name FROM sqlite_master")}
+        assert "conteo_horario" not in tablas
+    finally:
+        historial.cerrar()
+
+def test_vaciar_reencola_el_lote_si_falla_la_escritura(historial):
+    historial._conexion.execute(
+        "CREATE TEMP TRIGGER disco_lleno BEFORE INSERT ON comandos "
+        "BEGIN SELECT RAISE(ABORT, 'disco lleno'); END"
+    )
+    historial.registrar("ENCENDER", "LUZ", timestamp=100)
+    historial.registrar("APAGAR", "LUZ", timestamp=200)
+    assert historial.vaciar() == 0
+    historial.registrar("SUBIR", "LUZ", timestamp=300)
+    assert [fila[1] for fila in historial._pendientes] == ["ENCENDER", "APAGAR", "SUBIR"]
+    
+    historial._conexion.execute("DROP TRIGGER disco_lleno")
+    assert historial.vaciar() == 3
+    assert [a['accion'] for a in historial.ultimas_acciones()] == ["SUBIR", "APAGAR", "ENCENDER"]
+
+def test_historial_reciente_expulsa_el_mas_antiguo():
+    reciente = HistorialReciente(capacidad=3)
+    assert reciente.ultimo() is None and reciente.ultimos() == []
+    for i in range(5):
+        reciente.agregar(i)
+    assert len(reciente) == reciente.capacidad == 3
+    assert list(reciente) == [2, 3, 4]
+    assert reciente.ultimo() == 4
+
+@pytest.mark.parametrize("k, esperado", [(0, []), (1, [4]), (2, [3, 4]), (3, [2, 3, 4]), (10, [2, 3, 4])])
+def test_historial_reciente_ultimos_k(k, esperado):
+    reciente = HistorialReciente(capacidad=3, elementos=range(5))
+    assert reciente.ultimos(k) == esperado
+
+def test_historial_reciente_ultimos_es_una_copia():
+    reciente = HistorialReciente(capacidad=2)
+    reciente.agregar("a")
+    copia = reciente.ultimos()
+    reciente.agregar("b")
+    assert copia == ["a"]
+
+def test_entrada_desde_dict_ignora_claves_extra():
+    entrada = EntradaHistorial.desde_dict(
+        {'timestamp': "t", 'dispositivo': "LUZ", 'accion': "ENCENDER", 'extra': 1}
+    )
+    assert entrada == ("t", "LUZ", None, "ENCENDER", None)
@@ -0,0 +1,157 @@
+# ============================================================================
+# tests/test_parser.py - Análisis sintáctico de comandos
+# ============================================================================
+
+import pytest
+
+from lexer.tokenizer import TipoToken, Token, tokenizar
+from parser.parser import (
+    GRAMATICA_COMPILADA, EstadoPrefijo, ExcepcionSintactica, GramaticaLL1, ParserIncremental,
+    analizar_con_recuperacion, analizar_lote, recuperar_sintaxis
+)
+from generator.generator import generate_batch
+
+@pytest.mark.parametrize("comando, esperado, codigo", [
+    ("ajusta el volumen al 50", ("AJUSTAR", "VOLUMEN", None, 50), "ajustar_volumen_50"),
+    ("enciende la luz cocina", ("ENCENDER", "LUZ", "COCINA", None), "encender_luz_en_cocina"),
+    ("pon el brillo 30", ("AJUSTAR", "BRILLO", None, 30), "ajustar_brillo_30"),
+    ("sube el volumen 20", ("SUBIR", "VOLUMEN", None, 20), "subir_volumen_20"),
+])
+def test_valor_y_habitacion_sin_preposicion(comando, esperado, codigo):
+    nodos = analizar_lote(tokenizar(comando))
+    assert [nodo.como_tupla() for nodo in nodos] == [esperado]
+    assert generate_batch(nodos) == codigo
+
+def test_tokens_sobrantes_no_se_descartan_en_silencio():
+    with pytest.raises(ExcepcionSintactica):
+        analizar_lote(tokenizar("dime la hora luz"))
+
+def test_recuperacion_elimina_tokens_sobrantes():
+    [resultado] = analizar_con_recuperacion(tokenizar("enciende la luz cocina sala"))
+    assert len(resultado.errores) == 1
+    assert resultado.texto_reparado() == "enciende luz cocina"
+
+@pytest.mark.parametrize("enunciado, esperado", [
+    ("enciende la luz en la cocina y en la sala",
+     [("ENCENDER", "LUZ", "COCINA", None), ("ENCENDER", "LUZ", "SALA", None)]),
+    ("enciende el ventilador del dormitorio y el de la sala",
+     [("ENCENDER", "VENTILADOR", "DORMITORIO", None), ("ENCENDER", "VENTILADOR", "SALA", None)]),
+    ("enciende y apaga la luz",
+     [("ENCENDER", "LUZ", None, None), ("APAGAR", "LUZ", None, None)]),
+    ("enciende, sube y apaga la luz de la cocina",
+     [("ENCENDER", "LUZ", "COCINA", None), ("SUBIR", "LUZ", "COCINA", None),
+      ("APAGAR", "LUZ", "COCINA", None)]),
+    ("enciende la luz y el ventilador",
+     [("ENCENDER", "LUZ", None, None), ("ENCENDER", "VENTILADOR", None, None)]),
+    ("ajusta el volumen a 30 y 40",
+     [("AJUSTAR", "VOLUMEN", None, 30), ("AJUSTAR", "VOLUMEN", None, 40)]),
+])
+def test_comandos_compuestos_heredan_lo_omitido(enunciado, esperado):
+    assert [nodo.como_tupla() for nodo in analizar_lote(tokenizar(enunciado))] == esperado
+
+def test_acciones_sin_dispositivo_siguen_siendo_error():
+    with pytest.raises(ExcepcionSintactica):
+        analizar_lote(tokenizar("enciende y apaga"))
+
+def _estados(enunciado):
+    incremental = ParserIncremental()
+    return [incremental.alimentar(token) for token in tokenizar(enunciado)]
+
+def test_incremental_transiciones_de_completitud():
+    assert _estados("enciende la luz en la cocina") == [
+        EstadoPrefijo.INCOMPLETO, EstadoPrefijo.EXTENSIBLE,
+        EstadoPrefijo.INCOMPLETO, EstadoPrefijo.COMPLETO,
+    ]
+    assert _estados("dime la hora") == [EstadoPrefijo.INCOMPLETO, EstadoPrefijo.COMPLETO]
+
+def test_incremental_token_que_no_extiende_completa_el_comando():
+    incremental = ParserIncremental()
+    for token in tokenizar("sube el volumen 20"):
+        assert incremental.alimentar(token) is not EstadoPrefijo.COMPLETO
+    assert incremental.alimentar(Token(TipoToken.SEPARADOR, "y")) is EstadoPrefijo.COMPLETO
+    assert incremental.nodo.como_tupla() == ("SUBIR", "VOLUMEN", None, 20)
+
+def test_incremental_error_y_evaluar_solo_tokens_nuevos():
+    incremental = ParserIncremental()
+    with pytest.raises(ExcepcionSintactica):
+        incremental.alimentar(Token(TipoToken.LUZ, "luz"))
+    incremental.reiniciar()
+    tokens = tokenizar("apaga el ventilador")
+    assert incremental.evaluar(tokens[:1]) is EstadoPrefijo.INCOMPLETO
+    assert incremental.evaluar(tokens) is EstadoPrefijo.EXTENSIBLE
+    assert len(incremental.tokens) == 2
+
+def test_gramatica_anulables_primeros_y_siguientes():
+    g = GRAMATICA_COMPILADA
+    assert g.anulables == {"VALOR_OPCIONAL", "UBICACION"}
+    assert g.primeros["COMANDO"] == {
+        TipoToken.VER, TipoToken.AJUSTAR, TipoToken.ENCENDER, TipoToken.APAGAR,
+        TipoToken.SUBIR, TipoToken.BAJAR, TipoToken.SILENCIAR, TipoToken.ACTIVAR,
+    }
+    assert g.primeros["VALOR_OPCIONAL"] == {TipoToken.A, TipoToken.NUMERO}
+    assert g.siguientes["COMANDO"] == {TipoToken.EOF}
+    # VALOR_OPCIONAL es anulable: le sigue FIRST(UBICACION) y, por ser esta anulable, EOF
+    assert g.siguientes["VALOR_OPCIONAL"] == {
+        TipoToken.EN, TipoToken.DE, TipoToken.DEL, TipoToken.COCINA, TipoToken.DORMITORIO,
+        TipoToken.SALA, TipoToken.BAÑO, TipoToken.OFICINA, TipoToken.EOF,
+    }
+
+def test_tabla_predice_por_primeros_y_epsilon_por_siguientes():
+    tabla = GRAMATICA_COMPILADA.tabla
+    assert tabla["COMANDO"][TipoToken.AJUSTAR] == ("AJUSTE",)
+    assert tabla["VALOR_OPCIONAL"][TipoToken.A] == (TipoToken.A, "VALOR")
+    assert tabla["VALOR_OPCIONAL"][TipoToken.COCINA] == ()
+    assert tabla["UBICACION"][TipoToken.EOF] == ()
+    assert TipoToken.NUMERO not in tabla["UBICACION"]
+    assert GRAMATICA_COMPILADA.esperados("OBJETO_CONSULTA") == ["BATERIA", "HORA"]
+
+def test_tabla_pila_invierte_producciones_y_asigna_papel():
+    fila = GRAMATICA_COMPILADA.tabla_pila["AJUSTE"][TipoToken.AJUSTAR]
+    assert fila == ("UBICACION", "VALOR_OPCIONAL", "AJUSTABLE", (TipoToken.AJUSTAR, "accion"))
+    assert GRAMATICA_COMPILADA.tabla_pila["VALOR"][TipoToken.NUMERO] == ((TipoToken.NUMERO, "valor"),)
+
+def test_gramatica_con_conflicto_no_es_ll1():
+    with pytest.raises(ValueError, match="no es LL\\(1\\)"):
+        GramaticaLL1({"S": [["LUZ"], ["LUZ", "COCINA"]]}, "S")
+    with pytest.raises(ValueError, match="Símbolo desconocido"):
+        GramaticaLL1({"S": [["NO_EXISTE"]]}, "S")
+
+def test_error_usa_mensaje_de_la_gramatica_o_los_esperados():
+    token = Token(TipoToken.LUZ, None)
+    error = GRAMATICA_COMPILADA.error("OBJETO_CONSULTA", token, 1)
+    assert error.mensaje == "Después de VER se esperaba BATERIA o HORA, se encontró LUZ"
+    assert error.posicion == 1
+    sin_plantilla = GramaticaLL1({"S": [["LUZ"], ["VENTILADOR"]]}, "S")
+    assert sin_plantilla.error("S", Token(TipoToken.SALA, None), 0).mensaje == \
+        "Se esperaba LUZ o VENTILADOR, se encontró SALA"
+
+@pytest.mark.parametrize("comando, reparaciones, reparado", [
+    ("enciende en la cocina", [("insertar", 1, TipoToken.LUZ)], "enciende luz en cocina"),
+    ("luz cocina", [("insertar", 0, TipoToken.ENCENDER)], "encender luz cocina"),
+    ("apaga apaga luz en", [("eliminar", 1, TipoToken.APAGAR)], "apaga luz en"),
+    ("enciende la cocina luz", [("eliminar", 1, TipoToken.COCINA)], "enciende luz"),
+])
+def test_recuperacion_inserta_o_elimina_un_token(comando, reparaciones, reparado):
+    resultado = recuperar_sintaxis(tokenizar(comando))
+    assert not resultado.valido and resultado.ejecutable
+    assert [(r.operacion, r.posicion, r.token.tipo) for r in resultado.reparaciones] == reparaciones
+    assert resultado.texto_reparado() == reparado
+
+def test_recuperacion_registra_todos_los_errores_con_posicion_original():
+    resultado = recuperar_sintaxis(tokenizar("enciende en cocina sala"))
+    assert [(e.mensaje, e.posicion) for e in resultado.errores] == [
+        ("Dispositivo no válido: EN", 1),
+        ("Token sobrante después del comando: SALA", 3),
+    ]
+    assert resultado.nodo.como_tupla() == ("ENCENDER", "LUZ", "COCINA", None)
+
+def test_recuperacion_numero_inventado_no_es_ejecutable():
+    resultado = recuperar_sintaxis(tokenizar("sube volumen a cocina"))
+    assert resultado.texto_reparado() == "sube volumen a <numero> cocina"
+    assert not resultado.ejecutable
+    assert resultado.nodo.como_tupla() == ("SUBIR", "VOLUMEN", "COCINA", None)
+
+def test_recuperacion_comando_valido_sin_reparaciones():
+    resultado = recuperar_sintaxis(tokenizar("enciende la luz en"))
+    assert resultado.valido and resultado.reparaciones == []
+    assert resultado.nodo.como_tupla() == ("ENCENDER", "LUZ", None, None)
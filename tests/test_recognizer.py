@@ -0,0 +1,97 @@
+# ============================================================================
+# tests/test_recognizer.py - Sesión de reconocimiento de voz
+# ============================================================================
+
+import pytest
+
+pytest.importorskip("speech_recognition")
+
+try:
+    import numpy as np
+except ImportError:  # Solo la usan las pruebas del detector de voz
+    np = None
+
+from speech.recognizer import DetectorVoz, VoiceRecognizer
+
+class FlujoFalso:
+    """Flujo de PyAudio con audio acumulado sin leer"""
+
+    def __init__(self, disponibles):
+        self.disponibles = disponibles
+        self.leidas = []
+
+    def get_read_available(self):
+        return self.disponibles
+
+    def read(self, tramas, exception_on_overflow=True):
+        assert not exception_on_overflow
+        self.disponibles -= tramas
+        self.leidas.append(tramas)
+        return b"\x00\x00" * tramas
+
+class FuenteFalsa:
+    CHUNK = 1024
+
+    def __init__(self, flujo):
+        self.stream = type("MicrophoneStream", (), {"pyaudio_stream": flujo})()
+
+def _reconocedor(flujo):
+    reconocedor = VoiceRecognizer.__new__(VoiceRecognizer)
+    reconocedor._fuente = FuenteFalsa(flujo)
+    return reconocedor
+
+def test_descarta_el_audio_acumulado_entre_comandos():
+    flujo = FlujoFalso(2500)
+    assert _reconocedor(flujo)._descartar_pendiente() == 2500
+    assert flujo.leidas == [1024, 1024, 452]
+    assert flujo.disponibles == 0
+
+def test_sin_audio_acumulado_no_lee():
+    flujo = FlujoFalso(0)
+    assert _reconocedor(flujo)._descartar_pendiente() == 0
+    assert flujo.leidas == []
+
+@pytest.fixture
+def nuevo_detector():
+    """Fábrica de detectores; la escucha continua requiere NumPy"""
+    if np is None:
+        pytest.skip("NumPy no instalado")
+    return DetectorVoz
+
+def _tono(amplitud, frecuencia=440, muestras=1024, tasa=16000):
+    """Trama PCM de 16 bits con un tono puro (pocos cruces por cero)"""
+    t = np.arange(muestras) / tasa
+    return (amplitud * np.sin(2 * np.pi * frecuencia * t)).astype(np.int16).tobytes()
+
+def _siseo(amplitud, muestras=1024):
+    """Trama que cambia de signo en cada muestra (cruces por cero máximos)"""
+    return np.resize([amplitud, -amplitud], muestras).astype(np.int16).tobytes()
+
+def test_silencio_no_es_voz_y_el_umbral_no_baja_del_minimo(nuevo_detector):
+    detector = nuevo_detector(umbral_inicial=300, umbral_minimo=100)
+    assert detector.umbral == 300
+    for _ in range(200):
+        assert not detector.es_voz(bytes(2048))
+    assert detector.umbral == 100
+
+def test_tono_fuerte_es_voz_sin_adaptar_el_ruido(nuevo_detector):
+    detector = nuevo_detector(umbral_inicial=300)
+    assert detector.es_voz(_tono(5000))
+    assert detector.umbral == 300
+
+def test_siseo_no_abre_frase_pero_la_continua(nuevo_detector):
+    detector = nuevo_detector(umbral_inicial=300)
+    assert not detector.es_voz(_siseo(2000))
+    assert detector.umbral > 300  # El siseo cuenta como ruido de fondo
+    assert detector.es_voz(_siseo(2000), en_frase=True)
+
+def test_el_umbral_sigue_al_ruido_de_fondo(nuevo_detector):
+    detector = nuevo_detector(umbral_inicial=300, factor_ruido=3.0)
+    assert detector.es_voz(_tono(565))  # RMS ≈ 400
+    for _ in range(200):
+        assert not detector.es_voz(_tono(283, frecuencia=100))  # RMS ≈ 200
+    assert detector.umbral == pytest.approx(600, rel=0.02)
+    assert not detector.es_voz(_tono(565))
+
+def test_trama_demasiado_corta(nuevo_detector):
+    assert not nuevo_detector().es_voz(b"\x00\x10")
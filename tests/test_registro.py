@@ -0,0 +1,83 @@
+# ============================================================================
+# tests/test_registro.py - Registro indexado de dispositivos
+# ============================================================================
+
+import json
+
+import pytest
+
+from utils.registro import RegistroDispositivos
+
+def _topologia(**cambios):
+    """Topología mínima válida con los cambios indicados"""
+    topologia = {
+        "capacidades": {"encendido": ["ENCENDER", "APAGAR"], "nivel": ["SUBIR", "BAJAR", "AJUSTAR"]},
+        "tipos": {
+            "LUZ": {"capacidades": ["encendido"], "estado_inicial": {"encendido": False}},
+            "VOLUMEN": {"capacidades": ["nivel"], "rango": [0, 100]},
+        },
+        "habitaciones": {"COCINA": {"zona": "planta baja"}, "SALA": None},
+        "dispositivos": [
+            {"id": 2, "nombre": "luz_sala", "tipo": "LUZ", "habitacion": "SALA"},
+            {"id": 1, "tipo": "LUZ", "habitacion": "COCINA"},
+            {"id": 3, "nombre": "volumen", "tipo": "VOLUMEN", "habitacion": None},
+        ],
+    }
+    topologia.update(cambios)
+    return topologia
+
+def test_carga_topologia_del_proyecto():
+    registro = RegistroDispositivos.desde_archivo()
+    assert {"LUZ", "VOLUMEN", "HORA"} <= registro.tipos
+    assert registro.habitaciones == {"COCINA", "SALA", "BAÑO", "DORMITORIO", "OFICINA"}
+    assert all(d.tipo == "LUZ" for d in registro.por_tipo("LUZ"))
+    assert registro.rangos["VOLUMEN"] == (0, 100)
+
+def test_indices_ordenados_por_id(tmp_path):
+    ruta = tmp_path / "topologia.json"
+    ruta.write_text(json.dumps(_topologia()), encoding="utf-8")
+    registro = RegistroDispositivos.desde_archivo(ruta)
+    assert [d.id for d in registro.por_tipo("LUZ")] == [1, 2]
+    assert registro.obtener(1).nombre == "luz_1"
+    assert registro.obtener(1).zona == "planta baja"
+    assert registro.obtener(2).zona is None
+    assert registro.por_zona("planta baja") == (registro.obtener(1),)
+    assert registro.por_habitacion("DORMITORIO") == ()
+    assert registro.por_capacidad("nivel") == (registro.obtener(3),)
+    assert registro.buscar(tipo="LUZ", habitacion="SALA") == (registro.obtener(2),)
+    assert len(registro.buscar()) == 3
+
+def test_acciones_y_compatibilidad_desde_capacidades():
+    registro = RegistroDispositivos(_topologia())
+    assert registro.acciones_de_tipo("LUZ") == {"ENCENDER", "APAGAR"}
+    assert registro.acciones_de_tipo("DESCONOCIDO") == set()
+    assert registro.compatibilidad()["AJUSTAR"] == {"VOLUMEN"}
+
+def test_indices_inmutables():
+    registro = RegistroDispositivos(_topologia())
+    with pytest.raises(TypeError):
+        registro.dispositivos[9] = None
+    with pytest.raises(TypeError):
+        registro.rangos["LUZ"] = (0, 1)
+
+@pytest.mark.parametrize("cambios, mensaje", [
+    ({"tipos": {"LAMPARA": {}}}, "'LAMPARA' no es un tipo de token conocido"),
+    ({"habitaciones": {"GARAJE": {}}}, "'GARAJE' no es un tipo de token conocido"),
+    ({"capacidades": {"encendido": ["PRENDER"]}}, "'PRENDER' no es un tipo de token conocido"),
+    ({"dispositivos": [{"id": 1, "tipo": "LUZ"}, {"id": "1", "tipo": "LUZ"}]},
+     "id de dispositivo duplicado 1"),
+    ({"dispositivos": [{"id": 1, "tipo": "VENTILADOR"}]}, "tipo no declarado VENTILADOR"),
+    ({"dispositivos": [{"id": 1, "tipo": "LUZ", "habitacion": "BAÑO"}]},
+     "habitación no declarada BAÑO"),
+])
+def test_topologia_invalida(cambios, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        RegistroDispositivos(_topologia(**cambios))
+
+def test_archivo_mal_formado(tmp_path):
+    ruta = tmp_path / "topologia.json"
+    ruta.write_text("{ no es json", encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        RegistroDispositivos.desde_archivo(ruta)
+    with pytest.raises(FileNotFoundError):
+        RegistroDispositivos.desde_archivo(tmp_path / "no_existe.json")
@@ -0,0 +1,184 @@
+# ============================================================================
+# tests/test_state_manager.py - Gestor de estado, journal y suscripciones
+# ============================================================================
+
+import json
+import threading
+
+import pytest
+
+from interface.state_manager import GestorEstadoIoT
+from utils.almacen_estado import AlmacenEstado, estados_por_defecto
+from utils.registro import obtener_registro
+
+def _nuevo_almacen():
+    return AlmacenEstado(estados_por_defecto(obtener_registro()))
+
+@pytest.fixture
+def gestor(tmp_path):
+    gestor = GestorEstadoIoT(str(tmp_path / "estado.json"), almacen=_nuevo_almacen(),
+                             intervalo_compactacion=3600)
+    yield gestor
+    gestor.cerrar()
+
+def test_ajustar_fija_el_nivel(gestor):
+    gestor.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 30)
+    assert gestor.obtener_estado("VOLUMEN")["nivel"] == 30
+    assert gestor.obtener_estado("VOLUMEN")["accion"] == "ajustado_a_30"
+
+def test_consultas_no_escriben_estado(gestor):
+    version = gestor.version
+    assert gestor.actualizar_dispositivo("HORA", None, "VER") is None
+    assert "HORA" not in gestor.almacen
+    assert gestor.version == version
+    assert gestor._registros_journal == 0
+    assert gestor.historial_comandos.ultimos(1)[0].dispositivo == "HORA"
+
+def _simular_caida(gestor):
+    """Parar el gestor sin la compactación final, como tras un cierre inesperado"""
+    gestor.almacen.dejar_de_observar(gestor._registrar_escritura)
+    gestor._detener.set()
+    gestor._compactar_ahora.set()
+    gestor._hilo_compactacion.join()
+    gestor._journal.close()
+
+def _reabrir(gestor):
+    return GestorEstadoIoT(str(gestor.archivo_estado), almacen=_nuevo_almacen(),
+                           intervalo_compactacion=3600)
+
+def test_journal_anota_solo_los_campos_cambiados(gestor):
+    gestor.almacen.modificar_ubicacion("LUZ", "COCINA", True)
+    gestor._journal.flush()
+    [registro] = [json.loads(linea) for linea in gestor.archivo_journal.read_text(encoding="utf-8").splitlines()]
+    assert registro['cambios'] == {'ubicaciones': {'COCINA': True}}
+
+def test_escrituras_del_ejecutor_sobreviven_a_una_caida(gestor):
+    gestor.almacen.ajustar_nivel("BRILLO", "ajustar", 20)  # Como al apagar la luz
+    gestor.almacen.modificar("LUZ", encendido=True)
+    gestor.actualizar_dispositivo("LUZ", "SALA", "ENCENDER")
+    _simular_caida(gestor)
+    
+    reabierto = _reabrir(gestor)
+    try:
+        assert reabierto.obtener_estado("BRILLO")["nivel"] == 20
+        assert reabierto.obtener_estado("LUZ")["encendido"] is True
+        assert reabierto.historial_comandos.ultimos(1)[0].accion == "encender"
+    finally:
+        reabierto.cerrar()
+
+def test_linea_final_cortada_se_descarta(gestor):
+    gestor.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 30)
+    _simular_caida(gestor)
+    with open(gestor.archivo_journal, "a", encoding="utf-8") as f:
+        f.write('{"secuencia": 99, "dispositivo": "VOLU')
+    
+    reabierto = _reabrir(gestor)
+    try:
+        assert reabierto.obtener_estado("VOLUMEN")["nivel"] == 30
+        assert gestor.archivo_journal.read_text(encoding="utf-8").endswith("\n")
+        reabierto.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 40)
+    finally:
+        _simular_caida(reabierto)
+    otra_vez = _reabrir(gestor)
+    try:
+        assert otra_vez.obtener_estado("VOLUMEN")["nivel"] == 40
+    finally:
+        otra_vez.cerrar()
+
+def test_reproduccion_tras_compactar(gestor):
+    gestor.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 30)
+    gestor.compactar()
+    assert gestor.archivo_journal.stat().st_size == 0
+    gestor.actualizar_dispositivo("BRILLO", None, "AJUSTAR", 60)
+    _simular_caida(gestor)
+    
+    reabierto = _reabrir(gestor)
+    try:
+        assert reabierto.obtener_estado("VOLUMEN")["nivel"] == 30
+        assert reabierto.obtener_estado("BRILLO")["nivel"] == 60
+        assert [e.dispositivo for e in reabierto.historial_comandos.ultimos(2)] == ["VOLUMEN", "BRILLO"]
+    finally:
+        reabierto.cerrar()
+
+def test_compactar_con_escrituras_concurrentes(gestor):
+    def escribir(tipo):
+        for nivel in range(10, 101):
+            gestor.actualizar_dispositivo(tipo, None, "AJUSTAR", nivel)
+    
+    hilos = [threading.Thread(target=escribir, args=(tipo,)) for tipo in ("VOLUMEN", "BRILLO")]
+    for hilo in hilos:
+        hilo.start()
+    while any(hilo.is_alive() for hilo in hilos):
+        gestor.compactar()
+    for hilo in hilos:
+        hilo.join()
+    _simular_caida(gestor)
+    
+    reabierto = _reabrir(gestor)
+    try:
+        assert reabierto.obtener_estado("VOLUMEN")["nivel"] == 100
+        assert reabierto.obtener_estado("BRILLO")["nivel"] == 100
+    finally:
+        reabierto.cerrar()
+
+def test_cola_recibe_cambio_con_campos_modificados(gestor):
+    cola = gestor.suscribir_cola()
+    gestor.almacen.modificar_ubicacion("LUZ", "COCINA", True)  # Escritura del ejecutor
+    cambio = gestor.actualizar_dispositivo("LUZ", "COCINA", "ENCENDER")
+    
+    assert cola.get_nowait() is cambio
+    assert cola.empty()
+    assert (cambio.dispositivo, cambio.ubicacion) == ("LUZ", "COCINA")
+    assert cambio.version == gestor.almacen.vista("LUZ")[0]
+    assert cambio.cambios['accion'] == ("apagado", "encendido")
+    assert cambio.cambios['ultima_accion'] == (None, "encender")
+    assert cambio.cambios['ubicaciones'][1]["COCINA"] is True
+    assert "nivel" not in cambio.cambios and "encendido" not in cambio.cambios
+
+def test_cambios_consecutivos_parten_de_lo_publicado(gestor):
+    cambios = []
+    gestor.suscribir(cambios.append)
+    gestor.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 30)
+    gestor.actualizar_dispositivo("VOLUMEN", None, "AJUSTAR", 30)
+    assert cambios[0].cambios['nivel'] == (50, 30)
+    assert cambios[1].anterior is cambios[0].nuevo
+    assert set(cambios[1].cambios) == {'timestamp'}
+    assert cambios[0].version < cambios[1].version
+
+def test_cambios_de_un_dispositivo_llegan_en_orden_de_version(gestor):
+    cola = gestor.suscribir_cola()
+    
+    def trabajar(dispositivo):
+        for _ in range(50):
+            gestor.actualizar_dispositivo(dispositivo, None, "SUBIR")
+    
+    hilos = [threading.Thread(target=trabajar, args=(d,)) for d in ("VOLUMEN", "BRILLO", "LUZ")]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    cambios = [cola.get_nowait() for _ in range(cola.qsize())]
+    assert len(cambios) == 150
+    for dispositivo in ("VOLUMEN", "BRILLO", "LUZ"):
+        versiones = [c.version for c in cambios if c.dispositivo == dispositivo]
+        assert len(versiones) == 50 and versiones == sorted(versiones)
+
+def test_cancelar_suscripcion_y_cola_llena(gestor):
+    llena = gestor.suscribir_cola(maxsize=1)
+    recibidos = []
+    callback = gestor.suscribir(recibidos.append)
+    gestor.actualizar_dispositivo("LUZ", None, "ENCENDER")
+    gestor.cancelar_suscripcion(callback)
+    gestor.actualizar_dispositivo("LUZ", None, "APAGAR")
+    
+    assert len(recibidos) == 1
+    assert llena.qsize() == 1 and llena.get_nowait().nuevo['accion'] == "encendido"
+
+def test_suscriptor_que_falla_no_afecta_a_los_demas(gestor):
+    def fallar(cambio):
+        raise RuntimeError("suscriptor roto")
+    gestor.suscribir(fallar)
+    cola = gestor.suscribir_cola()
+    assert gestor.actualizar_dispositivo("LUZ", None, "ENCENDER") is not None
+    assert cola.qsize() == 1
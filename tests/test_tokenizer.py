@@ -0,0 +1,103 @@
+# ============================================================================
+# tests/test_tokenizer.py - Corrección difusa del tokenizador
+# ============================================================================
+
+import pytest
+
+from lexer.tokenizer import AutomataFrases, TipoToken, Token, TokenizadorIncremental, tokenizar
+from parser.parser import analizar_lote
+
+@pytest.mark.parametrize("palabra", [
+    "cuanto", "cuarta", "cuartos", "cuatro", "activo", "cocinar", "calentar", "ventilar",
+    "despacio", "juego", "fuego", "llego", "silencio", "aprende", "lavado", "estudia",
+    "salen", "brilla",
+])
+def test_palabras_comunes_no_se_corrigen(palabra):
+    # Las palabras desconocidas se descartan: no queda ningún token
+    assert tokenizar(palabra) == []
+
+def test_dime_cuanto_tiempo_es_consulta_de_hora():
+    nodos = analizar_lote(tokenizar("dime cuanto tiempo"))
+    assert [nodo.como_tupla() for nodo in nodos] == [("VER", "HORA", None, None)]
+
+def test_palabra_corriente_no_cambia_la_habitacion():
+    nodos = analizar_lote(tokenizar("enciende la luz despacio"))
+    assert [nodo.como_tupla() for nodo in nodos] == [("ENCENDER", "LUZ", None, None)]
+
+def test_palabra_corriente_no_se_convierte_en_separador():
+    assert TipoToken.SEPARADOR not in [token.tipo for token in tokenizar("apaga el fuego de la cocina")]
+
+def test_errores_de_reconocimiento_se_siguen_corrigiendo():
+    assert [token.tipo for token in tokenizar("enciende el bentilador")] == [
+        TipoToken.ENCENDER, TipoToken.VENTILADOR
+    ]
+
+@pytest.mark.parametrize("palabra, tipo", [
+    ("televisot", TipoToken.TELEVISOR), ("calefator", TipoToken.CALEFACTOR),
+    ("volumem", TipoToken.VOLUMEN), ("baterya", TipoToken.BATERIA),
+])
+def test_dispositivos_y_consultas_se_corrigen(palabra, tipo):
+    assert [token.tipo for token in tokenizar(palabra)] == [tipo]
+
+def test_incremental_la_ultima_palabra_es_provisional():
+    incremental = TokenizadorIncremental()
+    incremental.actualizar("enciende")
+    assert incremental.estables == []
+    assert [t.tipo for t in incremental.provisionales] == [TipoToken.ENCENDER]
+    incremental.actualizar("enciende la luz ")
+    assert [t.tipo for t in incremental.estables] == [TipoToken.ENCENDER, TipoToken.LUZ]
+    assert incremental.provisionales == []
+
+def test_incremental_retiene_el_posible_inicio_de_una_frase():
+    incremental = TokenizadorIncremental()
+    incremental.actualizar("enciende la luz en la sala de ")
+    # "sala de" puede acabar en "sala de estar": aún no es estable
+    assert [t.tipo for t in incremental.estables] == [TipoToken.ENCENDER, TipoToken.LUZ, TipoToken.EN]
+    assert [t.tipo for t in incremental.provisionales] == [TipoToken.SALA, TipoToken.DE]
+    incremental.actualizar("enciende la luz en la sala de estar")
+    assert incremental.finalizar()[-1] == Token(TipoToken.SALA, "sala de estar")
+
+def test_incremental_revision_de_la_zona_estable_reinicia():
+    incremental = TokenizadorIncremental()
+    incremental.actualizar("apaga la luz ")
+    incremental.actualizar("prende la luz ")
+    assert incremental.reinicios == 1
+    assert [t.tipo for t in incremental.estables] == [TipoToken.ENCENDER, TipoToken.LUZ]
+
+def test_incremental_coincide_con_tokenizar():
+    incremental = TokenizadorIncremental()
+    texto = "sube el volumen a 30 y apaga la luz del cuarto de baño"
+    for fin in range(1, len(texto) + 1):
+        incremental.actualizar(texto[:fin])
+    assert incremental.finalizar() == tokenizar(texto)
+
+@pytest.fixture
+def automata():
+    return AutomataFrases({
+        "cuarto de baño": "BAÑO", "cuarto de estudio": "OFICINA", "de estudio": "OFICINA",
+        "nivel de brillo": "BRILLO", "brillo alto": "BRILLO", "sala": "SALA", "sala de estar": "SALA",
+    })
+
+def test_frases_coincidencia_mas_larga(automata):
+    assert automata.buscar("la sala de estar".split()) == {1: (3, "SALA")}
+    assert automata.buscar("la sala de".split()) == {1: (1, "SALA")}
+
+def test_frases_solapadas_gana_la_de_mas_a_la_izquierda(automata):
+    # "de estudio" está contenida en "cuarto de estudio": no se cuenta dos veces
+    assert automata.buscar("el cuarto de estudio".split()) == {1: (3, "OFICINA")}
+    # "nivel de brillo" y "brillo alto" comparten "brillo"
+    assert automata.buscar("nivel de brillo alto".split()) == {0: (3, "BRILLO")}
+    assert automata.buscar("sube de estudio".split()) == {1: (2, "OFICINA")}
+
+def test_frases_enlace_de_fallo(automata):
+    # Un "cuarto de" sin terminar no impide reconocer la frase que empieza después
+    assert automata.buscar("cuarto de cuarto de baño".split()) == {2: (3, "BAÑO")}
+
+def test_frases_prefijo_abierto(automata):
+    assert automata.prefijo_abierto(["cuarto", "de"])
+    assert automata.prefijo_abierto(["sala"])
+    assert not automata.prefijo_abierto(["sala", "de", "estar"])
+    assert not automata.prefijo_abierto(["cocina"])
+
+def test_frases_en_el_tokenizador():
+    assert tokenizar("enciende la luz del cuarto de baño")[-1] == Token(TipoToken.BAÑO, "cuarto de bano")
@@ -0,0 +1,74 @@
+# ============================================================================
+# tests/test_validator.py - Validación semántica por comando y por lotes
+# ============================================================================
+
+import itertools
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lexer.tokenizer import TipoToken
+from parser.parser import NodoComando
+from semantic.validator import CodigoErrorSemantico, ExcepcionSemantica, ValidadorSemanticoIoT
+from utils.almacen_estado import AlmacenEstado, estados_por_defecto
+from utils.registro import obtener_registro
+
+# Contexto de cada ExcepcionSemantica → código de error de validar_lote
+_CODIGO_POR_CONTEXTO = {
+    "dispositivos_disponibles": CodigoErrorSemantico.DISPOSITIVO_DESCONOCIDO,
+    "acciones_disponibles": CodigoErrorSemantico.ACCION_DESCONOCIDA,
+    "compatibilidad_accion_dispositivo": CodigoErrorSemantico.INCOMPATIBLE,
+    "habitaciones_disponibles": CodigoErrorSemantico.HABITACION_DESCONOCIDA,
+    "rango_valores": CodigoErrorSemantico.FUERA_DE_RANGO,
+}
+
+@pytest.fixture(scope="module")
+def validador():
+    registro = obtener_registro()
+    return ValidadorSemanticoIoT(registro, AlmacenEstado(estados_por_defecto(registro)))
+
+def _validar_uno(validador, accion, dispositivo, habitacion, valor):
+    """Código de error de validar() para una fila de validar_lote"""
+    nodo = NodoComando(
+        TipoToken(accion).name, TipoToken(dispositivo).name,
+        None if habitacion == TipoToken.EOF else TipoToken(habitacion).name,
+        None if math.isnan(valor) else int(valor)
+    )
+    try:
+        validador.validar(nodo)
+    except ExcepcionSemantica as e:
+        return _CODIGO_POR_CONTEXTO[e.contexto]
+    return CodigoErrorSemantico.VALIDO
+
+def test_lote_equivale_a_validar_cada_comando(validador):
+    habitaciones = [TipoToken.EOF, TipoToken.COCINA, TipoToken.LUZ, TipoToken.DESCONOCIDO]
+    valores = [math.nan, -1, 0, 50, 100, 101]
+    filas = list(itertools.product(TipoToken, TipoToken, habitaciones, valores))
+    columnas = [list(columna) for columna in zip(*filas)]
+    
+    errores = validador.validar_lote(*columnas)
+    esperados = [_validar_uno(validador, *fila) for fila in filas]
+    assert errores.tolist() == esperados
+    assert set(esperados) == set(CodigoErrorSemantico)  # Todas las ramas cubiertas
+
+@pytest.mark.parametrize("fila, esperado", [
+    # Dispositivo desconocido gana a todo lo demás
+    ((TipoToken.COCINA, TipoToken.SALA, TipoToken.LUZ, 500), CodigoErrorSemantico.DISPOSITIVO_DESCONOCIDO),
+    ((TipoToken.LUZ, TipoToken.VOLUMEN, TipoToken.LUZ, 500), CodigoErrorSemantico.ACCION_DESCONOCIDA),
+    ((TipoToken.ENCENDER, TipoToken.VOLUMEN, TipoToken.LUZ, 500), CodigoErrorSemantico.INCOMPATIBLE),
+    ((TipoToken.AJUSTAR, TipoToken.VOLUMEN, TipoToken.LUZ, 500), CodigoErrorSemantico.HABITACION_DESCONOCIDA),
+    ((TipoToken.AJUSTAR, TipoToken.VOLUMEN, TipoToken.EOF, 500), CodigoErrorSemantico.FUERA_DE_RANGO),
+    ((TipoToken.AJUSTAR, TipoToken.VOLUMEN, TipoToken.EOF, math.nan), CodigoErrorSemantico.VALIDO),
+    # Sin rango (la luz), cualquier valor vale
+    ((TipoToken.ENCENDER, TipoToken.LUZ, TipoToken.SALA, 500), CodigoErrorSemantico.VALIDO),
+])
+def test_prioridad_de_errores(validador, fila, esperado):
+    assert validador.validar_lote(*([columna] for columna in fila)).tolist() == [esperado]
+
+def test_codigos_fuera_de_la_tabla_son_desconocidos(validador):
+    errores = validador.validar_lote([TipoToken.ENCENDER, -1], [99, TipoToken.LUZ],
+                                     [TipoToken.EOF, TipoToken.EOF], [math.nan, math.nan])
+    assert errores.tolist() == [CodigoErrorSemantico.DISPOSITIVO_DESCONOCIDO,
+                                CodigoErrorSemantico.ACCION_DESCONOCIDA]
@@ -0,0 +1 @@
+"""Utilidades compartidas por las etapas del compilador"""
\ No newline at end of file
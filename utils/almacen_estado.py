@@ -0,0 +1,232 @@
+# ============================================================================
+# utils/almacen_estado.py - Estado único de los dispositivos
+# ============================================================================
+
+import copy
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+from utils.registro import RegistroDispositivos, obtener_registro
+
+logger = logging.getLogger(__name__)
+
+def estados_por_defecto(registro: RegistroDispositivos) -> Dict[str, Dict[str, Any]]:
+    """Estado inicial de cada tipo con estado, según la topología"""
+    estados = {}
+    for tipo, estado_inicial in registro.estados_iniciales.items():
+        if not estado_inicial:
+            continue  # Consultas: no tienen estado
+        estado = dict(estado_inicial)
+        if "encendido" in estado:
+            estado["ubicaciones"] = {
+                d.habitacion: False for d in registro.por_tipo(tipo) if d.habitacion
+            }
+            estado["accion"] = "apagado"  # Para compatibilidad
+        else:
+            estado["accion"] = "normal"
+        estado["ultima_accion"] = None
+        estado["timestamp"] = datetime.now().isoformat()
+        estados[tipo] = estado
+    return estados
+
+# "subir" y "bajar" mueven el nivel en pasos fijos dentro de los límites del tipo
+PASO_NIVEL = 10
+_LIMITES_NIVEL = {"BRILLO": (10, 100)}  # Pantalla siempre visible
+_LIMITES_POR_DEFECTO = (0, 100)
+
+def nivel_siguiente(tipo: str, nivel: int, accion: str, valor: Optional[int] = None) -> int:
+    """Nivel resultante de "ajustar", "subir" o "bajar" (otras acciones no lo cambian)"""
+    minimo, maximo = _LIMITES_NIVEL.get(tipo.upper(), _LIMITES_POR_DEFECTO)
+    accion = accion.lower()
+    if accion == "ajustar" and valor is not None:
+        nivel = valor
+    elif accion == "subir":
+        nivel += PASO_NIVEL
+    elif accion == "bajar":
+        nivel -= PASO_NIVEL
+    return max(minimo, min(maximo, nivel))
+
+def _congelar(estado: Dict[str, Any]) -> Mapping[str, Any]:
+    """Vista de solo lectura de un estado (y de sus diccionarios anidados)"""
+    return MappingProxyType({
+        campo: MappingProxyType(dict(valor)) if isinstance(valor, (dict, MappingProxyType)) else valor
+        for campo, valor in estado.items()
+    })
+
+def _descongelar(vista: Mapping[str, Any]) -> Dict[str, Any]:
+    """Copia mutable de una vista, para preparar la siguiente versión"""
+    return {
+        campo: dict(valor) if isinstance(valor, MappingProxyType) else copy.deepcopy(valor)
+        for campo, valor in vista.items()
+    }
+
+_VACIO: Mapping[str, Any] = MappingProxyType({})
+
+# Observador de escrituras: (tipo, vista anterior, vista nueva, versión)
+Observador = Callable[[str, Mapping[str, Any], Mapping[str, Any], int], None]
+
+def diferencias(anterior: Mapping[str, Any], nuevo: Mapping[str, Any]) -> Dict[str, Any]:
+    """Campos de nuevo que difieren de anterior; de un diccionario anidado
+    (p. ej. ubicaciones) solo las claves que cambiaron"""
+    cambios = {}
+    for campo, valor in nuevo.items():
+        previo = anterior.get(campo)
+        if isinstance(valor, Mapping) and isinstance(previo, Mapping):
+            claves = {clave: v for clave, v in valor.items() if previo.get(clave) != v}
+            if claves:
+                cambios[campo] = claves
+        elif valor != previo:
+            cambios[campo] = dict(valor) if isinstance(valor, Mapping) else valor
+    return cambios
+
+def aplicar_diferencias(estado: Dict[str, Any], cambios: Mapping[str, Any]) -> None:
+    """Inversa de diferencias(): aplicar los campos cambiados sobre un estado"""
+    for campo, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(estado.get(campo), dict):
+            estado[campo].update(valor)
+        else:
+            estado[campo] = copy.deepcopy(valor)
+
+class AlmacenEstado:
+    """Única fuente de verdad del estado de los dispositivos
+    
+    El estado de cada tipo se publica como una vista inmutable junto a su
+    versión. Leer no bloquea ni copia: se entrega la vista vigente. Escribir
+    (con un lock por tipo, así que tipos distintos no compiten) construye la
+    versión siguiente y la sustituye de forma atómica.
+    """
+    
+    def __init__(self, estados_iniciales: Optional[Dict[str, Dict[str, Any]]] = None):
+        self._vistas: Dict[str, Tuple[int, Mapping[str, Any]]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock_entradas = threading.Lock()
+        self._lock_version = threading.Lock()
+        self._version = 0
+        self._observadores: Tuple[Observador, ...] = ()
+        if estados_iniciales:
+            self.cargar(estados_iniciales)
+    
+    @staticmethod
+    def clave(tipo: str) -> str:
+        """Clave canónica de un tipo (nombre del token: "LUZ", "VOLUMEN"...)"""
+        return tipo.upper()
+    
+    @property
+    def version(self) -> int:
+        """Versión de la última escritura; si no cambia, nada ha cambiado"""
+        return self._version
+    
+    def _nueva_version(self) -> int:
+        with self._lock_version:
+            self._version += 1
+            return self._version
+    
+    def observar(self, observador: Observador) -> None:
+        """Recibir cada escritura, dentro del lock de su tipo (en orden de versión)"""
+        with self._lock_entradas:
+            self._observadores += (observador,)
+    
+    def dejar_de_observar(self, observador: Observador) -> None:
+        with self._lock_entradas:
+            self._observadores = tuple(o for o in self._observadores if o != observador)
+    
+    def _lock(self, clave: str) -> threading.Lock:
+        """Lock de escritura del tipo, creando su entrada vacía si aún no existe"""
+        lock = self._locks.get(clave)
+        if lock is None:
+            with self._lock_entradas:
+                lock = self._locks.get(clave)
+                if lock is None:
+                    self._vistas[clave] = (0, _VACIO)
+                    lock = self._locks[clave] = threading.Lock()
+        return lock
+    
+    def __contains__(self, tipo: str) -> bool:
+        return self.clave(tipo) in self._vistas
+    
+    def tipos(self) -> Tuple[str, ...]:
+        """Tipos con estado registrado"""
+        return tuple(self._vistas)
+    
+    def vista(self, tipo: str) -> Tuple[int, Optional[Mapping[str, Any]]]:
+        """(versión del tipo, vista de solo lectura) sin copiar; (0, None) si no existe"""
+        return self._vistas.get(self.clave(tipo), (0, None))
+    
+    def vistas(self) -> Tuple[int, Mapping[str, Mapping[str, Any]]]:
+        """(versión global, vista de solo lectura de todos los tipos)"""
+        version = self._version
+        return version, MappingProxyType({clave: vista for clave, (_, vista) in self._vistas.copy().items()})
+    
+    def leer(self, tipo: str, campo: str, defecto: Any = None) -> Any:
+        """Leer un campo del estado de un tipo"""
+        _, vista = self.vista(tipo)
+        return defecto if vista is None else vista.get(campo, defecto)
+    
+    def instantanea(self, tipo: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(versión, copia mutable del estado del tipo) o (versión, None) si no tiene estado"""
+        version, vista = self.vista(tipo)
+        return version, None if vista is None else _descongelar(vista)
+    
+    def instantanea_global(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """(versión, copia mutable de todos los estados), p. ej. para persistirla"""
+        version, vistas = self.vistas()
+        return version, {clave: _descongelar(vista) for clave, vista in vistas.items()}
+    
+    def modificar(self, tipo: str, **cambios: Any) -> int:
+        """Asignar campos del estado de un tipo; devuelve la nueva versión"""
+        with self.editar(tipo) as estado:
+            estado.update(cambios)
+        return self._version
+    
+    def ajustar_nivel(self, tipo: str, accion: str, valor: Optional[int] = None) -> int:
+        """Aplicar "ajustar", "subir" o "bajar" al nivel de un tipo; devuelve el nuevo nivel"""
+        with self.editar(tipo) as estado:
+            estado["nivel"] = nivel_siguiente(tipo, estado.get("nivel", 0), accion, valor)
+            return estado["nivel"]
+    
+    def modificar_ubicacion(self, tipo: str, ubicacion: str, encendido: bool) -> int:
+        """Marcar un tipo como encendido o apagado en una habitación"""
+        with self.editar(tipo) as estado:
+            estado.setdefault("ubicaciones", {})[ubicacion] = encendido
+        return self._version
+    
+    @contextmanager
+    def editar(self, tipo: str) -> Iterator[Dict[str, Any]]:
+        """Lectura-modificación-escritura atómica: se edita un borrador y se publica al salir"""
+        clave = self.clave(tipo)
+        with self._lock(clave):
+            anterior = self._vistas[clave][1]
+            borrador = _descongelar(anterior)
+            yield borrador
+            version, nueva = self._nueva_version(), _congelar(borrador)
+            self._vistas[clave] = (version, nueva)
+            for observador in self._observadores:
+                try:
+                    observador(clave, anterior, nueva, version)
+                except Exception as e:
+                    logger.error(f"Error notificando escritura de {clave}: {e}")
+    
+    def cargar(self, estados: Dict[str, Dict[str, Any]]) -> int:
+        """Fusionar estados completos (p. ej. leídos de disco) en el almacén"""
+        for tipo, estado in estados.items():
+            with self.editar(tipo) as actual:
+                actual.update(copy.deepcopy(estado))
+        logger.info(f"Estado cargado para {len(estados)} tipos de dispositivo")
+        return self._version
+
+# Instancia global del almacén, compartida por validador, ejecutor y gestor de estado
+_almacen_instance = None
+_almacen_lock = threading.Lock()
+
+def obtener_almacen() -> AlmacenEstado:
+    """Almacén compartido, inicializado con los valores de la topología"""
+    global _almacen_instance
+    if _almacen_instance is None:
+        with _almacen_lock:
+            if _almacen_instance is None:
+                _almacen_instance = AlmacenEstado(estados_por_defecto(obtener_registro()))
+    return _almacen_instance
@@ -0,0 +1,34 @@
+# ============================================================================
+# utils/estadisticas.py - Contadores seguros entre hilos
+# ============================================================================
+
+import threading
+from typing import Dict, Union
+
+Numero = Union[int, float]
+
+class EstadisticasSeguras:
+    """Contadores de estadísticas que pueden actualizarse desde varios hilos"""
+    
+    def __init__(self, valores_iniciales: Dict[str, Numero]):
+        self._valores = dict(valores_iniciales)
+        self._lock = threading.Lock()
+    
+    def incrementar(self, clave: str, cantidad: Numero = 1) -> None:
+        """Sumar atómicamente una cantidad a un contador"""
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+    
+    def asignar(self, clave: str, valor: Numero) -> None:
+        """Fijar atómicamente el valor de un contador"""
+        with self._lock:
+            self._valores[clave] = valor
+    
+    def __getitem__(self, clave: str) -> Numero:
+        with self._lock:
+            return self._valores[clave]
+    
+    def copy(self) -> Dict[str, Numero]:
+        """Copia consistente de todos los contadores"""
+        with self._lock:
+            return dict(self._valores)
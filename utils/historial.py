@@ -0,0 +1,276 @@
+# ============================================================================
+# utils/historial.py - Historial de comandos compartido (SQLite)
+# ============================================================================
+
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS comandos (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    accion TEXT,
+    dispositivo TEXT,
+    ubicacion TEXT,
+    valor INTEGER,
+    exito INTEGER NOT NULL DEFAULT 1,
+    texto TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_comandos_timestamp ON comandos (timestamp);
+CREATE INDEX IF NOT EXISTS idx_comandos_dispositivo ON comandos (dispositivo, timestamp);
+CREATE INDEX IF NOT EXISTS idx_comandos_ubicacion ON comandos (ubicacion, timestamp);
+CREATE INDEX IF NOT EXISTS idx_comandos_texto ON comandos (id) WHERE texto IS NOT NULL;
+
+-- Conteos por hora local mantenidos al insertar: la consulta no recorre la tabla.
+-- hora = horas desde 1970-01-01 00:00 en hora local, de modo que las zonas con
+-- desfase no entero (p. ej. +05:30) agrupan por la hora que ve el usuario.
+CREATE TABLE IF NOT EXISTS conteo_hora_local (
+    hora INTEGER NOT NULL,
+    dispositivo TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (hora, dispositivo)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_conteo_hora_local AFTER INSERT ON comandos
+WHEN NEW.accion IS NOT NULL
+BEGIN
+    INSERT INTO conteo_hora_local (hora, dispositivo, total)
+    VALUES (CAST(strftime('%s', NEW.timestamp, 'unixepoch', 'localtime') AS INTEGER) / 3600,
+            COALESCE(NEW.dispositivo, ''), 1)
+    ON CONFLICT (hora, dispositivo) DO UPDATE SET total = total + 1;
+END;
+"""
+
+# Migración de bases anteriores, que agrupaban por hora UTC
+_MIGRAR_CONTEO = """
+BEGIN;
+DROP TRIGGER IF EXISTS trg_conteo_horario;
+DROP TABLE IF EXISTS conteo_horario;
+INSERT INTO conteo_hora_local (hora, dispositivo, total)
+SELECT CAST(strftime('%s', timestamp, 'unixepoch', 'localtime') AS INTEGER) / 3600,
+       COALESCE(dispositivo, ''), COUNT(*)
+FROM comandos WHERE accion IS NOT NULL GROUP BY 1, 2;
+COMMIT;
+"""
+
+_EPOCA = datetime(1970, 1, 1)
+
+def _hora_local(momento: datetime) -> int:
+    """Hora local de un instante como en conteo_hora_local (una fecha ingenua se toma como local)"""
+    return (momento.astimezone().replace(tzinfo=None) - _EPOCA) // timedelta(hours=1)
+
+class EntradaHistorial(NamedTuple):
+    """Entrada compacta del historial reciente (una tupla, sin diccionario por entrada)"""
+    timestamp: str
+    dispositivo: str
+    ubicacion: Optional[str]
+    accion: str
+    valor: Optional[Any]
+    
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> "EntradaHistorial":
+        """Construir desde un registro con las mismas claves (JSON, journal)"""
+        return cls(*(datos.get(campo) for campo in cls._fields))
+
+class HistorialReciente:
+    """Historial en memoria acotado: añadir y expulsar en O(1), últimos k en O(k)
+    
+    Al llenarse, cada entrada nueva expulsa la más antigua, de modo que la
+    memoria usada no crece con la duración de la sesión.
+    """
+    
+    def __init__(self, capacidad: int = 100, elementos: Iterable[Any] = ()):
+        self._elementos = deque(elementos, maxlen=capacidad)
+        self._lock = threading.Lock()
+    
+    @property
+    def capacidad(self) -> int:
+        return self._elementos.maxlen
+    
+    def agregar(self, elemento: Any) -> None:
+        """Añadir una entrada (expulsando la más antigua si está lleno)"""
+        with self._lock:
+            self._elementos.append(elemento)
+    
+    def ultimos(self, k: Optional[int] = None) -> List[Any]:
+        """Las k entradas más recientes (todas si k es None), de la más antigua a la más nueva"""
+        with self._lock:
+            if k is None or k >= len(self._elementos):
+                return list(self._elementos)
+            recientes = list(islice(reversed(self._elementos), k))
+        recientes.reverse()
+        return recientes
+    
+    def ultimo(self) -> Optional[Any]:
+        """Entrada más reciente, o None si está vacío"""
+        with self._lock:
+            return self._elementos[-1] if self._elementos else None
+    
+    def __len__(self) -> int:
+        return len(self._elementos)
+    
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.ultimos())
+
+_INSERTAR = ("INSERT INTO comandos (timestamp, accion, dispositivo, ubicacion, valor, exito, texto) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+class HistorialComandos:
+    """Historial persistente de acciones ejecutadas y comandos de voz reconocidos
+    
+    Las inserciones se acumulan en memoria y un hilo las escribe por lotes en
+    una sola transacción; las consultas vacían antes lo pendiente.
+    """
+    
+    def __init__(self, ruta: str = "historial_comandos.db", tam_lote: int = 64,
+                 intervalo_escritura: float = 1.0):
+        self.ruta = ruta
+        self.tam_lote = tam_lote
+        self.intervalo_escritura = intervalo_escritura
+        
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        migrar = self._conexion.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'conteo_horario'"
+        ).fetchone() is not None
+        self._conexion.executescript(_ESQUEMA)
+        if migrar:
+            self._conexion.executescript(_MIGRAR_CONTEO)
+        self._lock_conexion = threading.Lock()
+        
+        self._pendientes: List[Tuple] = []
+        self._lock_pendientes = threading.Lock()
+        self._lote_lleno = threading.Event()
+        self._detener = threading.Event()
+        self._hilo_escritura = threading.Thread(
+            target=self._bucle_escritura, name="historial-sqlite", daemon=True
+        )
+        self._hilo_escritura.start()
+        atexit.register(self.cerrar)
+    
+    def registrar(self, accion: Optional[str], dispositivo: Optional[str],
+                  ubicacion: Optional[str] = None, valor: Optional[int] = None,
+                  exito: bool = True, texto: Optional[str] = None,
+                  timestamp: Optional[float] = None) -> None:
+        """Encolar una entrada del historial (se escribe en el próximo lote)"""
+        fila = (time.time() if timestamp is None else timestamp,
+                accion, dispositivo, ubicacion, valor, int(exito), texto)
+        with self._lock_pendientes:
+            self._pendientes.append(fila)
+            lleno = len(self._pendientes) >= self.tam_lote
+        if lleno:
+            self._lote_lleno.set()
+    
+    def registrar_texto(self, texto: str) -> None:
+        """Registrar un comando de voz tal como se reconoció"""
+        self.registrar(None, None, texto=texto)
+    
+    def _bucle_escritura(self):
+        """Hilo de escritura: un lote por intervalo o en cuanto se llena"""
+        while not self._detener.is_set():
+            self._lote_lleno.wait(self.intervalo_escritura)
+            self._lote_lleno.clear()
+            self.vaciar()
+    
+    def vaciar(self) -> int:
+        """Escribir ahora las entradas pendientes en una sola transacción"""
+        with self._lock_pendientes:
+            filas, self._pendientes = self._pendientes, []
+        if not filas:
+            return 0
+        try:
+            with self._lock_conexion, self._conexion:
+                self._conexion.executemany(_INSERTAR, filas)
+        except sqlite3.Error as e:
+            # La transacción se revierte entera: el lote vuelve a la cola, por delante
+            with self._lock_pendientes:
+                self._pendientes[:0] = filas
+            logger.error(f"Error escribiendo historial ({len(filas)} entradas se reintentarán): {e}")
+            return 0
+        return len(filas)
+    
+    def cerrar(self) -> None:
+        """Detener el hilo de escritura, vaciar lo pendiente y cerrar la base"""
+        if self._detener.is_set():
+            return
+        self._detener.set()
+        self._lote_lleno.set()
+        self._hilo_escritura.join(timeout=5)
+        self.vaciar()
+        if self._pendientes:
+            logger.error(f"Historial cerrado con {len(self._pendientes)} entradas sin escribir")
+        with self._lock_conexion:
+            self._conexion.close()
+    
+    def _consultar(self, sql: str, parametros: Tuple = ()) -> List[Tuple]:
+        self.vaciar()
+        with self._lock_conexion:
+            return self._conexion.execute(sql, parametros).fetchall()
+    
+    def ultimas_acciones(self, dispositivo: Optional[str] = None, n: int = 10,
+                         ubicacion: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Últimas n acciones, opcionalmente de un dispositivo y/o habitación"""
+        condiciones = ["accion IS NOT NULL"]
+        parametros: List[Any] = []
+        if dispositivo is not None:
+            condiciones.append("dispositivo = ?")
+            parametros.append(dispositivo)
+        if ubicacion is not None:
+            condiciones.append("ubicacion = ?")
+            parametros.append(ubicacion)
+        filas = self._consultar(
+            "SELECT timestamp, accion, dispositivo, ubicacion, valor, exito FROM comandos "
+            f"WHERE {' AND '.join(condiciones)} ORDER BY timestamp DESC LIMIT ?",
+            (*parametros, n)
+        )
+        return [{
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'accion': accion,
+            'dispositivo': disp,
+            'ubicacion': ubic,
+            'valor': valor,
+            'exito': bool(exito)
+        } for ts, accion, disp, ubic, valor, exito in filas]
+    
+    def conteo_por_hora(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                        dispositivo: Optional[str] = None) -> List[Tuple[datetime, int]]:
+        """Número de acciones por hora en el intervalo [desde, hasta]"""
+        hora_desde = _hora_local(desde) if desde else -2 ** 62
+        hora_hasta = _hora_local(hasta) if hasta else 2 ** 62
+        sql = "SELECT hora, SUM(total) FROM conteo_hora_local WHERE hora BETWEEN ? AND ?"
+        parametros: Tuple = (hora_desde, hora_hasta)
+        if dispositivo is not None:
+            sql += " AND dispositivo = ?"
+            parametros += (dispositivo,)
+        filas = self._consultar(sql + " GROUP BY hora ORDER BY hora", parametros)
+        return [(_EPOCA + timedelta(hours=hora), total) for hora, total in filas]
+    
+    def ultimo_texto(self) -> Optional[str]:
+        """Último comando de voz registrado"""
+        filas = self._consultar(
+            "SELECT texto FROM comandos INDEXED BY idx_comandos_texto "
+            "WHERE texto IS NOT NULL ORDER BY id DESC LIMIT 1"
+        )
+        return filas[0][0] if filas else None
+
+# Instancia global del historial, compartida por ejecutor y módulo de voz
+_historial_instance = None
+_historial_lock = threading.Lock()
+
+def obtener_historial() -> HistorialComandos:
+    """Historial compartido, abierto al primer uso"""
+    global _historial_instance
+    if _historial_instance is None:
+        with _historial_lock:
+            if _historial_instance is None:
+                _historial_instance = HistorialComandos()
+    return _historial_instance
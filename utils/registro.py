@@ -0,0 +1,183 @@
+# ============================================================================
+# utils/registro.py - Registro indexado de dispositivos del hogar
+# ============================================================================
+
+import json
+import logging
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Set, Tuple
+
+from lexer.tokenizer import TipoToken
+
+logger = logging.getLogger(__name__)
+
+# Topología distribuida con el proyecto
+ARCHIVO_TOPOLOGIA = Path(__file__).resolve().parent.parent / "topologia.json"
+
+class Dispositivo:
+    """Dispositivo físico del hogar con identificador estable"""
+    __slots__ = ('id', 'nombre', 'tipo', 'habitacion', 'zona', 'capacidades')
+    
+    def __init__(self, id: int, nombre: str, tipo: str, habitacion: Optional[str],
+                 zona: Optional[str], capacidades: FrozenSet[str]):
+        self.id = id
+        self.nombre = nombre
+        self.tipo = tipo
+        self.habitacion = habitacion
+        self.zona = zona
+        self.capacidades = capacidades
+    
+    def __repr__(self) -> str:
+        return f"Dispositivo({self.id}, {self.nombre!r}, {self.tipo}, {self.habitacion})"
+
+def _indexar(dispositivos: Iterable[Dispositivo], clave) -> Mapping[str, Tuple[Dispositivo, ...]]:
+    """Índice secundario inmutable: valor de la clave → dispositivos (orden por id)"""
+    indice: Dict[str, list] = {}
+    for dispositivo in dispositivos:
+        for valor in clave(dispositivo):
+            indice.setdefault(valor, []).append(dispositivo)
+    return MappingProxyType({valor: tuple(lista) for valor, lista in indice.items()})
+
+class RegistroDispositivos:
+    """Topología del hogar con índices por habitación, zona, tipo y capacidad
+    
+    Se construye una sola vez y no se modifica: todas las etapas pueden
+    compartirlo entre hilos sin bloqueos. Los ids sirven para las consultas;
+    el estado y la ejecución siguen indexados por tipo (ver almacen_estado).
+    """
+    
+    def __init__(self, topologia: Dict[str, Any]):
+        capacidades = topologia.get('capacidades', {})
+        tipos = topologia.get('tipos', {})
+        habitaciones = topologia.get('habitaciones', {})
+        
+        for nombre in [*tipos, *habitaciones, *(a for acciones in capacidades.values() for a in acciones)]:
+            if nombre not in TipoToken.__members__:
+                raise ValueError(f"Topología: '{nombre}' no es un tipo de token conocido")
+        
+        self.acciones_por_capacidad: Mapping[str, FrozenSet[str]] = MappingProxyType({
+            capacidad: frozenset(acciones) for capacidad, acciones in capacidades.items()
+        })
+        self.capacidades_por_tipo: Mapping[str, FrozenSet[str]] = MappingProxyType({
+            tipo: frozenset(spec.get('capacidades', ())) for tipo, spec in tipos.items()
+        })
+        self.rangos: Mapping[str, Tuple[int, int]] = MappingProxyType({
+            tipo: tuple(spec['rango']) for tipo, spec in tipos.items() if 'rango' in spec
+        })
+        self.estados_iniciales: Mapping[str, Dict[str, Any]] = MappingProxyType({
+            tipo: dict(spec.get('estado_inicial', {})) for tipo, spec in tipos.items()
+        })
+        self.zonas: Mapping[str, Optional[str]] = MappingProxyType({
+            habitacion: (spec or {}).get('zona') for habitacion, spec in habitaciones.items()
+        })
+        
+        dispositivos: Dict[int, Dispositivo] = {}
+        for spec in topologia.get('dispositivos', []):
+            id_dispositivo = int(spec['id'])
+            tipo = spec['tipo']
+            habitacion = spec.get('habitacion')
+            if id_dispositivo in dispositivos:
+                raise ValueError(f"Topología: id de dispositivo duplicado {id_dispositivo}")
+            if tipo not in tipos:
+                raise ValueError(f"Topología: tipo no declarado {tipo}")
+            if habitacion is not None and habitacion not in habitaciones:
+                raise ValueError(f"Topología: habitación no declarada {habitacion}")
+            dispositivos[id_dispositivo] = Dispositivo(
+                id_dispositivo, spec.get('nombre', f"{tipo.lower()}_{id_dispositivo}"), tipo,
+                habitacion, self.zonas.get(habitacion), self.capacidades_por_tipo[tipo]
+            )
+        
+        ordenados = [dispositivos[i] for i in sorted(dispositivos)]
+        self.dispositivos: Mapping[int, Dispositivo] = MappingProxyType({d.id: d for d in ordenados})
+        self._por_tipo = _indexar(ordenados, lambda d: (d.tipo,))
+        self._por_habitacion = _indexar(ordenados, lambda d: (d.habitacion,) if d.habitacion else ())
+        self._por_zona = _indexar(ordenados, lambda d: (d.zona,) if d.zona else ())
+        self._por_capacidad = _indexar(ordenados, lambda d: d.capacidades)
+        
+        logger.info(f"Registro de dispositivos: {len(self.dispositivos)} dispositivos, "
+                    f"{len(self.capacidades_por_tipo)} tipos, {len(self.zonas)} habitaciones")
+    
+    @classmethod
+    def desde_archivo(cls, ruta: Path = ARCHIVO_TOPOLOGIA) -> "RegistroDispositivos":
+        """Cargar el registro desde un archivo de topología JSON"""
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    @property
+    def tipos(self) -> FrozenSet[str]:
+        """Tipos de dispositivo declarados"""
+        return frozenset(self.capacidades_por_tipo)
+    
+    @property
+    def habitaciones(self) -> FrozenSet[str]:
+        """Habitaciones declaradas"""
+        return frozenset(self.zonas)
+    
+    def obtener(self, id_dispositivo: int) -> Optional[Dispositivo]:
+        """Dispositivo por su identificador estable"""
+        return self.dispositivos.get(id_dispositivo)
+    
+    def por_tipo(self, tipo: str) -> Tuple[Dispositivo, ...]:
+        """Dispositivos de un tipo"""
+        return self._por_tipo.get(tipo, ())
+    
+    def por_habitacion(self, habitacion: str) -> Tuple[Dispositivo, ...]:
+        """Dispositivos de una habitación"""
+        return self._por_habitacion.get(habitacion, ())
+    
+    def por_zona(self, zona: str) -> Tuple[Dispositivo, ...]:
+        """Dispositivos de una zona (p. ej. "planta alta")"""
+        return self._por_zona.get(zona, ())
+    
+    def por_capacidad(self, capacidad: str) -> Tuple[Dispositivo, ...]:
+        """Dispositivos con una capacidad"""
+        return self._por_capacidad.get(capacidad, ())
+    
+    def buscar(self, tipo: Optional[str] = None, habitacion: Optional[str] = None,
+               zona: Optional[str] = None, capacidad: Optional[str] = None) -> Tuple[Dispositivo, ...]:
+        """Dispositivos que cumplen todos los filtros dados
+        
+        Se recorre solo el índice más pequeño de los filtros pedidos, de modo que
+        el coste depende del filtro más selectivo y no del tamaño del hogar.
+        """
+        filtros = [(indice, valor) for indice, valor in (
+            (self._por_tipo, tipo), (self._por_habitacion, habitacion),
+            (self._por_zona, zona), (self._por_capacidad, capacidad)
+        ) if valor is not None]
+        if not filtros:
+            return tuple(self.dispositivos.values())
+        
+        candidatos = min((indice.get(valor, ()) for indice, valor in filtros), key=len)
+        return tuple(d for d in candidatos
+                     if (tipo is None or d.tipo == tipo)
+                     and (habitacion is None or d.habitacion == habitacion)
+                     and (zona is None or d.zona == zona)
+                     and (capacidad is None or capacidad in d.capacidades))
+    
+    def acciones_de_tipo(self, tipo: str) -> Set[str]:
+        """Acciones admitidas por un tipo según sus capacidades"""
+        return {accion for capacidad in self.capacidades_por_tipo.get(tipo, ())
+                for accion in self.acciones_por_capacidad.get(capacidad, ())}
+    
+    def compatibilidad(self) -> Dict[str, Set[str]]:
+        """Tabla acción → tipos compatibles, derivada de las capacidades"""
+        tabla: Dict[str, Set[str]] = {}
+        for tipo in self.capacidades_por_tipo:
+            for accion in self.acciones_de_tipo(tipo):
+                tabla.setdefault(accion, set()).add(tipo)
+        return tabla
+
+# Instancia global del registro (inmutable: segura entre hilos)
+_registro_instance = None
+_registro_lock = threading.Lock()
+
+def obtener_registro() -> RegistroDispositivos:
+    """Registro compartido por todas las etapas, cargado de la topología al primer uso"""
+    global _registro_instance
+    if _registro_instance is None:
+        with _registro_lock:
+            if _registro_instance is None:
+                _registro_instance = RegistroDispositivos.desde_archivo()
+    return _registro_instance
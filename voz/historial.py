@@ -1,11 +1,13 @@
 # voz/historial.py
 
-_historial = []
+from utils.historial import HistorialReciente, obtener_historial
+
+# Últimos comandos de voz en memoria; el historial completo queda en SQLite
+_historial = HistorialReciente(capacidad=50)
 
 def guardar_historial(comando):
-    _historial.append(comando)
+    _historial.agregar(comando)
+    obtener_historial().registrar_texto(comando)
 
 def obtener_ultimo_comando():
-    if _historial:
-        return _historial[-1]
-    return None
+    return _historial.ultimo()